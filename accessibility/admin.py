@@ -1,5 +1,7 @@
 from django.contrib import admin
-from .models import AccessibilityReport, RouteFeedback
+from .models import (
+    AccessibilityReport, ContributionStats, PhotoDeletion, RouteFeedback, SegmentRating, StoredObject,
+)
 
 
 @admin.register(AccessibilityReport)
@@ -7,17 +9,17 @@ class AccessibilityReportAdmin(admin.ModelAdmin):
     list_display = ['problem_type', 'severity', 'status', 'user', 'created_at']
     list_filter = ['severity', 'status', 'created_at', 'problem_type']
     search_fields = ['problem_type', 'description', 'user__username']
-    readonly_fields = ['id', 'created_at', 'updated_at']
+    readonly_fields = ['id', 'status_changed_at', 'created_at', 'updated_at']
     
     fieldsets = (
         ('Location', {
             'fields': ('latitude', 'longitude')
         }),
         ('Report Details', {
-            'fields': ('problem_type', 'disability_types', 'severity', 'description', 'photo_url')
+            'fields': ('problem_type', 'disability_types', 'severity', 'description', 'photo_url', 'photo_thumbnail_url', 'photo_status')
         }),
         ('Status', {
-            'fields': ('status', 'user')
+            'fields': ('status', 'status_changed_at', 'user')
         }),
         ('Metadata', {
             'fields': ('id', 'created_at', 'updated_at'),
@@ -31,4 +33,34 @@ class RouteFeedbackAdmin(admin.ModelAdmin):
     list_display = ['disability_type', 'rating', 'user', 'created_at']
     list_filter = ['rating', 'disability_type', 'created_at']
     search_fields = ['comment', 'user__username']
-    readonly_fields = ['id', 'created_at']
\ No newline at end of file
+    readonly_fields = ['id', 'created_at']
+
+
+@admin.register(SegmentRating)
+class SegmentRatingAdmin(admin.ModelAdmin):
+    list_display = ['cell', 'disability_type', 'rating_ewma', 'rating_count', 'updated_at']
+    list_filter = ['disability_type']
+    search_fields = ['cell']
+    readonly_fields = ['updated_at']
+
+
+@admin.register(StoredObject)
+class StoredObjectAdmin(admin.ModelAdmin):
+    list_display = ['path', 'size', 'created_at', 'used_at', 'removed_at']
+    search_fields = ['content_hash', 'path']
+    readonly_fields = ['content_hash', 'path', 'url', 'size', 'created_at', 'used_at', 'removed_at']
+
+
+@admin.register(PhotoDeletion)
+class PhotoDeletionAdmin(admin.ModelAdmin):
+    list_display = ['url', 'attempts', 'created_at']
+    list_filter = ['attempts']
+    search_fields = ['url']
+    readonly_fields = ['url', 'attempts', 'created_at']
+
+
+@admin.register(ContributionStats)
+class ContributionStatsAdmin(admin.ModelAdmin):
+    list_display = ['user', 'report_count', 'feedback_count', 'updated_at']
+    search_fields = ['user__username']
+    readonly_fields = ['user', 'report_count', 'feedback_count', 'updated_at']
@@ -0,0 +1,70 @@
+"""
+Per-user contribution counters.
+
+Report and feedback counts live on one ContributionStats row per user and
+move by one on every create and delete, so profile screens and the "mine"
+listings never run COUNT(*) over the big tables. Counts only drift if rows
+are written with bulk_create() or raw SQL; recount() repairs them.
+"""
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+COUNTERS = ('report_count', 'feedback_count')
+
+
+def bump(user_id, counter, delta):
+    """Add delta to one of a user's counters, creating the stats row if needed."""
+    from .models import ContributionStats
+
+    def update():
+        # Greatest() keeps a drifted counter from going negative
+        return ContributionStats.objects.filter(user_id=user_id).update(
+            **{counter: Greatest(F(counter) + delta, 0)}, updated_at=timezone.now()
+        )
+
+    if update() or delta < 0:
+        return
+    try:
+        with transaction.atomic():
+            ContributionStats.objects.create(user_id=user_id, **{counter: delta})
+    except IntegrityError:
+        # Created concurrently
+        update()
+
+
+def get_stats(user_id):
+    """{counter: value} for a user; zeros if they have not contributed."""
+    from .models import ContributionStats
+
+    row = ContributionStats.objects.filter(user_id=user_id).values(*COUNTERS).first()
+    return row or dict.fromkeys(COUNTERS, 0)
+
+
+def recount():
+    """
+    Recompute every user's counters from the report and feedback tables.
+
+    Returns:
+        Number of stats rows written
+    """
+    from .models import AccessibilityReport, ContributionStats, RouteFeedback
+
+    counts = {}
+    for model, counter in ((AccessibilityReport, 'report_count'), (RouteFeedback, 'feedback_count')):
+        rows = model.objects.order_by().values('user_id').annotate(n=Count('id'))
+        for row in rows.iterator():
+            counts.setdefault(row['user_id'], dict.fromkeys(COUNTERS, 0))[counter] = row['n']
+
+    now = timezone.now()
+    with transaction.atomic():
+        ContributionStats.objects.all().delete()
+        ContributionStats.objects.bulk_create(
+            [ContributionStats(user_id=user_id, updated_at=now, **values) for user_id, values in counts.items()],
+            batch_size=1000,
+            update_conflicts=True,
+            unique_fields=['user'],
+            update_fields=[*COUNTERS, 'updated_at'],
+        )
+    return len(counts)
@@ -0,0 +1,154 @@
+"""
+Aggregation of RouteFeedback into per-cell rating statistics.
+
+Each feedback row is map-matched to the grid cells on the straight line
+between its start and end points. Ratings are folded into SegmentRating
+rows, one per (cell, disability type), which the community verified route
+then reads as edge weights. Disability types are stored under their
+scoring profile key (scoring.profile_key), so 'Wheelchair' feedback and a
+'wheelchair' route meet on the same rows.
+
+created_at is set when a row is built, not when its transaction commits, so
+a slow transaction can commit a row older than the watermark. Aggregation
+only reads rows older than FEEDBACK_SAFETY_LAG seconds to leave such
+transactions time to land.
+"""
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .grid import cells_along
+from .models import AggregationWatermark, RouteFeedback, SegmentRating
+from .scoring import profile_key
+
+logger = logging.getLogger(__name__)
+
+WATERMARK_NAME = 'route_feedback'
+
+# Rating considered neutral; cells rated above it improve a route's score
+NEUTRAL_RATING = 3
+
+
+def _feedback_cells(feedback):
+    return cells_along([
+        [float(feedback.start_lon), float(feedback.start_lat)],
+        [float(feedback.end_lon), float(feedback.end_lat)],
+    ])
+
+
+def _apply_batch(feedback_rows):
+    """Fold a batch of feedback into SegmentRating rows."""
+    alpha = getattr(settings, 'FEEDBACK_EWMA_ALPHA', 0.2)
+
+    ratings = []
+    for feedback in feedback_rows:
+        for cell in _feedback_cells(feedback):
+            ratings.append((cell, profile_key(feedback.disability_type), feedback.rating))
+
+    keys = {(cell, disability) for cell, disability, _ in ratings}
+    cells = {cell for cell, _ in keys}
+    existing = {
+        (row.cell, row.disability_type): row
+        for row in SegmentRating.objects.select_for_update().filter(cell__in=cells)
+        if (row.cell, row.disability_type) in keys
+    }
+
+    created = {}
+    for cell, disability, rating in ratings:
+        key = (cell, disability)
+        row = existing.get(key) or created.get(key)
+        if row is None:
+            row = SegmentRating(
+                cell=cell, disability_type=disability, rating_ewma=rating
+            )
+            created[key] = row
+        else:
+            row.rating_ewma += alpha * (rating - row.rating_ewma)
+        row.rating_count += 1
+        row.rating_sum += rating
+
+    if existing:
+        # bulk_update() skips auto_now, so stamp the rows here
+        now = timezone.now()
+        for row in existing.values():
+            row.updated_at = now
+        SegmentRating.objects.bulk_update(
+            existing.values(), ['rating_count', 'rating_sum', 'rating_ewma', 'updated_at']
+        )
+    if created:
+        SegmentRating.objects.bulk_create(created.values())
+
+
+def aggregate_feedback(batch_size=500):
+    """
+    Process feedback submitted since the last run.
+
+    Rows are read in (created_at, id) order after the stored watermark, and
+    the watermark advances in the same transaction as the statistics so a
+    crash never double-counts a batch. Rows newer than FEEDBACK_SAFETY_LAG
+    wait for a later run.
+
+    Returns:
+        Number of feedback rows processed
+    """
+    cutoff = timezone.now() - timedelta(seconds=getattr(settings, 'FEEDBACK_SAFETY_LAG', 60))
+    processed = 0
+    while True:
+        with transaction.atomic():
+            watermark, _ = AggregationWatermark.objects.select_for_update().get_or_create(
+                name=WATERMARK_NAME
+            )
+            pending = RouteFeedback.objects.filter(created_at__lte=cutoff).order_by('created_at', 'id')
+            if watermark.last_created_at is not None:
+                pending = pending.filter(
+                    Q(created_at__gt=watermark.last_created_at)
+                    | Q(created_at=watermark.last_created_at, id__gt=watermark.last_object_id)
+                )
+            batch = list(pending[:batch_size])
+            if not batch:
+                break
+
+            _apply_batch(batch)
+
+            watermark.last_created_at = batch[-1].created_at
+            watermark.last_object_id = str(batch[-1].id)
+            watermark.save()
+
+        processed += len(batch)
+        if len(batch) < batch_size:
+            break
+
+    logger.info(f"Aggregated {processed} route feedback rows")
+    return processed
+
+
+def community_adjustment(coordinates, disability_type):
+    """
+    Score adjustment for a route from community ratings of the cells it crosses.
+
+    Cells are weighted by how many ratings back them, so a single review
+    can't swing a route. Returns 0 when nobody has rated the area.
+    """
+    cells = cells_along(coordinates)
+    stats = SegmentRating.objects.filter(
+        cell__in=cells, disability_type=profile_key(disability_type)
+    ).values_list('rating_ewma', 'rating_count')
+
+    min_ratings = getattr(settings, 'FEEDBACK_MIN_RATINGS', 5)
+    weighted_sum = 0.0
+    total_weight = 0.0
+    for ewma, count in stats:
+        weight = min(1.0, count / min_ratings)
+        weighted_sum += (ewma - NEUTRAL_RATING) * weight
+        total_weight += weight
+
+    if not total_weight:
+        return 0.0
+
+    confidence = min(1.0, total_weight / max(1, len(cells)))
+    per_point = getattr(settings, 'FEEDBACK_SCORE_WEIGHT', 5)
+    return weighted_sum / total_weight * confidence * per_point
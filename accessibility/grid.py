@@ -0,0 +1,67 @@
+"""
+Fixed-size lat/lon grid used to bucket locations.
+
+We don't have a street graph, so map-matching and per-area aggregates are
+done against square grid cells. Cell keys are short strings ("row:col")
+that are stable for a given cell size and cheap to index.
+"""
+from math import ceil, floor
+
+from django.conf import settings
+
+
+def default_cell_size():
+    return getattr(settings, 'GRID_CELL_DEG', 0.01)
+
+
+def cell_index(lat, lon, size=None):
+    """Return the (row, col) of the cell containing a point."""
+    size = size or default_cell_size()
+    return floor(float(lat) / size), floor(float(lon) / size)
+
+
+def cell_key(lat, lon, size=None):
+    row, col = cell_index(lat, lon, size)
+    return f"{row}:{col}"
+
+
+def key_for_index(row, col):
+    return f"{row}:{col}"
+
+
+def parse_key(key):
+    row, col = key.split(':')
+    return int(row), int(col)
+
+
+def cell_center(row, col, size=None):
+    """Return the (lat, lon) at the center of a cell."""
+    size = size or default_cell_size()
+    return (row + 0.5) * size, (col + 0.5) * size
+
+
+def cells_along(coordinates, size=None):
+    """
+    Cells crossed by a polyline, in travel order and without repeats.
+
+    Args:
+        coordinates: list of [lon, lat] pairs, as returned in route responses
+    """
+    size = size or default_cell_size()
+    keys = []
+    seen = set()
+    points = list(coordinates)
+    if len(points) == 1:
+        points = points * 2
+
+    for (lon0, lat0), (lon1, lat1) in zip(points[:-1], points[1:]):
+        # Sample at half a cell so no crossed cell is skipped
+        span = max(abs(lat1 - lat0), abs(lon1 - lon0))
+        steps = max(1, ceil(span / (size / 2)))
+        for i in range(steps + 1):
+            f = i / steps
+            key = cell_key(lat0 + (lat1 - lat0) * f, lon0 + (lon1 - lon0) * f, size)
+            if key not in seen:
+                seen.add(key)
+                keys.append(key)
+    return keys
@@ -0,0 +1,86 @@
+"""
+Normalization of report photos before they are stored.
+
+Phone photos arrive as multi-megabyte JPEGs with EXIF metadata (including
+GPS) and sideways orientation flags. Each photo is rotated upright, stripped
+of metadata, bounded to PHOTO_MAX_DIMENSION, re-encoded as WebP and given a
+small thumbnail variant.
+
+Decoding and encoding are CPU-bound, so they run in a process pool rather
+than on request or upload threads.
+"""
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from PIL import Image, ImageOps
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def process_pool():
+    """Process pool for image work, created on first use."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                # Workers start from a fork server rather than from this
+                # process, so they don't inherit its open files, such as
+                # the locked spool file of the upload that created the pool
+                method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else None
+                _pool = ProcessPoolExecutor(
+                    max_workers=getattr(settings, 'PHOTO_PROCESS_WORKERS', 2),
+                    mp_context=multiprocessing.get_context(method),
+                )
+    return _pool
+
+
+def _save_webp(image, path, quality):
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if 'A' in image.getbands() else 'RGB')
+    # Saving a fresh image without exif= drops all metadata
+    image.save(path, 'WEBP', quality=quality, method=4)
+
+
+def normalize_image(src_path, out_dir, max_dimension, thumbnail_size, quality):
+    """
+    Write upright, metadata-free WebP display and thumbnail variants.
+
+    Runs in a worker process, so it takes plain arguments only.
+
+    Returns:
+        (display_path, thumbnail_path)
+    """
+    stem = os.path.splitext(os.path.basename(src_path))[0]
+    display_path = os.path.join(out_dir, f"{stem}.webp")
+    thumbnail_path = os.path.join(out_dir, f"{stem}_thumb.webp")
+
+    with Image.open(src_path) as image:
+        # Let the JPEG decoder downscale while decoding when it can
+        image.draft('RGB', (max_dimension, max_dimension))
+        image = ImageOps.exif_transpose(image)
+
+        image.thumbnail((max_dimension, max_dimension), Image.LANCZOS)
+        _save_webp(image, display_path, quality)
+
+        image.thumbnail((thumbnail_size, thumbnail_size), Image.LANCZOS)
+        _save_webp(image, thumbnail_path, quality)
+
+    return display_path, thumbnail_path
+
+
+def process_photo(src_path, out_dir):
+    """Normalize a photo in the process pool and wait for the result."""
+    os.makedirs(out_dir, exist_ok=True)
+    future = process_pool().submit(
+        normalize_image,
+        src_path,
+        out_dir,
+        getattr(settings, 'PHOTO_MAX_DIMENSION', 1600),
+        getattr(settings, 'PHOTO_THUMBNAIL_SIZE', 320),
+        getattr(settings, 'PHOTO_WEBP_QUALITY', 80),
+    )
+    return future.result(timeout=getattr(settings, 'PHOTO_PROCESS_TIMEOUT', 60))
@@ -0,0 +1,20 @@
+"""
+Fold new RouteFeedback into per-cell rating statistics.
+
+Intended to run periodically (e.g. from cron):
+    python manage.py aggregate_feedback
+"""
+from django.core.management.base import BaseCommand
+
+from accessibility.feedback import aggregate_feedback
+
+
+class Command(BaseCommand):
+    help = "Aggregate route feedback submitted since the last run"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        processed = aggregate_feedback(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Processed {processed} feedback rows"))
@@ -0,0 +1,351 @@
+"""
+Offline micro-benchmarks for performance-sensitive code paths.
+
+Usage:
+    python manage.py benchmark scoring
+    python manage.py benchmark scoring --routes 1000 --hazards 10000
+    python manage.py benchmark polyline --vertices 500
+    python manage.py benchmark upload_memory --size-mb 10
+    python manage.py benchmark upload_throughput --files 200 --size-kb 500 --workers 4
+    python manage.py benchmark startup --top 15
+    python manage.py benchmark volunteers --volunteers 20000
+    python manage.py benchmark leaderboard --volunteers 100000
+"""
+import json
+import os
+import tempfile
+import shutil
+import subprocess
+import sys
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = "Run offline performance benchmarks"
+
+    benchmarks = ['scoring', 'polyline', 'upload_memory', 'upload_throughput', 'startup', 'volunteers', 'leaderboard']
+
+    def add_arguments(self, parser):
+        parser.add_argument('benchmark', choices=self.benchmarks)
+        parser.add_argument('--repeat', type=int, default=5,
+                            help='Number of timed runs (best is reported)')
+        parser.add_argument('--routes', type=int, default=1000)
+        parser.add_argument('--hazards', type=int, default=10000)
+        parser.add_argument('--vertices', type=int, default=500,
+                            help='Vertices per route for the polyline benchmark')
+        parser.add_argument('--size-mb', type=int, default=10,
+                            help='File size for upload benchmarks')
+        parser.add_argument('--files', type=int, default=200,
+                            help='Number of files for the throughput benchmark')
+        parser.add_argument('--size-kb', type=int, default=500,
+                            help='File size for the throughput benchmark')
+        parser.add_argument('--workers', type=int, default=4,
+                            help='Concurrent uploads for the throughput benchmark')
+        parser.add_argument('--volunteers', type=int, default=20000,
+                            help='Volunteers for the volunteers and leaderboard benchmarks')
+        parser.add_argument('--top', type=int, default=10,
+                            help='Slowest imports to list for the startup benchmark')
+
+    def handle(self, *args, **options):
+        handler = getattr(self, f"bench_{options['benchmark']}", None)
+        if handler is None:
+            raise CommandError(f"Unknown benchmark: {options['benchmark']}")
+        handler(**options)
+
+    def report(self, label, timings, unit='ms'):
+        best = min(timings)
+        mean = sum(timings) / len(timings)
+        self.stdout.write(f"{label}: best {best:.2f} {unit}, mean {mean:.2f} {unit}")
+
+    def timed(self, fn, repeat):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            fn()
+            timings.append((time.perf_counter() - started) * 1000)
+        return timings
+
+    def bench_scoring(self, routes, hazards, repeat, **options):
+        """Score N candidate routes against M hazards with one profile."""
+        import numpy as np
+        from accessibility.scoring import ROUTE_STRATEGIES, get_profile
+
+        rng = np.random.default_rng(42)
+        # Routes and hazards scattered over a ~20 km square around Delhi
+        center_lat, center_lon, spread = 28.6139, 77.2090, 0.1
+        route_types = list(ROUTE_STRATEGIES)
+        candidates = []
+        for i in range(routes):
+            lat0, lat1 = center_lat + rng.uniform(-spread, spread, 2)
+            lon0, lon1 = center_lon + rng.uniform(-spread, spread, 2)
+            candidates.append({
+                'type': route_types[i % len(route_types)],
+                'distance_km': float(rng.uniform(0.5, 15)),
+                'coordinates': [
+                    [lon0, lat0],
+                    [(lon0 + lon1) / 2, (lat0 + lat1) / 2],
+                    [lon1, lat1],
+                ],
+            })
+        hazard_points = np.column_stack([
+            center_lat + rng.uniform(-spread, spread, hazards),
+            center_lon + rng.uniform(-spread, spread, hazards),
+        ])
+        hazard_weights = {route_type: rng.choice([0.0, 3.0, 5.0], hazards) for route_type in route_types}
+        profile = get_profile('wheelchair')
+        weather = {'condition': 'Rain'}
+
+        timings = self.timed(
+            lambda: profile.score(candidates, hazard_points, hazard_weights, weather),
+            repeat,
+        )
+        self.report(f"scoring {routes} routes x {hazards} hazards", timings)
+
+    def bench_polyline(self, vertices, repeat, **options):
+        """Compare JSON coordinate arrays with encoded polylines."""
+        import random
+        from accessibility.polyline import encode
+
+        rng = random.Random(42)
+        lon, lat = 77.2090, 28.6139
+        coordinates = []
+        for _ in range(vertices):
+            # Street-scale steps, as a real routed path would have
+            lon += rng.uniform(-0.0005, 0.0005)
+            lat += rng.uniform(-0.0005, 0.0005)
+            coordinates.append([lon, lat])
+        routes = [{'type': 'fastest', 'coordinates': coordinates} for _ in range(3)]
+
+        raw = json.dumps({'routes': routes})
+        self.report(
+            f"json coordinates ({vertices} vertices x 3 routes)",
+            self.timed(lambda: json.dumps({'routes': routes}), repeat),
+        )
+        self.stdout.write(f"  payload: {len(raw.encode())} bytes")
+
+        for precision in (5, 6):
+            encoded_routes = [
+                {'type': r['type'], 'polyline': encode(r['coordinates'], precision)}
+                for r in routes
+            ]
+            payload = json.dumps({'routes': encoded_routes})
+            self.report(
+                f"polyline precision {precision} (encode + json)",
+                self.timed(lambda: json.dumps({'routes': [
+                    {'type': r['type'], 'polyline': encode(r['coordinates'], precision)}
+                    for r in routes
+                ]}), repeat),
+            )
+            self.stdout.write(
+                f"  payload: {len(payload.encode())} bytes "
+                f"({len(payload.encode()) / len(raw.encode()):.0%} of json)"
+            )
+
+    def peak_memory(self, fn):
+        """Run fn and return its peak traced Python allocation in MB."""
+        tracemalloc.start()
+        try:
+            fn()
+            return tracemalloc.get_traced_memory()[1] / (1024 * 1024)
+        finally:
+            tracemalloc.stop()
+
+    def bench_upload_memory(self, size_mb, **options):
+        """Peak memory of photo uploads against a local fake Supabase."""
+        from django.core.files import File
+        from django.test import override_settings
+        from accessibility.testing import FakeStorageUpstream, supabase_service_for
+
+        fd, path = tempfile.mkstemp(suffix='.jpg')
+        with os.fdopen(fd, 'wb') as fh:
+            for _ in range(size_mb):
+                fh.write(os.urandom(1024 * 1024))
+
+        try:
+            with FakeStorageUpstream() as upstream:
+                service = supabase_service_for(upstream, bucket='bench')
+
+                def buffered():
+                    # What upload_file used to do: read the whole file first
+                    with open(path, 'rb') as fh:
+                        content = fh.read()
+                    service.client.storage.from_(service.bucket_name).upload(
+                        path='reports/buffered.jpg', file=content,
+                        file_options={'content-type': 'image/jpeg'},
+                    )
+
+                def streamed():
+                    with open(path, 'rb') as fh:
+                        assert service.upload_file(File(fh), 'reports/streamed.jpg')
+
+                def resumable():
+                    with open(path, 'rb') as fh:
+                        assert service.upload_file(File(fh), 'reports/resumable.jpg')
+
+                self.stdout.write(f"{size_mb} MB upload, peak traced memory:")
+                self.stdout.write(f"  buffered read():      {self.peak_memory(buffered):7.2f} MB")
+                with override_settings(PHOTO_RESUMABLE_THRESHOLD=size_mb * 1024 * 1024 + 1):
+                    self.stdout.write(f"  streamed multipart:   {self.peak_memory(streamed):7.2f} MB")
+                with override_settings(PHOTO_RESUMABLE_THRESHOLD=0):
+                    self.stdout.write(f"  resumable (TUS):      {self.peak_memory(resumable):7.2f} MB")
+
+                # Multipart bodies carry a few hundred bytes of framing
+                for name in ('buffered.jpg', 'streamed.jpg', 'resumable.jpg'):
+                    stored = upstream.objects.get(f'reports/{name}', {})
+                    if stored.get('size', 0) < size_mb * 1024 * 1024:
+                        raise CommandError(f"{name} arrived incomplete: {stored}")
+        finally:
+            os.remove(path)
+
+    def bench_upload_throughput(self, files, size_kb, workers, **options):
+        """Upload rate of each storage backend, with no network access needed."""
+        from django.core.files import File
+        from accessibility.storage import LocalStorageBackend
+        from accessibility.testing import FakeStorageUpstream, MemoryObjectIndex, supabase_service_for
+
+        work_dir = tempfile.mkdtemp(prefix='upload-bench-')
+        try:
+            # Distinct contents, so deduplication does not skip any upload
+            paths = []
+            for i in range(files):
+                path = os.path.join(work_dir, f"{i}.jpg")
+                with open(path, 'wb') as fh:
+                    fh.write(os.urandom(size_kb * 1024))
+                paths.append(path)
+
+            def run(backend):
+                def upload(path):
+                    with open(path, 'rb') as fh:
+                        return backend.upload_file(File(fh))
+
+                start = time.perf_counter()
+                with ThreadPoolExecutor(max_workers=workers) as pool:
+                    urls = list(pool.map(upload, paths))
+                elapsed = time.perf_counter() - start
+                if not all(urls):
+                    raise CommandError(f"{urls.count(None)} uploads failed")
+
+                start = time.perf_counter()
+                deleted = backend.delete_files(urls)
+                delete_elapsed = time.perf_counter() - start
+                if deleted != files:
+                    raise CommandError(f"Deleted {deleted} of {files} objects")
+                return elapsed, delete_elapsed
+
+            local = LocalStorageBackend(
+                os.path.join(work_dir, 'storage'), '/media/storage/', index=MemoryObjectIndex()
+            )
+            with FakeStorageUpstream() as upstream:
+                supabase = supabase_service_for(upstream, bucket='bench')
+                supabase.index = MemoryObjectIndex()
+                results = [('local', run(local)), ('supabase (fake)', run(supabase))]
+
+            total_mb = files * size_kb / 1024
+            self.stdout.write(f"{files} x {size_kb} KB uploads, {workers} workers:")
+            for name, (elapsed, delete_elapsed) in results:
+                self.stdout.write(
+                    f"  {name:16s} {files / elapsed:8.1f} files/s {total_mb / elapsed:8.1f} MB/s"
+                    f"   batch delete {delete_elapsed * 1000:7.1f} ms"
+                )
+        finally:
+            shutil.rmtree(work_dir)
+
+    # What a worker does before serving its first request: configure Django
+    # and import every view through the URLconf
+    STARTUP_SCRIPT = (
+        "import django; django.setup(); "
+        "from django.urls import get_resolver; get_resolver().url_patterns"
+    )
+
+    def bench_startup(self, repeat, top, **options):
+        """Boot time of fresh interpreters, with an import-time breakdown."""
+        env = {**os.environ, 'DJANGO_SETTINGS_MODULE': os.environ.get(
+            'DJANGO_SETTINGS_MODULE', 'saarthi_backend.settings'
+        )}
+        wall = []
+        imports = {}
+        for _ in range(repeat):
+            start = time.perf_counter()
+            result = subprocess.run(
+                [sys.executable, '-X', 'importtime', '-c', self.STARTUP_SCRIPT],
+                cwd=settings.BASE_DIR, env=env, capture_output=True, text=True,
+            )
+            wall.append(time.perf_counter() - start)
+            if result.returncode:
+                raise CommandError(result.stderr[-2000:])
+
+            # Lines look like "import time:  self [us] | cumulative | <indent>name"
+            for line in result.stderr.splitlines():
+                if not line.startswith('import time:') or 'self [us]' in line:
+                    continue
+                _, cumulative, name = line[len('import time:'):].split('|')
+                top_level = not name[1:].startswith(' ')
+                key = (name.strip(), top_level)
+                imports[key] = min(imports.get(key, float('inf')), int(cumulative))
+
+        first_party = ('accessibility', 'users', 'saarthi_backend')
+        self.stdout.write(f"Django startup ({repeat} fresh interpreters):")
+        self.stdout.write(f"  best wall time: {min(wall) * 1000:8.1f} ms")
+        self.stdout.write(f"  mean wall time: {sum(wall) / len(wall) * 1000:8.1f} ms")
+
+        self.stdout.write("Slowest top-level imports (cumulative, best of runs):")
+        slowest = sorted(
+            ((us, name) for (name, top_level), us in imports.items() if top_level), reverse=True
+        )
+        for us, name in slowest[:top]:
+            self.stdout.write(f"  {us / 1000:8.1f} ms  {name}")
+
+        self.stdout.write("Project modules:")
+        project = sorted(
+            ((us, name) for (name, _), us in imports.items() if name.split('.')[0] in first_party),
+            reverse=True,
+        )
+        for us, name in project[:top]:
+            self.stdout.write(f"  {us / 1000:8.1f} ms  {name}")
+
+    def bench_volunteers(self, volunteers, repeat, **options):
+        """Nearest-volunteer queries against a city-sized presence index."""
+        import random
+        from users.presence import PresenceIndex
+
+        rng = random.Random(0)
+        index = PresenceIndex()
+        # Spread over ~50 x 50 km, roughly a large city
+        for user_id in range(volunteers):
+            index.put(user_id, 28.4 + rng.random() * 0.45, 76.9 + rng.random() * 0.5, rng.random() * 5)
+        queries = [(28.4 + rng.random() * 0.45, 76.9 + rng.random() * 0.5) for _ in range(1000)]
+
+        self.stdout.write(f"{volunteers} volunteers, {len(queries)} queries:")
+        for k in (1, 5, 20):
+            best = min(self.timed(lambda: [index.nearest(lat, lon, k=k) for lat, lon in queries], repeat))
+            self.stdout.write(f"  k={k:<3d} {best / len(queries) * 1000:8.1f} us/query")
+
+    def bench_leaderboard(self, volunteers, repeat, **options):
+        """Point updates and rank lookups against a populated leaderboard."""
+        import random
+        from users.leaderboard import Leaderboard
+
+        rng = random.Random(0)
+        board = Leaderboard(autosync=False)
+        cities = [f"city-{i}" for i in range(20)]
+        for user_id in range(volunteers):
+            board.put(user_id, f"v{user_id}", rng.choice(cities), rng.randrange(5000), rng.random() * 5)
+        ids = [rng.randrange(volunteers) for _ in range(1000)]
+
+        self.stdout.write(f"{volunteers} volunteers, {len(ids)} operations:")
+        cases = [
+            ('update', lambda: [
+                board.put(user_id, f"v{user_id}", rng.choice(cities), rng.randrange(5000), 4.0)
+                for user_id in ids
+            ]),
+            ('my rank', lambda: [board.standing(user_id) for user_id in ids]),
+            ('top 10', lambda: [board.top(10) for _ in ids]),
+        ]
+        for label, run in cases:
+            best = min(self.timed(run, repeat))
+            self.stdout.write(f"  {label:<8s} {best / len(ids) * 1000:8.1f} us/op")
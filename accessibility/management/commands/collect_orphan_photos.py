@@ -0,0 +1,41 @@
+"""
+Delete photos that no report uses any more.
+
+    python manage.py collect_orphan_photos              # drain the deletion queue
+    python manage.py collect_orphan_photos --reconcile  # also scan the bucket first
+
+Run it periodically (e.g. hourly from cron); reconciliation is heavier and
+can run less often.
+"""
+from django.core.management.base import BaseCommand
+
+from accessibility.photo_gc import process_deletions, reconcile
+from accessibility.storage import photo_storage
+
+
+class Command(BaseCommand):
+    help = "Remove orphaned report photos from storage in batches"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reconcile', action='store_true',
+                            help='List stored objects and queue the unreferenced ones first')
+        parser.add_argument('--batch-size', type=int, default=None,
+                            help='Objects per storage delete call')
+        parser.add_argument('--page-size', type=int, default=None,
+                            help='Objects per listing page during reconciliation')
+        parser.add_argument('--grace-period', type=int, default=None,
+                            help='Seconds an unreferenced object is kept before it counts as orphaned')
+
+    def handle(self, *args, **options):
+        if options['reconcile']:
+            scanned, queued = reconcile(
+                photo_storage,
+                page_size=options['page_size'],
+                grace_period=options['grace_period'],
+            )
+            self.stdout.write(f"Scanned {scanned} objects, queued {queued} orphans")
+
+        deleted, kept = process_deletions(photo_storage, batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Deleted {deleted} objects, kept {kept} still in use"
+        ))
@@ -0,0 +1,20 @@
+"""
+Delete expired route IDs and deleted-report records older than
+ROUTE_CHANGES_RETENTION.
+
+Intended to run periodically (e.g. daily from cron):
+    python manage.py prune_route_changes
+"""
+from django.core.management.base import BaseCommand
+
+from accessibility.routes import prune
+
+
+class Command(BaseCommand):
+    help = "Delete expired route IDs and old deleted-report records"
+
+    def handle(self, *args, **options):
+        routes, deleted = prune()
+        self.stdout.write(self.style.SUCCESS(
+            f"Deleted {routes} expired routes and {deleted} deleted-report records"
+        ))
@@ -0,0 +1,16 @@
+"""
+Recompute per-user report and feedback counts.
+
+    python manage.py recount_contributions
+"""
+from django.core.management.base import BaseCommand
+
+from accessibility.contributions import recount
+
+
+class Command(BaseCommand):
+    help = "Recompute per-user contribution counters from the report and feedback tables"
+
+    def handle(self, *args, **options):
+        users = recount()
+        self.stdout.write(self.style.SUCCESS(f"Recounted contributions for {users} users"))
@@ -0,0 +1,52 @@
+"""
+Upload photos left in the spool by interrupted or failed background uploads.
+
+    python manage.py retry_photo_uploads
+
+Photos a live worker is still uploading are skipped, and so are files
+not named after a report ID.
+"""
+import os
+import uuid
+
+from django.core.management.base import BaseCommand
+
+from accessibility.models import AccessibilityReport
+from accessibility.uploads import claim_spooled, photo_upload_queue, spooled_photos
+
+
+class Command(BaseCommand):
+    help = "Retry photo uploads still waiting in the spool directory"
+
+    def handle(self, *args, **options):
+        uploaded = failed = discarded = busy = skipped = 0
+        for report_id, path in spooled_photos():
+            try:
+                report_id = str(uuid.UUID(report_id))
+            except ValueError:
+                self.stderr.write(self.style.WARNING(f"Skipping {path}: not named after a report ID"))
+                skipped += 1
+                continue
+
+            with claim_spooled(path) as claimed:
+                if not claimed:
+                    busy += 1
+                    continue
+
+            report = AccessibilityReport.objects.filter(pk=report_id).only('photo_status').first()
+            if report is None or report.photo_status == 'uploaded':
+                # Report deleted or already done; the spool copy is garbage
+                if os.path.exists(path):
+                    os.remove(path)
+                discarded += 1
+                continue
+
+            if photo_upload_queue.process(report_id, path):
+                uploaded += 1
+            else:
+                failed += 1
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Uploaded {uploaded}, failed {failed}, discarded {discarded}, in progress elsewhere {busy}, "
+            f"skipped {skipped}"
+        ))
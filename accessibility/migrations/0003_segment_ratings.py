@@ -0,0 +1,72 @@
+# Generated by Django 4.2.7 on 2026-10-19 05:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accessibility', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AggregationWatermark',
+            fields=[
+                ('name', models.CharField(max_length=50, primary_key=True, serialize=False)),
+                ('last_created_at', models.DateTimeField(blank=True, null=True)),
+                ('last_object_id', models.CharField(blank=True, max_length=64)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='SegmentRating',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cell', models.CharField(max_length=32)),
+                ('disability_type', models.CharField(max_length=50)),
+                ('rating_count', models.PositiveIntegerField(default=0)),
+                ('rating_sum', models.PositiveIntegerField(default=0)),
+                ('rating_ewma', models.FloatField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='accessibilityreport',
+            name='latitude',
+            field=models.DecimalField(decimal_places=8, max_digits=11),
+        ),
+        migrations.AlterField(
+            model_name='accessibilityreport',
+            name='longitude',
+            field=models.DecimalField(decimal_places=8, max_digits=11),
+        ),
+        migrations.AlterField(
+            model_name='routefeedback',
+            name='end_lat',
+            field=models.DecimalField(decimal_places=8, max_digits=11),
+        ),
+        migrations.AlterField(
+            model_name='routefeedback',
+            name='end_lon',
+            field=models.DecimalField(decimal_places=8, max_digits=11),
+        ),
+        migrations.AlterField(
+            model_name='routefeedback',
+            name='start_lat',
+            field=models.DecimalField(decimal_places=8, max_digits=11),
+        ),
+        migrations.AlterField(
+            model_name='routefeedback',
+            name='start_lon',
+            field=models.DecimalField(decimal_places=8, max_digits=11),
+        ),
+        migrations.AddIndex(
+            model_name='routefeedback',
+            index=models.Index(fields=['created_at', 'id'], name='accessibili_created_0d2a87_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='segmentrating',
+            unique_together={('cell', 'disability_type')},
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-19 05:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accessibility', '0003_segment_ratings'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='accessibilityreport',
+            index=models.Index(fields=['updated_at', 'latitude', 'longitude'], name='accessibili_updated_8a3cac_idx'),
+        ),
+    ]
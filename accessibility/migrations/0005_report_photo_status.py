@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-19 05:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accessibility', '0004_report_updated_at_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='accessibilityreport',
+            name='photo_status',
+            field=models.CharField(choices=[('none', 'None'), ('pending', 'Pending'), ('uploaded', 'Uploaded'), ('failed', 'Failed')], default='none', max_length=20),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-19 05:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accessibility', '0005_report_photo_status'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='accessibilityreport',
+            name='photo_thumbnail_url',
+            field=models.URLField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 4.2.7 on 2026-10-19 06:07
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import Count
+
+
+def count_contributions(apps, schema_editor):
+    AccessibilityReport = apps.get_model('accessibility', 'AccessibilityReport')
+    RouteFeedback = apps.get_model('accessibility', 'RouteFeedback')
+    ContributionStats = apps.get_model('accessibility', 'ContributionStats')
+
+    counts = {}
+    for model, counter in ((AccessibilityReport, 'report_count'), (RouteFeedback, 'feedback_count')):
+        for row in model.objects.order_by().values('user_id').annotate(n=Count('id')):
+            counts.setdefault(row['user_id'], {})[counter] = row['n']
+    ContributionStats.objects.bulk_create(
+        [ContributionStats(user_id=user_id, **values) for user_id, values in counts.items()],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0005_volunteer_leaderboard'),
+        ('accessibility', '0008_photo_deletions'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ContributionStats',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='contribution_stats', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('report_count', models.PositiveIntegerField(default=0)),
+                ('feedback_count', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='accessibilityreport',
+            index=models.Index(fields=['user', 'created_at'], name='accessibili_user_id_cfaf02_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='routefeedback',
+            index=models.Index(fields=['user', 'created_at'], name='accessibili_user_id_f7f1cf_idx'),
+        ),
+        migrations.RunPython(count_contributions, migrations.RunPython.noop),
+    ]
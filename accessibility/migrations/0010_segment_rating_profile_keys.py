@@ -0,0 +1,23 @@
+from django.db import migrations
+
+
+def reset_segment_ratings(apps, schema_editor):
+    """
+    Drop the ratings aggregated under raw disability labels.
+
+    The next aggregate_feedback run re-reads all feedback from the start
+    and stores it under scoring profile keys.
+    """
+    apps.get_model('accessibility', 'SegmentRating').objects.all().delete()
+    apps.get_model('accessibility', 'AggregationWatermark').objects.filter(name='route_feedback').delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accessibility', '0009_contribution_stats'),
+    ]
+
+    operations = [
+        migrations.RunPython(reset_segment_ratings, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 4.2.7 on 2026-10-19 06:20
+
+from django.db import migrations, models
+from django.db.models import F, Q
+import django.utils.timezone
+
+
+def backfill_status_changed_at(apps, schema_editor):
+    """
+    Best guess for existing rows: active reports have been active since they
+    were created, and the last edit of the others is the latest their
+    status can have changed.
+    """
+    AccessibilityReport = apps.get_model('accessibility', 'AccessibilityReport')
+    AccessibilityReport.objects.filter(status='Active').update(status_changed_at=F('created_at'))
+    AccessibilityReport.objects.filter(~Q(status='Active')).update(status_changed_at=F('updated_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accessibility', '0011_cache_versions'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='KnownRoute',
+            fields=[
+                ('route_id', models.CharField(max_length=16, primary_key=True, serialize=False)),
+                ('polyline', models.TextField()),
+                ('expires_at', models.DateTimeField(db_index=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='accessibilityreport',
+            name='status_changed_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.RunPython(backfill_status_changed_at, migrations.RunPython.noop),
+        migrations.CreateModel(
+            name='DeletedReport',
+            fields=[
+                ('report_id', models.UUIDField(primary_key=True, serialize=False)),
+                ('latitude', models.DecimalField(decimal_places=8, max_digits=11)),
+                ('longitude', models.DecimalField(decimal_places=8, max_digits=11)),
+                ('disability_types', models.JSONField(default=list)),
+                ('created_at', models.DateTimeField()),
+                ('deleted_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['deleted_at', 'latitude', 'longitude'], name='accessibili_deleted_279d7a_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 4.2.7 on 2026-10-19 06:37
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accessibility', '0012_route_changes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='storedobject',
+            name='removed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='storedobject',
+            name='used_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
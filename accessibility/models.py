@@ -1,6 +1,7 @@
 import uuid
 from django.db import models
 from django.conf import settings
+from django.utils import timezone
 
 
 class AccessibilityReport(models.Model):
@@ -18,6 +19,13 @@ class AccessibilityReport(models.Model):
         ('Duplicate', 'Duplicate'),
     ]
     
+    PHOTO_STATUS_CHOICES = [
+        ('none', 'None'),
+        ('pending', 'Pending'),
+        ('uploaded', 'Uploaded'),
+        ('failed', 'Failed'),
+    ]
+    
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     latitude = models.DecimalField(max_digits=11, decimal_places=8)
     longitude = models.DecimalField(max_digits=11, decimal_places=8)
@@ -26,7 +34,11 @@ class AccessibilityReport(models.Model):
     severity = models.CharField(max_length=20, choices=SEVERITY_CHOICES, default='Medium')
     description = models.TextField(max_length=200)
     photo_url = models.URLField(blank=True, null=True)
+    photo_thumbnail_url = models.URLField(blank=True, null=True)
+    photo_status = models.CharField(max_length=20, choices=PHOTO_STATUS_CHOICES, default='none')
     status = models.CharField(max_length=50, choices=STATUS_CHOICES, default='Active')
+    # When status last changed; route change checks read resolutions from it
+    status_changed_at = models.DateTimeField(default=timezone.now)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
@@ -37,11 +49,29 @@ class AccessibilityReport(models.Model):
             models.Index(fields=['latitude', 'longitude']),
             models.Index(fields=['severity', 'status']),
             models.Index(fields=['created_at']),
+            models.Index(fields=['updated_at', 'latitude', 'longitude']),
+            # "My reports", newest first
+            models.Index(fields=['user', 'created_at']),
         ]
 
     def __str__(self):
         return f"{self.problem_type} ({self.severity}) - {self.status}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_status = instance.__dict__.get('status')
+        return instance
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding and self.status != getattr(self, '_loaded_status', self.status):
+            self.status_changed_at = timezone.now()
+            update_fields = kwargs.get('update_fields')
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, 'status_changed_at'}
+        super().save(*args, **kwargs)
+        self._loaded_status = self.status
+
 
 class RouteFeedback(models.Model):
     RATING_CHOICES = [
@@ -65,6 +95,155 @@ class RouteFeedback(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['created_at', 'id']),
+            # "My feedback", newest first
+            models.Index(fields=['user', 'created_at']),
+        ]
+
+    def __str__(self):
+        return f"Feedback: {self.rating}/5 - {self.disability_type}"
+
+class SegmentRating(models.Model):
+    """
+    Rolling route feedback statistics for one grid cell and disability type.
+
+    Maintained incrementally by accessibility.feedback.aggregate_feedback.
+    """
+    cell = models.CharField(max_length=32)
+    disability_type = models.CharField(max_length=50)
+    rating_count = models.PositiveIntegerField(default=0)
+    rating_sum = models.PositiveIntegerField(default=0)
+    rating_ewma = models.FloatField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = [('cell', 'disability_type')]
+
+    def __str__(self):
+        return f"{self.cell} [{self.disability_type}]: {self.rating_ewma:.2f} ({self.rating_count})"
+
+
+class AggregationWatermark(models.Model):
+    """
+    Position of an incremental job in a created_at-ordered table.
+
+    The (created_at, object_id) pair marks the last row processed so that
+    rows sharing a timestamp are neither skipped nor counted twice.
+    """
+    name = models.CharField(max_length=50, primary_key=True)
+    last_created_at = models.DateTimeField(null=True, blank=True)
+    last_object_id = models.CharField(max_length=64, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name} @ {self.last_created_at}"
+
+
+class KnownRoute(models.Model):
+    """
+    Geometry of a route handed out to a client, so change checks can send
+    just its ID. Rows expire after ROUTE_ID_TTL seconds.
+    """
+    route_id = models.CharField(max_length=16, primary_key=True)
+    polyline = models.TextField()
+    expires_at = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return self.route_id
+
+
+class DeletedReport(models.Model):
+    """
+    Where a deleted report was, so route change checks can tell clients it
+    is gone. Kept for ROUTE_CHANGES_RETENTION seconds.
+    """
+    report_id = models.UUIDField(primary_key=True)
+    latitude = models.DecimalField(max_digits=11, decimal_places=8)
+    longitude = models.DecimalField(max_digits=11, decimal_places=8)
+    disability_types = models.JSONField(default=list)
+    created_at = models.DateTimeField()
+    deleted_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['deleted_at', 'latitude', 'longitude']),
+        ]
+
+    def __str__(self):
+        return f"{self.report_id} deleted {self.deleted_at}"
+
+
+class CacheVersion(models.Model):
+    """
+    Version counter shared by every server process.
+
+    Per-process caches embed the version in their keys; bumping it here
+    invalidates their entries everywhere at once.
+    """
+    name = models.CharField(max_length=50, primary_key=True)
+    version = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name} v{self.version}"
+
+
+class StoredObject(models.Model):
+    """
+    Object in photo storage, keyed by the SHA-256 of its contents.
+
+    Lets uploads of bytes we already hold return the existing URL instead
+    of sending the file again. used_at is the last time an upload was
+    handed the URL; removed_at is set once photo GC has decided to delete
+    the object, after which uploads store the bytes again.
+    """
+    content_hash = models.CharField(max_length=64, primary_key=True)
+    path = models.CharField(max_length=255)
+    url = models.URLField(max_length=500)
+    size = models.PositiveIntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    used_at = models.DateTimeField(default=timezone.now)
+    removed_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return self.path
+
+
+class PhotoDeletion(models.Model):
+    """
+    Photo queued for removal from storage.
+
+    Rows are written when reports lose their photos and drained in batches
+    by `python manage.py collect_orphan_photos`.
+    """
+    url = models.URLField(max_length=500)
+    attempts = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['id']
+
+    def __str__(self):
+        return self.url
+
+
+class ContributionStats(models.Model):
+    """
+    Per-user counts of reports and route feedback.
+
+    Maintained on write by the signals in accessibility/signals.py, so
+    profile screens read one row instead of counting.
+    """
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='contribution_stats'
+    )
+    report_count = models.PositiveIntegerField(default=0)
+    feedback_count = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
-        return f"Feedback: {self.rating}/5 - {self.disability_type}"
\ No newline at end of file
+        return f"{self.user_id}: {self.report_count} reports, {self.feedback_count} feedback"
@@ -0,0 +1,168 @@
+"""
+Removal of photos that no report uses any more.
+
+Objects become garbage when reports are deleted or get a new photo, and
+when a report disappears before its background upload lands. Their URLs
+are queued in PhotoDeletion and removed by process_deletions() with one
+batched storage call per PHOTO_GC_BATCH_SIZE objects. reconcile() catches
+everything else by listing the bucket page by page and queueing objects
+no report references, so memory stays bounded by the page size.
+
+Stored objects are content-addressed and can back several reports, so a
+queued URL is only deleted once no report points at it. Deduplicated
+uploads are handed existing URLs before the report that uses them is
+saved, so objects an upload was handed within PHOTO_GC_REUSE_WINDOW are
+kept too. Before deleting, GC marks the StoredObject row removed in the
+same transaction that checked the references; uploads then store the bytes
+again instead of reusing the URL.
+
+    python manage.py collect_orphan_photos [--reconcile]
+"""
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+# Storage prefixes written by the photo pipeline; nothing else is touched
+GC_PREFIXES = ('reports', 'uploads')
+
+
+def queue_photo_deletion(*urls):
+    """Queue photo URLs for removal. Empty values are ignored."""
+    from .models import PhotoDeletion
+
+    urls = [url for url in urls if url]
+    PhotoDeletion.objects.bulk_create([PhotoDeletion(url=url) for url in urls])
+    return len(urls)
+
+
+def referenced_urls(urls):
+    """Subset of urls that some report still uses as a photo or thumbnail."""
+    from .models import AccessibilityReport
+
+    urls = set(urls)
+    referenced = set()
+    rows = AccessibilityReport.objects.filter(
+        Q(photo_url__in=urls) | Q(photo_thumbnail_url__in=urls)
+    ).values_list('photo_url', 'photo_thumbnail_url')
+    for photo_url, thumbnail_url in rows:
+        referenced.update((photo_url, thumbnail_url))
+    return referenced & urls
+
+
+def queued_urls(urls):
+    """Subset of urls already waiting in the deletion queue."""
+    from .models import PhotoDeletion
+
+    return set(PhotoDeletion.objects.filter(url__in=list(urls)).values_list('url', flat=True))
+
+
+def retire_unreferenced(urls, reuse_window=None):
+    """
+    Decide which of urls can be deleted, and stop deduplication handing them out.
+
+    Must run in the transaction that deletes the objects: the StoredObject
+    rows are locked first, so a concurrent lookup either stamps its row as
+    used before this checks it, or waits and then skips the retired row.
+
+    Returns:
+        Subset of urls still in use, which must not be deleted
+    """
+    from .models import StoredObject
+
+    if reuse_window is None:
+        reuse_window = getattr(settings, 'PHOTO_GC_REUSE_WINDOW', 60 * 60)
+    now = timezone.now()
+    urls = set(urls)
+
+    rows = StoredObject.objects.select_for_update().filter(url__in=urls).values_list('url', 'used_at')
+    recently_used = {url for url, used_at in rows if used_at > now - timedelta(seconds=reuse_window)}
+    live = referenced_urls(urls) | recently_used
+    StoredObject.objects.filter(url__in=urls - live).update(removed_at=now)
+    return live
+
+
+def process_deletions(storage, batch_size=None):
+    """
+    Drain the deletion queue in batches.
+
+    Several workers can run this at once; each claims its batch with
+    SKIP LOCKED. A batch whose storage call fails stays queued with its
+    attempt count raised, and the run stops there.
+
+    Returns:
+        (deleted, kept) object counts; kept objects were still in use
+    """
+    from .models import PhotoDeletion
+
+    if not storage.is_configured():
+        logger.error("Photo storage not configured, leaving deletion queue alone")
+        return 0, 0
+
+    batch_size = batch_size or getattr(settings, 'PHOTO_GC_BATCH_SIZE', 1000)
+    max_attempts = getattr(settings, 'PHOTO_GC_MAX_ATTEMPTS', 5)
+    deleted = kept = 0
+
+    while True:
+        with transaction.atomic():
+            batch = list(
+                PhotoDeletion.objects.select_for_update(skip_locked=True)
+                .filter(attempts__lt=max_attempts)
+                .values_list('id', 'url')[:batch_size]
+            )
+            if not batch:
+                break
+
+            ids = [row_id for row_id, _ in batch]
+            urls = {url for _, url in batch}
+            live = retire_unreferenced(urls)
+            try:
+                deleted += storage.delete_files(urls - live, fail_silently=False)
+            except Exception as e:
+                logger.error(f"Photo GC batch of {len(urls)} failed: {e}")
+                PhotoDeletion.objects.filter(id__in=ids).update(attempts=F('attempts') + 1)
+                break
+
+            kept += len(live)
+            PhotoDeletion.objects.filter(id__in=ids).delete()
+
+    logger.info(f"Photo GC deleted {deleted} objects, kept {kept} still in use")
+    return deleted, kept
+
+
+def reconcile(storage, page_size=None, grace_period=None):
+    """
+    Queue stored photos that no report references.
+
+    Objects younger than grace_period seconds are left alone: they may
+    belong to an upload that has not been attached to its report yet.
+
+    Returns:
+        (scanned, queued) object counts
+    """
+    page_size = page_size or getattr(settings, 'PHOTO_GC_PAGE_SIZE', 1000)
+    if grace_period is None:
+        grace_period = getattr(settings, 'PHOTO_GC_GRACE_PERIOD', 24 * 60 * 60)
+    cutoff = timezone.now() - timedelta(seconds=grace_period)
+
+    scanned = queued = 0
+    for prefix in GC_PREFIXES:
+        for page in storage.list_files(prefix, page_size):
+            scanned += len(page)
+            candidates = {
+                storage.get_public_url(item['path'])
+                for item in page
+                if item['updated_at'] is not None and item['updated_at'] < cutoff
+            }
+            if not candidates:
+                continue
+            orphans = candidates - referenced_urls(candidates) - queued_urls(candidates)
+            queued += queue_photo_deletion(*sorted(orphans))
+
+    logger.info(f"Photo GC reconciliation scanned {scanned} objects, queued {queued}")
+    return scanned, queued
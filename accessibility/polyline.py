@@ -0,0 +1,114 @@
+"""
+Encoded polyline geometry (Google polyline algorithm format).
+
+Route coordinates are [lon, lat] pairs in our responses, while the polyline
+format stores latitude first. encode() and decode() take and return [lon, lat]
+pairs so callers never have to swap axes themselves.
+"""
+from rest_framework.exceptions import ValidationError
+
+DEFAULT_PRECISION = 5
+MAX_PRECISION = 7
+
+GEOMETRY_COORDINATES = 'coordinates'
+GEOMETRY_POLYLINE = 'polyline'
+
+
+def _encode_value(value, out):
+    value = ~(value << 1) if value < 0 else value << 1
+    while value >= 0x20:
+        out.append(chr((0x20 | (value & 0x1f)) + 63))
+        value >>= 5
+    out.append(chr(value + 63))
+
+
+def encode(coordinates, precision=DEFAULT_PRECISION):
+    """
+    Encode [lon, lat] pairs as a polyline string.
+
+    Args:
+        coordinates: iterable of [lon, lat] pairs
+        precision: number of decimal places kept (5 = ~1 m)
+    """
+    factor = 10 ** precision
+    out = []
+    prev_lat = prev_lon = 0
+    for lon, lat in coordinates:
+        lat = round(lat * factor)
+        lon = round(lon * factor)
+        _encode_value(lat - prev_lat, out)
+        _encode_value(lon - prev_lon, out)
+        prev_lat, prev_lon = lat, lon
+    return ''.join(out)
+
+
+def decode(encoded, precision=DEFAULT_PRECISION):
+    """
+    Decode a polyline string into [lon, lat] pairs.
+
+    Raises:
+        ValueError: if the string is truncated or contains invalid characters
+    """
+    factor = 10 ** precision
+    coordinates = []
+    index = 0
+    lat = lon = 0
+    length = len(encoded)
+
+    while index < length:
+        deltas = []
+        for _ in range(2):
+            shift = result = 0
+            while True:
+                if index >= length:
+                    raise ValueError("Truncated polyline")
+                byte = ord(encoded[index]) - 63
+                index += 1
+                if byte < 0 or byte > 0x3f:
+                    raise ValueError(f"Invalid polyline character at position {index - 1}")
+                result |= (byte & 0x1f) << shift
+                shift += 5
+                if byte < 0x20:
+                    break
+            deltas.append(~(result >> 1) if result & 1 else result >> 1)
+        lat += deltas[0]
+        lon += deltas[1]
+        coordinates.append([lon / factor, lat / factor])
+
+    return coordinates
+
+
+def geometry_options(request):
+    """
+    Read the geometry encoding a client asked for.
+
+    Clients opt in with ?geometry=polyline and may pass ?precision=N.
+
+    Returns:
+        (format, precision) tuple
+    """
+    geometry = request.query_params.get('geometry', GEOMETRY_COORDINATES)
+    if geometry not in (GEOMETRY_COORDINATES, GEOMETRY_POLYLINE):
+        raise ValidationError({'geometry': [f"Must be '{GEOMETRY_COORDINATES}' or '{GEOMETRY_POLYLINE}'."]})
+
+    try:
+        precision = int(request.query_params.get('precision', DEFAULT_PRECISION))
+    except ValueError:
+        raise ValidationError({'precision': ["Must be an integer."]})
+    if not 1 <= precision <= MAX_PRECISION:
+        raise ValidationError({'precision': [f"Must be between 1 and {MAX_PRECISION}."]})
+
+    return geometry, precision
+
+
+def apply_geometry(item, options, key='coordinates'):
+    """
+    Replace item[key] with an encoded polyline when the client opted in.
+
+    The encoded form is stored under 'polyline' with its 'polyline_precision'.
+    """
+    geometry, precision = options
+    if geometry == GEOMETRY_POLYLINE and key in item:
+        item['polyline'] = encode(item.pop(key), precision)
+        item['polyline_precision'] = precision
+    return item
@@ -0,0 +1,182 @@
+"""
+Accessible reachability ("isochrone") computation.
+
+The area around an origin is split into small grid cells. Cells holding an
+active Critical or High hazard relevant to the user's profile are blocked,
+and a Dijkstra expansion from the origin cell collects every cell that can
+be reached within the distance budget without passing through one.
+
+Results are cached per origin cell, profile and budget in the default
+cache, which is per process unless CACHES says otherwise. The cache key
+embeds a hazard version kept in the database (CacheVersion), which
+signals.py bumps whenever a report starts or stops blocking cells, or a
+blocking report moves. Every process reads the version before using its
+cache, so a change made on one worker invalidates the areas on all of them.
+"""
+import heapq
+from math import cos, hypot, radians
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F
+
+from .grid import cell_center, cell_index
+from .models import AccessibilityReport, CacheVersion
+
+KM_PER_DEG_LAT = 111.32
+
+# Walking pace implied by route durations (12 min per km)
+MINUTES_PER_KM = 12
+
+BLOCKING_SEVERITIES = ('Critical', 'High')
+
+HAZARD_VERSION_NAME = 'hazards'
+
+# Report fields that decide which cells a report blocks
+HAZARD_FIELDS = frozenset(['status', 'severity', 'latitude', 'longitude', 'disability_types'])
+
+NEIGHBOURS = [
+    (-1, 0), (1, 0), (0, -1), (0, 1),
+    (-1, -1), (-1, 1), (1, -1), (1, 1),
+]
+
+
+def hazard_version():
+    """Current hazard version; one primary key lookup."""
+    return CacheVersion.objects.filter(name=HAZARD_VERSION_NAME).values_list('version', flat=True).first() or 0
+
+
+def bump_hazard_version():
+    """Invalidate everything derived from the current set of hazards."""
+    updated = CacheVersion.objects.filter(name=HAZARD_VERSION_NAME).update(version=F('version') + 1)
+    if not updated:
+        _, created = CacheVersion.objects.get_or_create(name=HAZARD_VERSION_NAME, defaults={'version': 1})
+        if not created:
+            # Created concurrently
+            CacheVersion.objects.filter(name=HAZARD_VERSION_NAME).update(version=F('version') + 1)
+
+
+def blocking_state(report):
+    """
+    What a report contributes to blocked_cells(), or None if it blocks nothing.
+
+    Two reports with equal states block the same cells for every profile.
+    """
+    if report.status != 'Active' or report.severity not in BLOCKING_SEVERITIES or report.latitude is None:
+        return None
+    return (
+        float(report.latitude), float(report.longitude),
+        tuple(sorted(report.disability_types or [])),
+    )
+
+
+def _cell_size():
+    return getattr(settings, 'REACHABILITY_CELL_DEG', 0.002)
+
+
+def blocked_cells(profile, min_lat, max_lat, min_lon, max_lon, size):
+    """Cells containing an active blocking hazard for the profile."""
+    reports = AccessibilityReport.objects.filter(
+        status='Active',
+        severity__in=BLOCKING_SEVERITIES,
+        latitude__gte=min_lat,
+        latitude__lte=max_lat,
+        longitude__gte=min_lon,
+        longitude__lte=max_lon,
+    ).only('latitude', 'longitude', 'disability_types')
+
+    return {
+        cell_index(report.latitude, report.longitude, size)
+        for report in reports
+        if profile.is_relevant(report)
+    }
+
+
+def expand(origin_cell, blocked, max_km, row_km, col_km):
+    """
+    Bounded Dijkstra over grid cells.
+
+    Diagonal moves are only allowed when both cells they cut across are
+    open, so a path can't squeeze between two blocked cells. The origin is
+    always reachable, even when it holds a hazard itself.
+
+    Returns:
+        dict mapping reachable (row, col) to distance in km
+    """
+    step_km = {
+        (dr, dc): hypot(dr * row_km, dc * col_km) for dr, dc in NEIGHBOURS
+    }
+    best = {origin_cell: 0.0}
+    heap = [(0.0, origin_cell)]
+
+    while heap:
+        dist, cell = heapq.heappop(heap)
+        if dist > best.get(cell, float('inf')):
+            continue
+        row, col = cell
+        for dr, dc in NEIGHBOURS:
+            nxt = (row + dr, col + dc)
+            if nxt in blocked:
+                continue
+            if dr and dc and ((row + dr, col) in blocked or (row, col + dc) in blocked):
+                continue
+            nd = dist + step_km[(dr, dc)]
+            if nd <= max_km and nd < best.get(nxt, float('inf')):
+                best[nxt] = nd
+                heapq.heappush(heap, (nd, nxt))
+
+    return best
+
+
+def reachable_area(lat, lon, profile, max_km):
+    """
+    Cells reachable from (lat, lon) within max_km for a scoring profile.
+
+    Returns:
+        JSON-serializable dict; cached until hazards change
+    """
+    size = _cell_size()
+    origin_cell = cell_index(lat, lon, size)
+    budget = round(max_km, 2)
+    cache_key = (
+        f"accessibility:reachable:{hazard_version()}:{profile.name}:"
+        f"{size}:{origin_cell[0]}:{origin_cell[1]}:{budget}"
+    )
+    result = cache.get(cache_key)
+    if result is not None:
+        return result
+
+    center_lat, center_lon = cell_center(*origin_cell, size)
+    row_km = size * KM_PER_DEG_LAT
+    col_km = size * KM_PER_DEG_LAT * cos(radians(center_lat))
+    lat_margin = budget / KM_PER_DEG_LAT + size
+    lon_margin = budget / (KM_PER_DEG_LAT * cos(radians(center_lat))) + size
+
+    blocked = blocked_cells(
+        profile,
+        center_lat - lat_margin, center_lat + lat_margin,
+        center_lon - lon_margin, center_lon + lon_margin,
+        size,
+    )
+    reached = expand(origin_cell, blocked, budget, row_km, col_km)
+
+    cells = sorted(reached.items(), key=lambda item: item[1])
+    coordinates = []
+    distances = []
+    for (row, col), dist in cells:
+        cell_lat, cell_lon = cell_center(row, col, size)
+        coordinates.append([round(cell_lon, 6), round(cell_lat, 6)])
+        distances.append(round(dist, 3))
+
+    result = {
+        'profile': profile.name,
+        'max_distance_km': budget,
+        'max_minutes': round(budget * MINUTES_PER_KM),
+        'cell_size_deg': size,
+        'reachable_cells': len(coordinates),
+        'blocked_cells': len(blocked),
+        'coordinates': coordinates,
+        'distances_km': distances,
+    }
+    cache.set(cache_key, result, getattr(settings, 'REACHABILITY_CACHE_TTL', 600))
+    return result
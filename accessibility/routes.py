@@ -0,0 +1,84 @@
+"""
+Short-lived registry of route geometries handed out to clients.
+
+Each calculated route gets an ID derived from its geometry, and the geometry
+is kept in the KnownRoute table so later "what changed on my route" checks
+only need to send the ID, whichever worker process handles them. Clients
+whose ID has expired can send the polyline instead.
+
+`python manage.py prune_route_changes` deletes expired routes and old
+deleted-report records.
+"""
+import hashlib
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from . import polyline
+from .models import DeletedReport, KnownRoute
+
+# Precision used for route IDs and stored geometries (~10 cm)
+STORED_PRECISION = 6
+
+
+def _route_id(encoded):
+    return hashlib.sha1(encoded.encode()).hexdigest()[:16]
+
+
+def route_id_for(coordinates):
+    return _route_id(polyline.encode(coordinates, STORED_PRECISION))
+
+
+def remember_routes(routes):
+    """
+    Store route geometries and return their IDs, in one upsert.
+
+    Args:
+        routes: list of [lon, lat] coordinate lists
+    """
+    expires_at = timezone.now() + timedelta(seconds=getattr(settings, 'ROUTE_ID_TTL', 24 * 60 * 60))
+    route_ids = []
+    rows = {}
+    for coordinates in routes:
+        encoded = polyline.encode(coordinates, STORED_PRECISION)
+        route_id = _route_id(encoded)
+        route_ids.append(route_id)
+        rows[route_id] = KnownRoute(route_id=route_id, polyline=encoded, expires_at=expires_at)
+
+    # Identical routes (e.g. fastest and community verified) share a row
+    KnownRoute.objects.bulk_create(
+        rows.values(),
+        update_conflicts=True,
+        unique_fields=['route_id'],
+        update_fields=['expires_at'],
+    )
+    return route_ids
+
+
+def recall_route(route_id):
+    """Return the [lon, lat] coordinates of a stored route, or None."""
+    encoded = KnownRoute.objects.filter(
+        route_id=route_id, expires_at__gt=timezone.now()
+    ).values_list('polyline', flat=True).first()
+    if encoded is None:
+        return None
+    return polyline.decode(encoded, STORED_PRECISION)
+
+
+def changes_retention():
+    """How far back change checks can look, as a timedelta."""
+    return timedelta(seconds=getattr(settings, 'ROUTE_CHANGES_RETENTION', 7 * 24 * 60 * 60))
+
+
+def prune():
+    """
+    Delete expired routes and deleted-report records past the retention.
+
+    Returns:
+        (routes deleted, deleted-report records deleted)
+    """
+    now = timezone.now()
+    routes, _ = KnownRoute.objects.filter(expires_at__lte=now).delete()
+    deleted, _ = DeletedReport.objects.filter(deleted_at__lte=now - changes_retention()).delete()
+    return routes, deleted
@@ -0,0 +1,327 @@
+"""
+Route scoring profiles.
+
+Each disability profile assigns weights to hazard severities, problem types
+and weather conditions. Candidate routes are scored against all nearby
+hazards in one vectorized pass, so the cost grows with numpy array sizes
+rather than with Python loops over routes and reports.
+
+Only hazards within ROUTE_HAZARD_CORRIDOR_KM of a route count against it.
+The original inline scoring charged every relevant hazard in the lookup
+bounding box (route extent plus 0.1 degrees) to every route; set the
+corridor to 12 km or more to get close to that again.
+"""
+import copy
+import logging
+from math import radians
+
+import numpy as np
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+EARTH_RADIUS_KM = 6371.0
+
+# Hazards processed per block when building the route x hazard distance
+# matrix, which keeps temporaries to a few MB even for large inputs.
+HAZARD_BLOCK_SIZE = 1024
+
+# How each route strategy trades distance against hazard exposure.
+#   detour: route length relative to the straight-line distance
+#   distance_weight: score lost per km travelled
+ROUTE_STRATEGIES = {
+    'fastest': {'detour': 1.0, 'distance_weight': 2.0},
+    'safest': {'detour': 1.3, 'distance_weight': 1.5},
+    'community_verified': {'detour': 1.15, 'distance_weight': 1.8},
+}
+
+DEFAULT_PROFILE = 'wheelchair'
+
+# Penalty per hazard by route strategy and severity, as the original inline
+# scoring had them. Routes that detour around hazards are charged less.
+BASELINE_SEVERITY_WEIGHTS = {
+    'fastest': {'Critical': 5, 'High': 3},
+    'safest': {'Critical': 2, 'High': 1},
+    'community_verified': {'Critical': 3, 'High': 2},
+}
+
+BASELINE_WEATHER_ADJUSTMENTS = {'Rain': {'safest': 10}}
+
+# Profiles share the baseline severity weights and differ in which reports
+# apply to them and in how much each kind of problem matters. Problem type
+# weights multiply the severity weight; matching ignores case.
+DEFAULT_SCORING_PROFILES = {
+    'wheelchair': {
+        'disability_type': 'Wheelchair',
+        'problem_type_weights': {'Stairs': 1.5, 'Broken Ramp': 1.5, 'Pothole': 1.25},
+    },
+    'visual': {
+        'disability_type': 'Visual Impairment',
+        'problem_type_weights': {'Open Drain': 1.5, 'Missing Tactile Paving': 1.5, 'Obstruction': 1.25},
+    },
+    'hearing': {
+        'disability_type': 'Hearing Impairment',
+        'problem_type_weights': {'Construction': 1.25, 'Traffic': 1.25},
+    },
+    'mobility': {
+        'disability_type': 'Mobility Issues',
+        'problem_type_weights': {'Stairs': 1.5, 'Uneven Surface': 1.25, 'Pothole': 1.25},
+    },
+}
+
+
+class ScoringProfile:
+    """
+    Weights used to score routes for one disability profile.
+    """
+
+    def __init__(self, name, disability_type, severity_weights=None,
+                 problem_type_weights=None, weather_adjustments=None,
+                 corridor_km=None):
+        """
+        Args:
+            severity_weights: {route type: {severity: penalty}}; defaults to
+                BASELINE_SEVERITY_WEIGHTS
+            problem_type_weights: {problem type: multiplier}
+            weather_adjustments: {condition: {route type: bonus}}; defaults
+                to BASELINE_WEATHER_ADJUSTMENTS
+        """
+        self.name = name
+        self.disability_type = disability_type
+        if severity_weights is None:
+            severity_weights = BASELINE_SEVERITY_WEIGHTS
+        self.severity_weights = {
+            route_type: severity_weights.get(route_type, {}) for route_type in ROUTE_STRATEGIES
+        }
+        self.problem_type_weights = {
+            problem_type.lower(): weight
+            for problem_type, weight in (problem_type_weights or {}).items()
+        }
+        if weather_adjustments is None:
+            weather_adjustments = BASELINE_WEATHER_ADJUSTMENTS
+        self.weather_adjustments = weather_adjustments
+        if corridor_km is None:
+            corridor_km = getattr(settings, 'ROUTE_HAZARD_CORRIDOR_KM', 1.0)
+        self.corridor_km = corridor_km
+
+    def __repr__(self):
+        return f"<ScoringProfile {self.name}>"
+
+    def is_relevant(self, report):
+        """Whether a report affects users of this profile."""
+        return self.disability_type in (report.disability_types or [])
+
+    def hazard_weights(self, reports):
+        """{route type: penalty weight of each report, as a float array}."""
+        multipliers = np.array([
+            self.problem_type_weights.get((report.problem_type or '').lower(), 1.0)
+            for report in reports
+        ], dtype=np.float64)
+        return {
+            route_type: np.array([
+                weights.get(report.severity, 0) for report in reports
+            ], dtype=np.float64) * multipliers
+            for route_type, weights in self.severity_weights.items()
+        }
+
+    def weather_bonus(self, condition, route_type):
+        return self.weather_adjustments.get(condition, {}).get(route_type, 0)
+
+    def score(self, routes, hazard_points, hazard_weights, weather, adjustments=None):
+        """
+        Score candidate routes against hazards in one pass.
+
+        Args:
+            routes: list of dicts with 'type', 'distance_km' and
+                'coordinates' ([lon, lat] pairs)
+            hazard_points: (H, 2) array of hazard [lat, lon]
+            hazard_weights: {route type: (H,) array}, from hazard_weights()
+            weather: weather dict with a 'condition' key
+            adjustments: optional (R,) array added to each route's score
+
+        Returns:
+            (R,) array of scores clipped to 0-100
+        """
+        if not routes:
+            return np.zeros(0)
+
+        strategies = [ROUTE_STRATEGIES[route['type']] for route in routes]
+        distance_weight = np.array([s['distance_weight'] for s in strategies])
+        distances = np.array([route['distance_km'] for route in routes], dtype=np.float64)
+        condition = weather.get('condition')
+        weather_bonus = np.array([
+            self.weather_bonus(condition, route['type']) for route in routes
+        ], dtype=np.float64)
+
+        # One pass per route type, since each type weighs hazards differently
+        hazard_penalty = np.zeros(len(routes))
+        for route_type in {route['type'] for route in routes}:
+            indexes = [i for i, route in enumerate(routes) if route['type'] == route_type]
+            hazard_penalty[indexes] = corridor_penalties(
+                [routes[i]['coordinates'] for i in indexes],
+                hazard_points,
+                hazard_weights[route_type],
+                self.corridor_km,
+            )
+
+        scores = 100 - distances * distance_weight - hazard_penalty + weather_bonus
+        if adjustments is not None:
+            scores += np.asarray(adjustments, dtype=np.float64)
+        return np.clip(scores, 0, 100)
+
+
+def _project(lat, lon, ref_lat):
+    """Equirectangular projection to km, accurate at city scale."""
+    x = np.radians(lon) * np.cos(radians(ref_lat)) * EARTH_RADIUS_KM
+    y = np.radians(lat) * EARTH_RADIUS_KM
+    return x, y
+
+
+def _route_hazard_distances(route_coordinates, hazard_points):
+    """
+    Yield (block_start, dist_sq) for blocks of hazards.
+
+    dist_sq is a (routes, block) array of squared km distances from each
+    hazard to the nearest segment of each route. Routes are flattened into
+    one array of segments and the per-route minimum is taken with a single
+    reduceat, so no Python loop runs per route or per hazard. Every route
+    needs at least one coordinate.
+    """
+    seg_start, seg_end, seg_offsets = [], [], []
+    for coordinates in route_coordinates:
+        seg_offsets.append(len(seg_start))
+        points = coordinates if len(coordinates) > 1 else list(coordinates) * 2
+        for a, b in zip(points[:-1], points[1:]):
+            seg_start.append(a)
+            seg_end.append(b)
+
+    # Coordinates are [lon, lat]; hazards are [lat, lon]
+    seg_start = np.asarray(seg_start, dtype=np.float64)
+    seg_end = np.asarray(seg_end, dtype=np.float64)
+    ref_lat = float(np.mean(seg_start[:, 1]))
+    ax, ay = _project(seg_start[:, 1], seg_start[:, 0], ref_lat)
+    bx, by = _project(seg_end[:, 1], seg_end[:, 0], ref_lat)
+    dx, dy = bx - ax, by - ay
+    seg_len_sq = dx * dx + dy * dy
+    seg_len_sq[seg_len_sq == 0] = 1e-12
+    offsets = np.asarray(seg_offsets)
+
+    hx_all, hy_all = _project(hazard_points[:, 0], hazard_points[:, 1], ref_lat)
+
+    for lo in range(0, len(hazard_points), HAZARD_BLOCK_SIZE):
+        # Offsets from each segment start to each hazard in the block
+        hx = hx_all[None, lo:lo + HAZARD_BLOCK_SIZE] - ax[:, None]
+        hy = hy_all[None, lo:lo + HAZARD_BLOCK_SIZE] - ay[:, None]
+        # Projection of each hazard onto each segment, clamped to the segment
+        t = (hx * dx[:, None] + hy * dy[:, None]) / seg_len_sq[:, None]
+        np.clip(t, 0, 1, out=t)
+        hx -= t * dx[:, None]
+        hy -= t * dy[:, None]
+        seg_dist_sq = hx * hx + hy * hy
+        yield lo, np.minimum.reduceat(seg_dist_sq, offsets, axis=0)
+
+
+def corridor_penalties(route_coordinates, hazard_points, hazard_weights, corridor_km):
+    """
+    Sum the weights of hazards lying within corridor_km of each route.
+
+    Routes without coordinates get no penalty.
+    """
+    penalties = np.zeros(len(route_coordinates))
+    hazard_points = np.asarray(hazard_points, dtype=np.float64).reshape(-1, 2)
+    present = [i for i, coordinates in enumerate(route_coordinates) if len(coordinates)]
+    if not present or not len(hazard_points):
+        return penalties
+
+    weights = np.asarray(hazard_weights, dtype=np.float64)
+    corridor_sq = corridor_km * corridor_km
+    routes = [route_coordinates[i] for i in present]
+    for lo, route_dist_sq in _route_hazard_distances(routes, hazard_points):
+        within = (route_dist_sq <= corridor_sq).astype(np.float64)
+        penalties[present] += within @ weights[lo:lo + HAZARD_BLOCK_SIZE]
+
+    return penalties
+
+
+def within_corridor(coordinates, hazard_points, corridor_km):
+    """Boolean mask of the hazards lying within corridor_km of one route."""
+    hazard_points = np.asarray(hazard_points, dtype=np.float64).reshape(-1, 2)
+    mask = np.zeros(len(hazard_points), dtype=bool)
+    if not len(coordinates) or not len(hazard_points):
+        return mask
+
+    corridor_sq = corridor_km * corridor_km
+    for lo, route_dist_sq in _route_hazard_distances([coordinates], hazard_points):
+        mask[lo:lo + HAZARD_BLOCK_SIZE] = route_dist_sq[0] <= corridor_sq
+
+    return mask
+
+
+_registry = {}
+
+
+def _merge(base, overrides):
+    """Merge overrides into base in place, recursing into nested dicts."""
+    for key, value in overrides.items():
+        if isinstance(value, dict) and isinstance(base.get(key), dict):
+            _merge(base[key], value)
+        else:
+            base[key] = copy.deepcopy(value)
+    return base
+
+
+def _build_registry():
+    profiles = copy.deepcopy(DEFAULT_SCORING_PROFILES)
+    for name, overrides in getattr(settings, 'ROUTE_SCORING_PROFILES', {}).items():
+        profile = profiles.setdefault(name, {})
+        # Partial severity or weather overrides adjust the baseline tables
+        for key, baseline in (
+            ('severity_weights', BASELINE_SEVERITY_WEIGHTS),
+            ('weather_adjustments', BASELINE_WEATHER_ADJUSTMENTS),
+        ):
+            if key in overrides and profile.get(key) is None:
+                profile[key] = copy.deepcopy(baseline)
+        _merge(profile, overrides)
+
+    registry = {}
+    for name, config in profiles.items():
+        try:
+            registry[name] = ScoringProfile(name, **config)
+        except TypeError as e:
+            logger.error(f"Invalid route scoring profile '{name}': {e}")
+    return registry
+
+
+def register_profile(name, **config):
+    """Add or replace a scoring profile at runtime."""
+    get_profiles()[name] = ScoringProfile(name, **config)
+
+
+def get_profiles():
+    if not _registry:
+        _registry.update(_build_registry())
+    return _registry
+
+
+def profile_key(disability):
+    """
+    Canonical key for a disability given as a profile name or label.
+
+    'wheelchair', 'Wheelchair' and 'WHEELCHAIR' all give 'wheelchair', as
+    does the profile's disability_type label. Values that match no profile
+    are lowercased and returned as is.
+    """
+    value = (disability or '').strip().lower()
+    for name, profile in get_profiles().items():
+        if value in (name.lower(), profile.disability_type.lower()):
+            return name
+    return value
+
+
+def get_profile(name):
+    """
+    Return the profile for a disability given as a name or label, in any
+    case, falling back to the default.
+    """
+    profiles = get_profiles()
+    return profiles.get(profile_key(name)) or profiles[DEFAULT_PROFILE]
@@ -2,9 +2,14 @@ from rest_framework import serializers
 from .models import AccessibilityReport, RouteFeedback
 from django.contrib.auth import get_user_model
 from django.conf import settings
-from .storage import supabase_storage
+from .reachability import MINUTES_PER_KM
+from .storage import photo_storage
+from .uploads import allowed_content_types, photo_upload_queue, spool_photo
+import logging
 import os
 
+logger = logging.getLogger(__name__)
+
 User = get_user_model()
 
 
@@ -28,12 +33,17 @@ class AccessibilityReportSerializer(serializers.ModelSerializer):
             'severity',
             'description',
             'photo_url',
+            'photo_thumbnail_url',
+            'photo_status',
             'status',
             'created_at',
             'updated_at',
             'user',
         ]
-        read_only_fields = ['id', 'created_at', 'updated_at', 'user']
+        # Photos change through the upload endpoints, which queue the old one for deletion
+        read_only_fields = [
+            'id', 'photo_url', 'photo_thumbnail_url', 'photo_status', 'created_at', 'updated_at', 'user'
+        ]
 
     def validate_description(self, value):
         if len(value) > 200:
@@ -116,7 +126,7 @@ class AccessibilityReportCreateSerializer(serializers.ModelSerializer):
         return value
 
     def create(self, validated_data):
-        """Create report with optional photo upload to Supabase."""
+        """Create report; an attached photo is uploaded in the background."""
         photo = validated_data.pop('photo', None)
         
         # Handle user assignment (get or create default user)
@@ -133,32 +143,25 @@ class AccessibilityReportCreateSerializer(serializers.ModelSerializer):
             )
             validated_data['user'] = default_user
         
-        # Handle photo upload to Supabase
-        if photo:
-            import logging
-            logger = logging.getLogger(__name__)
-            
-            logger.info(f"Processing photo upload: {photo.name}")
-            
-            if not supabase_storage.is_configured():
-                # Log warning but allow creation without photo
-                logger.warning("Supabase storage not configured, skipping photo upload")
-            else:
-                try:
-                    logger.info("Starting Supabase upload...")
-                    photo_url = supabase_storage.upload_file(photo)
-                    if photo_url:
-                        validated_data['photo_url'] = photo_url
-                        logger.info(f"Photo uploaded successfully: {photo_url}")
-                    else:
-                        # Log error but allow creation without photo
-                        logger.error("Failed to upload photo to Supabase - no URL returned")
-                except Exception as e:
-                    # Log error but allow creation without photo
-                    logger.error(f"Exception during photo upload to Supabase: {e}")
-                    logger.exception("Full exception details:")
-        
-        return super().create(validated_data)
+        if not photo:
+            return super().create(validated_data)
+
+        if not photo_storage.is_configured():
+            # Log warning but allow creation without photo
+            logger.warning("Photo storage not configured, skipping photo upload")
+            return super().create(validated_data)
+
+        # Save the report now and upload the photo in the background
+        validated_data['photo_status'] = 'pending'
+        report = super().create(validated_data)
+        try:
+            path = spool_photo(photo, report.id)
+            photo_upload_queue.enqueue(report.id, path)
+        except OSError as e:
+            logger.error(f"Could not spool photo for report {report.id}: {e}")
+            report.photo_status = 'failed'
+            report.save(update_fields=['photo_status'])
+        return report
 
 
 class RouteFeedbackSerializer(serializers.ModelSerializer):
@@ -199,3 +202,79 @@ class RouteCalculationSerializer(serializers.Serializer):
         if 'lat' not in value or 'lon' not in value:
             raise serializers.ValidationError("End location must include 'lat' and 'lon'.")
         return value
+
+
+class ReachabilitySerializer(serializers.Serializer):
+    origin = serializers.DictField(child=serializers.FloatField())
+    user_disability = serializers.CharField(max_length=50)
+    max_minutes = serializers.FloatField(required=False, min_value=1)
+    max_distance_km = serializers.FloatField(required=False, min_value=0.1)
+
+    def validate_origin(self, value):
+        if 'lat' not in value or 'lon' not in value:
+            raise serializers.ValidationError("Origin must include 'lat' and 'lon'.")
+        return value
+
+    def validate(self, attrs):
+        if 'max_minutes' not in attrs and 'max_distance_km' not in attrs:
+            raise serializers.ValidationError("Provide either 'max_minutes' or 'max_distance_km'.")
+
+        limit = getattr(settings, 'REACHABILITY_MAX_DISTANCE_KM', 5)
+        distance = attrs.get('max_distance_km')
+        if distance is None:
+            distance = attrs['max_minutes'] / MINUTES_PER_KM
+        if distance > limit:
+            raise serializers.ValidationError(
+                f"Budget cannot exceed {limit} km ({limit * MINUTES_PER_KM} minutes)."
+            )
+        attrs['budget_km'] = distance
+        return attrs
+
+
+class RouteChangesSerializer(serializers.Serializer):
+    route_id = serializers.CharField(max_length=32, required=False)
+    polyline = serializers.CharField(required=False)
+    precision = serializers.IntegerField(required=False, default=5, min_value=1, max_value=7)
+    since = serializers.DateTimeField()
+    user_disability = serializers.CharField(max_length=50, required=False)
+
+    def validate(self, attrs):
+        if not attrs.get('route_id') and not attrs.get('polyline'):
+            raise serializers.ValidationError("Provide either 'route_id' or 'polyline'.")
+        return attrs
+
+
+class PhotoUploadURLSerializer(serializers.Serializer):
+    """Photo a client wants to upload straight to storage."""
+    filename = serializers.CharField(max_length=255)
+    content_type = serializers.CharField(max_length=100)
+    size = serializers.IntegerField(min_value=1)
+
+    def validate_filename(self, value):
+        file_extension = os.path.splitext(value)[1].lower()
+        allowed_extensions = getattr(settings, 'ALLOWED_UPLOAD_EXTENSIONS', ['.jpg', '.jpeg', '.png', '.gif', '.webp'])
+        if file_extension not in allowed_extensions:
+            raise serializers.ValidationError(
+                f"File type not allowed. Allowed types: {', '.join(allowed_extensions)}"
+            )
+        return value
+
+    def validate_content_type(self, value):
+        if value not in allowed_content_types():
+            raise serializers.ValidationError(f"Content type not allowed: {value}")
+        return value
+
+    def validate_size(self, value):
+        max_size = getattr(settings, 'MAX_UPLOAD_SIZE', 10 * 1024 * 1024)
+        if value > max_size:
+            raise serializers.ValidationError(
+                f"File size cannot exceed {max_size // (1024 * 1024)}MB"
+            )
+        return value
+
+
+class PhotoFinalizeSerializer(serializers.Serializer):
+    """Photo uploaded with a signed URL, named by its upload token."""
+    upload_token = serializers.CharField(max_length=1000)
+    # Optional; must match the path signed into the token
+    path = serializers.CharField(max_length=255, required=False)
@@ -0,0 +1,76 @@
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+
+from .contributions import bump
+from .models import AccessibilityReport, DeletedReport, RouteFeedback
+from .photo_gc import queue_photo_deletion
+from .reachability import HAZARD_FIELDS, blocking_state, bump_hazard_version
+
+COUNTER_BY_MODEL = {AccessibilityReport: 'report_count', RouteFeedback: 'feedback_count'}
+
+
+# Marks a report whose blocking state was not loaded, e.g. after only()
+UNKNOWN_STATE = object()
+
+
+def _loaded_blocking_state(report):
+    if HAZARD_FIELDS.intersection(report.get_deferred_fields()):
+        return UNKNOWN_STATE
+    return blocking_state(report)
+
+
+@receiver(post_init, sender=AccessibilityReport)
+def remember_blocking_state(sender, instance, **kwargs):
+    """Keep the loaded state so saves can tell whether blocked cells changed."""
+    instance._blocking_state = _loaded_blocking_state(instance)
+
+
+@receiver(post_save, sender=AccessibilityReport)
+def invalidate_hazard_caches(sender, instance, created, update_fields=None, **kwargs):
+    """Hazard-derived caches must not outlive a change to the cells a report blocks."""
+    if update_fields is not None and not HAZARD_FIELDS.intersection(update_fields):
+        return
+    previous = None if created else getattr(instance, '_blocking_state', UNKNOWN_STATE)
+    current = _loaded_blocking_state(instance)
+    if previous is UNKNOWN_STATE or current is UNKNOWN_STATE or previous != current:
+        bump_hazard_version()
+    instance._blocking_state = current
+
+
+@receiver(post_delete, sender=AccessibilityReport)
+def invalidate_deleted_hazard(sender, instance, **kwargs):
+    if getattr(instance, '_blocking_state', UNKNOWN_STATE) is not None:
+        bump_hazard_version()
+
+
+@receiver(post_delete, sender=AccessibilityReport)
+def record_deleted_report(sender, instance, **kwargs):
+    """Route change checks report deletions from these records."""
+    DeletedReport.objects.update_or_create(
+        report_id=instance.pk,
+        defaults={
+            'latitude': instance.latitude,
+            'longitude': instance.longitude,
+            'disability_types': instance.disability_types,
+            'created_at': instance.created_at,
+        },
+    )
+
+
+@receiver(post_delete, sender=AccessibilityReport)
+def queue_report_photos(sender, instance, **kwargs):
+    """A deleted report's photos go to the storage GC queue."""
+    queue_photo_deletion(instance.photo_url, instance.photo_thumbnail_url)
+
+
+@receiver(post_save, sender=AccessibilityReport)
+@receiver(post_save, sender=RouteFeedback)
+def count_contribution(sender, instance, created, **kwargs):
+    if created:
+        bump(instance.user_id, COUNTER_BY_MODEL[sender], 1)
+
+
+@receiver(post_delete, sender=AccessibilityReport)
+@receiver(post_delete, sender=RouteFeedback)
+def uncount_contribution(sender, instance, **kwargs):
+    bump(instance.user_id, COUNTER_BY_MODEL[sender], -1)
@@ -1,54 +1,134 @@
+import base64
+import hashlib
 import os
-import uuid
-from typing import Optional
+import shutil
+import tempfile
+import threading
+from datetime import datetime, timezone as dt_timezone
+from typing import Iterable, Iterator, Optional
+from urllib.parse import urljoin
+import requests
 from django.conf import settings
-from django.core.files.base import ContentFile
-from supabase import create_client, Client
+from django.core import signing
+from django.db import transaction
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import LazyObject
+from django.utils.module_loading import import_string
+from PIL import Image
 import logging
 
+from saarthi_backend.metrics import track_upstream
+
 logger = logging.getLogger(__name__)
 
+CONTENT_TYPES = {
+    '.jpg': 'image/jpeg',
+    '.jpeg': 'image/jpeg',
+    '.png': 'image/png',
+    '.gif': 'image/gif',
+    '.webp': 'image/webp',
+}
+
+# Short names accepted by PHOTO_STORAGE_BACKEND; a dotted path also works
+STORAGE_BACKENDS = {
+    'supabase': 'accessibility.storage.SupabaseStorageBackend',
+    'local': 'accessibility.storage.LocalStorageBackend',
+}
 
-class SupabaseStorageService:
+
+class FileSlice:
     """
-    Service for handling file uploads to Supabase Storage.
+    Read-only view of `length` bytes of a binary file starting at `offset`.
+    
+    Passed as a request body, it is sent in small reads instead of being
+    loaded into memory.
     """
     
-    def __init__(self):
-        self.supabase_url: str = os.environ.get('SUPABASE_URL')
-        self.supabase_key: str = os.environ.get('SUPABASE_KEY')
-        self.supabase_service_role_key: str = os.environ.get('SUPABASE_SERVICE_ROLE_KEY')
-        self.bucket_name: str = os.environ.get('SUPABASE_BUCKET_NAME', 'saarthi-reports')
-        
-        logger.info(f"Initializing Supabase storage with URL: {self.supabase_url}")
-        logger.info(f"Bucket name: {self.bucket_name}")
+    def __init__(self, fh, offset: int, length: int):
+        self.fh = fh
+        self.remaining = length
+        self.length = length
+        fh.seek(offset)
+    
+    def __len__(self) -> int:
+        return self.length
+    
+    def read(self, size: int = -1) -> bytes:
+        if self.remaining <= 0:
+            return b''
+        if size is None or size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.fh.read(size)
+        self.remaining -= len(data)
+        return data
+
+
+def content_hash(stream, chunk_size: int = 64 * 1024) -> str:
+    """SHA-256 of a binary stream, read in chunks and rewound afterwards."""
+    digest = hashlib.sha256()
+    stream.seek(0)
+    for chunk in iter(lambda: stream.read(chunk_size), b''):
+        digest.update(chunk)
+    stream.seek(0)
+    return digest.hexdigest()
+
+
+class StoredObjectIndex:
+    """
+    Database-backed map from content hash to stored object.
+    """
+    
+    def lookup(self, content_hash: str) -> Optional[str]:
+        """
+        Return the URL of an object with this hash, if we hold one.
         
-        if not all([self.supabase_url, self.supabase_key]):
-            logger.warning("Supabase configuration missing. File uploads will fail.")
-            self.client = None
-        else:
-            try:
-                # Use service role key for admin operations
-                key_to_use = self.supabase_service_role_key or self.supabase_key
-                logger.info(f"Using key type: {'service_role' if self.supabase_service_role_key else 'anon'}")
-                
-                self.client: Client = create_client(
-                    self.supabase_url,
-                    key_to_use
-                )
-                logger.info("Supabase client initialized successfully")
-            except Exception as e:
-                logger.error(f"Failed to initialize Supabase client: {e}")
-                logger.exception("Full exception details:")
-                self.client = None
+        The row is locked while it is stamped as used, so this waits for a
+        photo GC run deciding about the same object and skips objects it
+        has retired.
+        """
+        from .models import StoredObject
+        with transaction.atomic():
+            row = StoredObject.objects.select_for_update().filter(
+                content_hash=content_hash, removed_at__isnull=True
+            ).only('url').first()
+            if row is None:
+                return None
+            StoredObject.objects.filter(pk=row.pk).update(used_at=timezone.now())
+            return row.url
+    
+    def record(self, content_hash: str, path: str, url: str, size: int) -> None:
+        from .models import StoredObject
+        StoredObject.objects.update_or_create(
+            content_hash=content_hash,
+            defaults={'path': path, 'url': url, 'size': size, 'used_at': timezone.now(), 'removed_at': None},
+        )
+    
+    def forget(self, paths: Iterable[str]) -> None:
+        """Drop index rows for objects that have been deleted."""
+        from .models import StoredObject
+        StoredObject.objects.filter(path__in=list(paths)).delete()
+
+
+class StorageBackend:
+    """
+    Base class for report photo storage.
+    
+    Subclasses write bytes to a path, delete and look up paths, and turn
+    paths into public URLs. Content-type detection, content-hash naming and
+    deduplication live here, so every backend gets them.
+    """
+    
+    def __init__(self, index=None):
+        self.index = index or StoredObjectIndex()
     
     def is_configured(self) -> bool:
-        """Check if Supabase storage is properly configured."""
-        return self.client is not None
+        return True
     
     def upload_file(self, file_obj, file_path: Optional[str] = None) -> Optional[str]:
         """
-        Upload a file to Supabase Storage.
+        Upload a file to storage.
         
         Args:
             file_obj: File object to upload
@@ -58,121 +138,561 @@ class SupabaseStorageService:
             Public URL of the uploaded file or None if upload fails
         """
         if not self.is_configured():
-            logger.error("Supabase storage not configured")
+            logger.error(f"{type(self).__name__} not configured")
             return None
         
+        stream = None
         try:
-            # Log file details for debugging
             logger.info(f"Uploading file: {file_obj.name}, size: {file_obj.size}, content_type: {getattr(file_obj, 'content_type', 'unknown')}")
             
-            # Generate unique file path if not provided
-            if not file_path:
-                file_extension = os.path.splitext(file_obj.name)[1]
-                unique_filename = f"{uuid.uuid4()}{file_extension}"
-                file_path = f"reports/{unique_filename}"
-            
-            logger.info(f"File path for upload: {file_path}")
-            
-            # Read file content
-            file_content = file_obj.read()
-            logger.info(f"File content size: {len(file_content)} bytes")
+            file_extension = os.path.splitext(file_obj.name)[1].lower()
+            content_type = getattr(file_obj, 'content_type', None) or CONTENT_TYPES.get(file_extension, 'image/jpeg')
             
-            # Reset file pointer for potential reuse
-            file_obj.seek(0)
+            # Stream from disk when the file is there, so the upload never
+            # holds the whole photo in memory
+            stream = self._open_stream(file_obj)
+            if stream is None:
+                # Small uploads Django kept in memory anyway
+                file_content = file_obj.read()
+                file_obj.seek(0)
             
-            # Determine content type
-            content_type = getattr(file_obj, 'content_type', None)
-            if not content_type:
-                # Try to determine from file extension
-                file_extension = os.path.splitext(file_obj.name)[1].lower()
-                content_type_map = {
-                    '.jpg': 'image/jpeg',
-                    '.jpeg': 'image/jpeg',
-                    '.png': 'image/png',
-                    '.gif': 'image/gif',
-                    '.webp': 'image/webp',
-                }
-                content_type = content_type_map.get(file_extension, 'image/jpeg')
-            
-            # Upload to Supabase
-            logger.info(f"Starting upload to bucket: {self.bucket_name}")
-            result = self.client.storage.from_(self.bucket_name).upload(
-                path=file_path,
-                file=file_content,
-                file_options={
-                    "content-type": content_type
-                }
-            )
-            
-            logger.info(f"Upload result: {result}")
-            logger.info(f"Upload result type: {type(result)}")
+            # Objects are named after their contents, so the same photo sent
+            # twice (client retries, several reporters) is stored once
+            digest = None
+            if not file_path:
+                if stream is not None:
+                    digest = content_hash(stream)
+                else:
+                    digest = hashlib.sha256(file_content).hexdigest()
+                existing_url = self.index.lookup(digest)
+                if existing_url:
+                    logger.info(f"Skipping upload, content already stored: {existing_url}")
+                    return existing_url
+                file_path = f"reports/{digest}{file_extension}"
             
-            # Handle different response formats from Supabase
-            if hasattr(result, 'data') and result.data:
-                # Get public URL
-                public_url = self.client.storage.from_(self.bucket_name).get_public_url(file_path)
-                logger.info(f"File uploaded successfully: {public_url}")
-                return public_url
-            elif hasattr(result, 'json') and callable(getattr(result, 'json')):
-                # Try to get JSON response
-                try:
-                    result_data = result.json()
-                    if result_data:
-                        public_url = self.client.storage.from_(self.bucket_name).get_public_url(file_path)
-                        logger.info(f"File uploaded successfully: {public_url}")
-                        return public_url
-                except:
-                    pass
+            logger.info(f"File path for upload: {file_path}")
+            size = file_obj.size
+            self._save(stream if stream is not None else file_content, file_path, content_type, size)
             
-            # If upload seems to have worked (no exception), try to get URL anyway
-            try:
-                public_url = self.client.storage.from_(self.bucket_name).get_public_url(file_path)
-                logger.info(f"File uploaded successfully: {public_url}")
-                return public_url
-            except Exception as url_error:
-                logger.error(f"Upload failed - couldn't get public URL: {url_error}")
-                logger.error(f"Upload response: {result}")
-                return None
-                
+            public_url = self.get_public_url(file_path)
+            logger.info(f"File uploaded successfully: {public_url}")
+            self._record(digest, file_path, public_url, size)
+            return public_url
+        
         except Exception as e:
-            logger.error(f"Error uploading file to Supabase: {e}")
+            logger.error(f"Error uploading file with {type(self).__name__}: {e}")
             logger.exception("Full exception details:")
             return None
+        finally:
+            if stream is not None:
+                stream.close()
     
-    def delete_file(self, file_path: str) -> bool:
+    def _save(self, source, file_path: str, content_type: str, size: int) -> None:
+        """
+        Store `size` bytes from source (an open binary file or bytes) at file_path.
+        
+        Raises on failure.
+        """
+        raise NotImplementedError
+    
+    def _delete(self, file_paths: list) -> int:
+        """Delete the given paths and return how many were removed."""
+        raise NotImplementedError
+    
+    def stat(self, file_path: str) -> Optional[dict]:
+        """
+        Size and content type of a stored object.
+        
+        Returns:
+            {'size': int, 'content_type': str}, or None if nothing is stored there
+        """
+        raise NotImplementedError
+    
+    def exists(self, file_path: str) -> bool:
+        """Check whether an object is stored at file_path."""
+        return self.stat(file_path) is not None
+    
+    def create_signed_upload(self, file_path: str, content_type: str, size: int) -> dict:
+        """
+        Let a client upload one object straight to storage, bypassing Django.
+        
+        Returns:
+            {'url', 'method', 'headers', 'expires_in'} describing the request
+            the client must make
+        """
+        raise NotImplementedError
+    
+    def get_public_url(self, file_path: str) -> Optional[str]:
+        """Public URL for an object path."""
+        raise NotImplementedError
+    
+    def path_from_url(self, url: str) -> Optional[str]:
+        """
+        Object path behind one of this backend's public URLs.
+        
+        Returns None for URLs this backend did not hand out.
+        """
+        base = (self.get_public_url('') or '').split('?', 1)[0]
+        url = url.split('?', 1)[0]
+        if base and url.startswith(base) and len(url) > len(base):
+            return url[len(base):]
+        return None
+    
+    def list_files(self, prefix: str = '', page_size: int = 1000) -> Iterator[list]:
         """
-        Delete a file from Supabase Storage.
+        Walk the objects under prefix, one page at a time.
+        
+        Yields:
+            Lists of at most page_size {'path', 'size', 'updated_at'} dicts
+        """
+        raise NotImplementedError
+    
+    def delete_files(self, file_paths: Iterable[str], fail_silently: bool = True) -> int:
+        """
+        Delete several objects, given as paths or public URLs.
         
         Args:
-            file_path: Path of the file to delete
-            
+            file_paths: Paths or public URLs of the objects
+            fail_silently: Log storage errors and return 0 instead of raising
+        
         Returns:
-            True if deletion successful, False otherwise
+            Number of objects deleted
         """
         if not self.is_configured():
-            logger.error("Supabase storage not configured")
+            logger.error(f"{type(self).__name__} not configured")
+            return 0
+        
+        paths = []
+        for file_path in file_paths:
+            if '://' in file_path or file_path.startswith('/'):
+                file_path = self.path_from_url(file_path)
+            if file_path:
+                paths.append(file_path)
+        if not paths:
+            return 0
+        
+        try:
+            deleted = self._delete(paths)
+        except Exception as e:
+            if not fail_silently:
+                raise
+            logger.error(f"Error deleting files with {type(self).__name__}: {e}")
+            return 0
+        
+        # Deduplication must never hand out a URL whose object is gone
+        try:
+            self.index.forget(paths)
+        except Exception as e:
+            logger.error(f"Could not update stored object index: {e}")
+        logger.info(f"Deleted {deleted} of {len(paths)} files")
+        return deleted
+    
+    def delete_file(self, file_path: str) -> bool:
+        """
+        Delete a single object, given as a path or public URL.
+        
+        Returns:
+            True if deletion successful, False otherwise
+        """
+        return self.delete_files([file_path]) == 1
+    
+    def _record(self, digest: Optional[str], file_path: str, url: str, size: int) -> None:
+        """Add an uploaded object to the content index."""
+        if digest is None:
+            return
+        try:
+            self.index.record(digest, file_path, url, size)
+        except Exception as e:
+            # The upload itself worked; a missing index row only costs a re-upload
+            logger.error(f"Could not index stored object {file_path}: {e}")
+    
+    @staticmethod
+    def _open_stream(file_obj):
+        """
+        Open a fresh binary handle on the file behind file_obj, if it is on disk.
+
+        Returns None for in-memory uploads.
+        """
+        if hasattr(file_obj, 'temporary_file_path'):
+            return open(file_obj.temporary_file_path(), 'rb')
+        name = getattr(getattr(file_obj, 'file', file_obj), 'name', None)
+        if isinstance(name, str) and os.path.isfile(name):
+            return open(name, 'rb')
+        return None
+
+
+class LocalStorageBackend(StorageBackend):
+    """
+    Stores objects as files under PHOTO_STORAGE_ROOT.
+    
+    Public URLs are PHOTO_STORAGE_URL + path; the default root lives inside
+    MEDIA_ROOT so the development server serves the files. Needs no network,
+    so it also backs offline benchmarks and load tests.
+    
+    Signed uploads are django.core.signing tokens accepted by
+    SignedPhotoUploadView, standing in for Supabase's signed upload URLs.
+    """
+    
+    SIGNING_SALT = 'accessibility.storage.signed-upload'
+    
+    def __init__(self, root: Optional[str] = None, base_url: Optional[str] = None, index=None):
+        super().__init__(index)
+        self.root = os.path.abspath(root or getattr(
+            settings, 'PHOTO_STORAGE_ROOT', os.path.join(settings.MEDIA_ROOT, 'storage')
+        ))
+        self.base_url = base_url or getattr(
+            settings, 'PHOTO_STORAGE_URL', f"{settings.MEDIA_URL}storage/"
+        )
+        if not self.base_url.endswith('/'):
+            self.base_url += '/'
+    
+    def _resolve(self, file_path: str) -> str:
+        path = os.path.abspath(os.path.join(self.root, file_path))
+        if not path.startswith(self.root + os.sep):
+            raise ValueError(f"Path escapes storage root: {file_path}")
+        return path
+    
+    def _save(self, source, file_path: str, content_type: str, size: int, replace: bool = True) -> None:
+        target = self._resolve(file_path)
+        directory = os.path.dirname(target)
+        os.makedirs(directory, exist_ok=True)
+        
+        # Write beside the target and rename, so readers never see half a file
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.upload-')
+        try:
+            with os.fdopen(fd, 'wb') as out:
+                if isinstance(source, bytes):
+                    out.write(source)
+                else:
+                    shutil.copyfileobj(source, out, 1024 * 1024)
+            if replace:
+                os.replace(tmp_path, target)
+            else:
+                # link() fails if the target exists, unlike rename()
+                os.link(tmp_path, target)
+                os.remove(tmp_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+    
+    def _delete(self, file_paths: list) -> int:
+        deleted = 0
+        for file_path in file_paths:
+            try:
+                os.remove(self._resolve(file_path))
+                deleted += 1
+            except FileNotFoundError:
+                pass
+        return deleted
+    
+    def exists(self, file_path: str) -> bool:
+        try:
+            return os.path.isfile(self._resolve(file_path))
+        except ValueError:
             return False
+    
+    def list_files(self, prefix: str = '', page_size: int = 1000) -> Iterator[list]:
+        top = self._resolve(prefix) if prefix else self.root
+        page = []
+        for directory, dirs, files in os.walk(top):
+            dirs.sort()
+            for name in sorted(files):
+                if name.startswith('.upload-'):
+                    continue  # Write in progress
+                path = os.path.join(directory, name)
+                try:
+                    info = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                page.append({
+                    'path': os.path.relpath(path, self.root).replace(os.sep, '/'),
+                    'size': info.st_size,
+                    'updated_at': datetime.fromtimestamp(info.st_mtime, dt_timezone.utc),
+                })
+                if len(page) >= page_size:
+                    yield page
+                    page = []
+        if page:
+            yield page
+    
+    def stat(self, file_path: str) -> Optional[dict]:
+        try:
+            path = self._resolve(file_path)
+            size = os.path.getsize(path)
+        except (ValueError, OSError):
+            return None
+        # Files carry no stored content type, so go by their header
+        try:
+            with Image.open(path) as image:
+                content_type = Image.MIME.get(image.format, 'application/octet-stream')
+        except Exception:
+            content_type = 'application/octet-stream'
+        return {'size': size, 'content_type': content_type}
+    
+    def create_signed_upload(self, file_path: str, content_type: str, size: int) -> dict:
+        self._resolve(file_path)
+        token = signing.dumps({'path': file_path, 'size': size}, salt=self.SIGNING_SALT)
+        return {
+            'url': reverse('storage-signed-upload', args=[token]),
+            'method': 'PUT',
+            'headers': {'Content-Type': content_type},
+            'expires_in': getattr(settings, 'PHOTO_SIGNED_UPLOAD_TTL', 600),
+        }
+    
+    def accept_signed_upload(self, token: str, stream, size: int) -> str:
+        """
+        Store the body of a PUT to a URL from create_signed_upload().
+        
+        Each URL stores one object: like Supabase's signed upload URLs, it
+        cannot overwrite an object that is already there, so a photo that
+        passed finalize can't be swapped for unchecked bytes.
+        
+        Raises:
+            signing.BadSignature: token is forged or has expired
+            ValueError: body size does not match what was signed for, or
+                the URL has already been used
+        
+        Returns:
+            Path the object was stored at
+        """
+        claims = signing.loads(
+            token, salt=self.SIGNING_SALT, max_age=getattr(settings, 'PHOTO_SIGNED_UPLOAD_TTL', 600)
+        )
+        if size != claims['size']:
+            raise ValueError(f"Expected {claims['size']} bytes, got {size}")
+        try:
+            self._save(stream, claims['path'], None, size, replace=False)
+        except FileExistsError:
+            raise ValueError("Upload URL has already been used")
+        return claims['path']
+    
+    def get_public_url(self, file_path: str) -> Optional[str]:
+        return f"{self.base_url}{file_path}"
+
+
+class SupabaseStorageBackend(StorageBackend):
+    """
+    Stores objects in a Supabase Storage bucket.
+    """
+    
+    # Supabase removes at most this many objects per request
+    DELETE_BATCH_SIZE = 1000
+    # Supabase signed upload URLs are valid for two hours; this is not configurable
+    SIGNED_UPLOAD_TTL = 2 * 60 * 60
+    
+    def __init__(self, index=None):
+        super().__init__(index)
+        self.supabase_url: str = os.environ.get('SUPABASE_URL')
+        self.supabase_key: str = os.environ.get('SUPABASE_KEY')
+        self.supabase_service_role_key: str = os.environ.get('SUPABASE_SERVICE_ROLE_KEY')
+        self.bucket_name: str = os.environ.get('SUPABASE_BUCKET_NAME', 'saarthi-reports')
+        self._http_session: Optional[requests.Session] = None
+        self._client = None
+        self._client_ready = False
+        self._client_lock = threading.Lock()
+    
+    @property
+    def client(self):
+        """
+        Supabase client, created on first use and shared by all threads.
+        
+        None if Supabase is not configured. The supabase package is slow to
+        import, so it is only loaded here rather than with this module.
+        """
+        if not self._client_ready:
+            with self._client_lock:
+                if not self._client_ready:
+                    self._client = self._create_client()
+                    self._client_ready = True
+        return self._client
+    
+    def _create_client(self):
+        logger.info(f"Initializing Supabase storage with URL: {self.supabase_url}")
+        logger.info(f"Bucket name: {self.bucket_name}")
+        
+        if not all([self.supabase_url, self.supabase_key]):
+            logger.warning("Supabase configuration missing. File uploads will fail.")
+            return None
         
         try:
-            # Extract file path from full URL if needed
-            if file_path.startswith('http'):
-                # Extract path from URL
-                from urllib.parse import urlparse
-                parsed_url = urlparse(file_path)
-                file_path = parsed_url.path.lstrip('/')
+            from supabase import create_client
             
-            result = self.client.storage.from_(self.bucket_name).remove([file_path])
+            # Use service role key for admin operations
+            key_to_use = self.supabase_service_role_key or self.supabase_key
+            logger.info(f"Using key type: {'service_role' if self.supabase_service_role_key else 'anon'}")
             
-            if result.data:
-                logger.info(f"File deleted successfully: {file_path}")
-                return True
-            else:
-                logger.error(f"Delete failed: {result}")
-                return False
-                
+            client = create_client(
+                self.supabase_url,
+                key_to_use
+            )
+            logger.info("Supabase client initialized successfully")
+            return client
         except Exception as e:
-            logger.error(f"Error deleting file from Supabase: {e}")
-            return False
+            logger.error(f"Failed to initialize Supabase client: {e}")
+            logger.exception("Full exception details:")
+            return None
+    
+    def is_configured(self) -> bool:
+        """Check if Supabase storage is properly configured."""
+        return self.client is not None
+    
+    @property
+    def bucket(self):
+        return self.client.storage.from_(self.bucket_name)
+    
+    def _save(self, source, file_path: str, content_type: str, size: int) -> None:
+        threshold = getattr(settings, 'PHOTO_RESUMABLE_THRESHOLD', 6 * 1024 * 1024)
+        if not isinstance(source, bytes) and size > threshold:
+            logger.info(f"Starting resumable upload to bucket: {self.bucket_name}")
+            with track_upstream('storage'):
+                self._upload_resumable(source, file_path, content_type, size)
+            return
+        
+        logger.info(f"Starting upload to bucket: {self.bucket_name}")
+        # storage3 raises StorageException on any non-2xx response
+        with track_upstream('storage'):
+            self.bucket.upload(
+                path=file_path,
+                file=source,
+                file_options={
+                    "content-type": content_type,
+                    # Same path means same bytes, so overwriting is harmless
+                    "upsert": "true",
+                }
+            )
+    
+    def _upload_resumable(self, stream, file_path: str, content_type: str, size: int) -> None:
+        """
+        Upload a file in fixed-size chunks with the TUS resumable protocol.
+        
+        Each chunk is streamed from disk, so memory use is bounded by the
+        socket buffer rather than the chunk or file size. A failed chunk is
+        resumed from the offset the server reports.
+        """
+        chunk_size = getattr(settings, 'PHOTO_UPLOAD_CHUNK_SIZE', 6 * 1024 * 1024)
+        retries = getattr(settings, 'PHOTO_UPLOAD_RETRIES', 3)
+        key = self.supabase_service_role_key or self.supabase_key
+        endpoint = f"{self.supabase_url.rstrip('/')}/storage/v1/upload/resumable"
+        headers = {
+            'Authorization': f"Bearer {key}",
+            'apikey': key,
+            'Tus-Resumable': '1.0.0',
+        }
+        metadata = {
+            'bucketName': self.bucket_name,
+            'objectName': file_path,
+            'contentType': content_type,
+        }
+        
+        session = self.http_session
+        response = session.post(endpoint, headers={
+            **headers,
+            'Upload-Length': str(size),
+            'Upload-Metadata': ','.join(
+                f"{k} {base64.b64encode(v.encode()).decode()}" for k, v in metadata.items()
+            ),
+        }, timeout=30)
+        response.raise_for_status()
+        location = urljoin(endpoint, response.headers['Location'])
+        
+        offset = 0
+        failures = 0
+        while offset < size:
+            length = min(chunk_size, size - offset)
+            try:
+                response = session.patch(
+                    location,
+                    data=FileSlice(stream, offset, length),
+                    headers={
+                        **headers,
+                        'Upload-Offset': str(offset),
+                        'Content-Type': 'application/offset+octet-stream',
+                    },
+                    timeout=60,
+                )
+                response.raise_for_status()
+                offset = int(response.headers['Upload-Offset'])
+            except requests.RequestException as e:
+                failures += 1
+                if failures > retries:
+                    raise
+                logger.warning(f"Chunk at offset {offset} failed ({e}), resuming")
+                # Ask the server how much it kept and continue from there
+                response = session.head(location, headers=headers, timeout=30)
+                response.raise_for_status()
+                offset = int(response.headers['Upload-Offset'])
+    
+    @property
+    def http_session(self) -> requests.Session:
+        if self._http_session is None:
+            self._http_session = requests.Session()
+        return self._http_session
+    
+    def _delete(self, file_paths: list) -> int:
+        deleted = 0
+        for start in range(0, len(file_paths), self.DELETE_BATCH_SIZE):
+            with track_upstream('storage'):
+                deleted += len(self.bucket.remove(file_paths[start:start + self.DELETE_BATCH_SIZE]))
+        return deleted
+    
+    def stat(self, file_path: str) -> Optional[dict]:
+        folder, _, name = file_path.rpartition('/')
+        try:
+            with track_upstream('storage'):
+                entries = self.bucket.list(folder, {'search': name, 'limit': 100})
+        except Exception as e:
+            logger.error(f"Error checking {file_path} in Supabase: {e}")
+            return None
+        for entry in entries:
+            if entry.get('name') == name:
+                metadata = entry.get('metadata') or {}
+                return {'size': metadata.get('size'), 'content_type': metadata.get('mimetype')}
+        return None
+    
+    def list_files(self, prefix: str = '', page_size: int = 1000) -> Iterator[list]:
+        # Listing is per folder and not recursive, so walk subfolders depth-first
+        folders = [prefix.strip('/')]
+        page = []
+        while folders:
+            folder = folders.pop()
+            offset = 0
+            while True:
+                with track_upstream('storage'):
+                    entries = self.bucket.list(folder, {
+                        'limit': page_size,
+                        'offset': offset,
+                        'sortBy': {'column': 'name', 'order': 'asc'},
+                    })
+                for entry in entries:
+                    path = f"{folder}/{entry['name']}" if folder else entry['name']
+                    if entry.get('id') is None:
+                        folders.append(path)
+                        continue
+                    page.append({
+                        'path': path,
+                        'size': (entry.get('metadata') or {}).get('size'),
+                        'updated_at': parse_datetime(entry.get('updated_at') or ''),
+                    })
+                    if len(page) >= page_size:
+                        yield page
+                        page = []
+                if len(entries) < page_size:
+                    break
+                offset += page_size
+        if page:
+            yield page
+    
+    def create_signed_upload(self, file_path: str, content_type: str, size: int) -> dict:
+        # Supabase can't bind the size to the URL; finalizing checks it instead
+        with track_upstream('storage'):
+            signed = self.bucket.create_signed_upload_url(file_path)
+        return {
+            'url': signed['signed_url'],
+            'method': 'PUT',
+            'headers': {'Content-Type': content_type},
+            'expires_in': self.SIGNED_UPLOAD_TTL,
+        }
     
     def get_public_url(self, file_path: str) -> Optional[str]:
         """
@@ -189,11 +709,34 @@ class SupabaseStorageService:
             return None
         
         try:
-            return self.client.storage.from_(self.bucket_name).get_public_url(file_path)
+            return self.bucket.get_public_url(file_path)
         except Exception as e:
             logger.error(f"Error getting public URL: {e}")
             return None
 
 
-# Global instance
-supabase_storage = SupabaseStorageService()
+def create_storage_backend(name: Optional[str] = None) -> StorageBackend:
+    """
+    Instantiate the storage backend named by PHOTO_STORAGE_BACKEND.
+    
+    Accepts a short name from STORAGE_BACKENDS or a dotted class path.
+    """
+    name = name or getattr(settings, 'PHOTO_STORAGE_BACKEND', 'supabase')
+    return import_string(STORAGE_BACKENDS.get(name, name))()
+
+
+class DefaultPhotoStorage(LazyObject):
+    """
+    Proxy for the configured backend, built on first use.
+    
+    Works like Django's default_storage: importing this module stays cheap,
+    and each process creates one backend (and storage client) that every
+    caller shares.
+    """
+    
+    def _setup(self):
+        self._wrapped = create_storage_backend()
+
+
+# Global instance, created on first use
+photo_storage = DefaultPhotoStorage()
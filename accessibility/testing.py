@@ -0,0 +1,362 @@
+"""
+Local stand-ins for third-party services, for tests and benchmarks.
+"""
+import base64
+import hashlib
+import itertools
+import json
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+def _now():
+    return datetime.now(timezone.utc).isoformat().replace('+00:00', 'Z')
+
+
+class FakeWeatherUpstream:
+    """
+    Minimal OpenWeatherMap look-alike served from a local thread.
+
+    Counts requests and client connections, and can be told to respond
+    slowly or fail, so weather client behaviour (coalescing, keep-alive,
+    circuit breaking) can be checked without network access.
+
+    Usage:
+        with FakeWeatherUpstream() as upstream:
+            with override_settings(OPENWEATHER_URL=upstream.url, ...):
+                ...
+    """
+
+    def __init__(self, condition='Clear', temperature=25.0, delay=0.0):
+        self.condition = condition
+        self.temperature = temperature
+        self.delay = delay
+        self.status = 200
+        self.requests = []
+        self.connections = set()
+        self._lock = threading.Lock()
+        self._server = None
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/data/2.5/weather"
+
+    @property
+    def request_count(self):
+        with self._lock:
+            return len(self.requests)
+
+    def fail(self, status=503):
+        self.status = status
+
+    def recover(self):
+        self.status = 200
+
+    def _handler(self):
+        upstream = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                query = {k: v[0] for k, v in parse_qs(urlparse(self.path).query).items()}
+                with upstream._lock:
+                    upstream.requests.append(query)
+                    upstream.connections.add(self.client_address)
+                if upstream.delay:
+                    time.sleep(upstream.delay)
+
+                if upstream.status == 200:
+                    body = json.dumps({
+                        'weather': [{'main': upstream.condition, 'description': upstream.condition.lower()}],
+                        'main': {
+                            'temp': upstream.temperature,
+                            'feels_like': upstream.temperature,
+                            'humidity': 50,
+                        },
+                    }).encode()
+                else:
+                    body = b'{"message": "unavailable"}'
+
+                self.send_response(upstream.status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self):
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), self._handler())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(
+            target=self._server.serve_forever, kwargs={'poll_interval': 0.05}, daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+class FakeStorageUpstream:
+    """
+    Minimal Supabase Storage look-alike for upload tests and benchmarks.
+
+    Accepts standard object uploads, TUS resumable uploads, signed uploads,
+    listing and batch deletes. Request bodies are read in small chunks and only each object's
+    size and SHA-256 are kept, so the fake itself never buffers file contents.
+    """
+
+    READ_SIZE = 64 * 1024
+
+    def __init__(self):
+        self.objects = {}
+        self.resumable = {}
+        self.fail_next_patch = False
+        self.delete_requests = 0
+        self.signed = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._server = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def _handler(self):
+        upstream = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def _drain(self, digest=None):
+                remaining = int(self.headers.get('Content-Length', 0))
+                size = 0
+                while remaining:
+                    chunk = self.rfile.read(min(upstream.READ_SIZE, remaining))
+                    if not chunk:
+                        break
+                    remaining -= len(chunk)
+                    size += len(chunk)
+                    if digest is not None:
+                        digest.update(chunk)
+                return size
+
+            def _reply(self, status, body=b'', headers=None):
+                self.send_response(status)
+                for key, value in (headers or {}).items():
+                    self.send_header(key, value)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                if body:
+                    self.wfile.write(body)
+
+            def _json(self):
+                length = int(self.headers.get('Content-Length', 0))
+                return json.loads(self.rfile.read(length) or b'{}')
+
+            def _reply_json(self, data):
+                self._reply(200, json.dumps(data).encode(), {'Content-Type': 'application/json'})
+
+            def do_POST(self):
+                path = urlparse(self.path).path
+                if '/storage/v1/object/list/' in path:
+                    body = self._json()
+                    prefix = body.get('prefix', '').strip('/')
+                    prefix = f"{prefix}/" if prefix else ''
+                    search = body.get('search', '')
+                    with upstream._lock:
+                        children = {}
+                        for name, stored in upstream.objects.items():
+                            if not name.startswith(prefix):
+                                continue
+                            child, slash, _ = name[len(prefix):].partition('/')
+                            if slash:
+                                # Folders come back as entries without an id
+                                children.setdefault(child, {'name': child, 'id': None, 'metadata': None})
+                            else:
+                                children[child] = {
+                                    'name': child,
+                                    'id': name,
+                                    'updated_at': stored.get('updated_at'),
+                                    'metadata': {'size': stored['size'], 'mimetype': stored.get('mimetype')},
+                                }
+                        entries = [children[name] for name in sorted(children) if search in name]
+                    offset = body.get('offset', 0)
+                    self._reply_json(entries[offset:offset + body.get('limit', 100)])
+                    return
+
+                if '/storage/v1/object/upload/sign/' in path:
+                    self._drain()
+                    token = f"token-{next(upstream._ids)}"
+                    signed_path = path.split('/storage/v1', 1)[-1]
+                    with upstream._lock:
+                        upstream.signed[token] = signed_path.split('/upload/sign/', 1)[-1].split('/', 1)[-1]
+                    self._reply_json({'url': f"{signed_path}?token={token}"})
+                    return
+
+                if path.endswith('/upload/resumable'):
+                    self._drain()
+                    upload_id = str(next(upstream._ids))
+                    meta = dict(
+                        item.split(' ', 1) for item in self.headers.get('Upload-Metadata', '').split(',') if item
+                    )
+                    with upstream._lock:
+                        upstream.resumable[upload_id] = {
+                            'length': int(self.headers['Upload-Length']),
+                            'offset': 0,
+                            'digest': hashlib.sha256(),
+                            'name': base64.b64decode(meta.get('objectName', '')).decode(),
+                        }
+                    self._reply(201, headers={
+                        'Location': f"/storage/v1/upload/resumable/{upload_id}",
+                        'Tus-Resumable': '1.0.0',
+                    })
+                    return
+
+                # Standard upload: /storage/v1/object/<bucket>/<path>
+                name = path.split('/storage/v1/object/', 1)[-1].split('/', 1)[-1]
+                digest = hashlib.sha256()
+                size = self._drain(digest)
+                with upstream._lock:
+                    upstream.objects[name] = {'size': size, 'sha256': digest.hexdigest(), 'updated_at': _now()}
+                self._reply_json({'Key': name})
+
+            def do_PUT(self):
+                # Signed upload: /storage/v1/object/upload/sign/<bucket>/<path>?token=...
+                token = parse_qs(urlparse(self.path).query).get('token', [''])[0]
+                digest = hashlib.sha256()
+                size = self._drain(digest)
+                with upstream._lock:
+                    name = upstream.signed.pop(token, None)
+                    if name is not None:
+                        upstream.objects[name] = {
+                            'size': size,
+                            'sha256': digest.hexdigest(),
+                            'mimetype': self.headers.get('Content-Type'),
+                            'updated_at': _now(),
+                        }
+                if name is None:
+                    self._reply(400, b'{"message": "invalid signature"}')
+                else:
+                    self._reply_json({'Key': name})
+
+            def do_DELETE(self):
+                deleted = []
+                with upstream._lock:
+                    upstream.delete_requests += 1
+                    for name in self._json().get('prefixes', []):
+                        if upstream.objects.pop(name, None) is not None:
+                            deleted.append({'name': name})
+                self._reply_json(deleted)
+
+            def do_PATCH(self):
+                upload_id = urlparse(self.path).path.rsplit('/', 1)[-1]
+                upload = upstream.resumable[upload_id]
+                if int(self.headers['Upload-Offset']) != upload['offset']:
+                    self._drain()
+                    self._reply(409)
+                    return
+                if upstream.fail_next_patch:
+                    upstream.fail_next_patch = False
+                    self._drain()
+                    self._reply(500)
+                    return
+
+                upload['offset'] += self._drain(upload['digest'])
+                if upload['offset'] >= upload['length']:
+                    with upstream._lock:
+                        upstream.objects[upload['name']] = {
+                            'size': upload['offset'],
+                            'sha256': upload['digest'].hexdigest(),
+                            'updated_at': _now(),
+                        }
+                self._reply(204, headers={'Upload-Offset': str(upload['offset'])})
+
+            def do_HEAD(self):
+                upload_id = urlparse(self.path).path.rsplit('/', 1)[-1]
+                upload = upstream.resumable[upload_id]
+                self._reply(200, headers={'Upload-Offset': str(upload['offset'])})
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self):
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), self._handler())
+        self._server.daemon_threads = True
+        threading.Thread(
+            target=self._server.serve_forever, kwargs={'poll_interval': 0.05}, daemon=True
+        ).start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+class MemoryObjectIndex:
+    """In-memory stand-in for StoredObjectIndex, so storage runs without a database."""
+
+    def __init__(self):
+        self.objects = {}
+
+    def lookup(self, content_hash):
+        entry = self.objects.get(content_hash)
+        return entry['url'] if entry else None
+
+    def record(self, content_hash, path, url, size):
+        self.objects.setdefault(content_hash, {'path': path, 'url': url, 'size': size})
+
+    def forget(self, paths):
+        paths = set(paths)
+        for content_hash, entry in list(self.objects.items()):
+            if entry['path'] in paths:
+                del self.objects[content_hash]
+
+
+def supabase_service_for(upstream, bucket='test'):
+    """Build a SupabaseStorageBackend that talks to a FakeStorageUpstream."""
+    from .storage import SupabaseStorageBackend
+
+    env = {
+        'SUPABASE_URL': upstream.url,
+        'SUPABASE_KEY': 'test.test.test',
+        'SUPABASE_SERVICE_ROLE_KEY': '',
+        'SUPABASE_BUCKET_NAME': bucket,
+    }
+    saved = {key: os.environ.get(key) for key in env}
+    os.environ.update(env)
+    try:
+        return SupabaseStorageBackend()
+    finally:
+        for key, value in saved.items():
+            if value is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = value
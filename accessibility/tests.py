@@ -1,3 +1,1258 @@
-from django.test import TestCase
+import hashlib
+import io
+import math
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from unittest import mock
+
+import requests
+from django.contrib.auth import get_user_model
+from django.core import signing
+from django.core.cache import cache
+from django.core.files import File
+from django.core.management import call_command
+from django.db.models import F
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+from PIL import Image
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from . import photo_gc, scoring, signals, uploads
+from .feedback import aggregate_feedback, community_adjustment
+from .images import normalize_image
+from .models import (
+    AccessibilityReport, CacheVersion, PhotoDeletion, RouteFeedback, SegmentRating, StoredObject,
+)
+from .polyline import decode, encode
+from .reachability import hazard_version, reachable_area
+from .routes import recall_route, remember_routes
+from .serializers import AccessibilityReportSerializer
+from .scoring import EARTH_RADIUS_KM, ScoringProfile, corridor_penalties, get_profile
+from .storage import DefaultPhotoStorage, LocalStorageBackend, SupabaseStorageBackend
+from .testing import FakeStorageUpstream, FakeWeatherUpstream, MemoryObjectIndex, supabase_service_for
+from .uploads import (
+    PhotoUploadQueue, claim_spooled, direct_upload_path, direct_upload_token, direct_upload_token_path,
+    upload_with_retries, verify_direct_upload,
+)
+from .views import (
+    MyReportsView, MyRouteFeedbackView, ReportPhotoFinalizeView, ReportPhotoUploadURLView,
+    RouteCalculationView, RouteChangesView, SignedPhotoUploadView,
+)
+from .weather import WeatherPrefetcher, WeatherService
+
+
+def scalar_distance_km(point, coordinates):
+    """Distance from a [lat, lon] point to a [lon, lat] polyline, one segment at a time."""
+    ref_lat = math.radians(point[0])
+
+    def project(lat, lon):
+        return math.radians(lon) * math.cos(ref_lat) * EARTH_RADIUS_KM, math.radians(lat) * EARTH_RADIUS_KM
+
+    px, py = project(*point)
+    points = coordinates if len(coordinates) > 1 else coordinates * 2
+    best = math.inf
+    for (lon0, lat0), (lon1, lat1) in zip(points[:-1], points[1:]):
+        ax, ay = project(lat0, lon0)
+        bx, by = project(lat1, lon1)
+        dx, dy = bx - ax, by - ay
+        length_sq = dx * dx + dy * dy
+        t = 0 if not length_sq else max(0, min(1, ((px - ax) * dx + (py - ay) * dy) / length_sq))
+        best = min(best, math.hypot(px - ax - t * dx, py - ay - t * dy))
+    return best
+
+
+def report(severity, problem_type='Pothole', lat=28.6, lon=77.2):
+    return AccessibilityReport(
+        latitude=lat, longitude=lon, severity=severity,
+        problem_type=problem_type, disability_types=['Wheelchair'],
+    )
+
+
+class ScoringTests(SimpleTestCase):
+    def test_corridor_penalties_match_scalar_loop(self):
+        rng = random.Random(7)
+        routes = [
+            [[77.2 + rng.uniform(-0.05, 0.05), 28.6 + rng.uniform(-0.05, 0.05)]
+             for _ in range(rng.randint(1, 5))]
+            for _ in range(20)
+        ]
+        hazards = [[28.6 + rng.uniform(-0.06, 0.06), 77.2 + rng.uniform(-0.06, 0.06)] for _ in range(300)]
+        weights = [rng.choice([0, 1, 3, 5]) for _ in hazards]
+        corridor_km = 1.0
+
+        penalties = corridor_penalties(routes, hazards, weights, corridor_km)
+
+        for route, penalty in zip(routes, penalties):
+            expected = 0.0
+            ambiguous = 0.0
+            for hazard, weight in zip(hazards, weights):
+                distance = scalar_distance_km(hazard, route)
+                # The projections differ slightly; ignore hazards on the edge
+                if abs(distance - corridor_km) < 0.01:
+                    ambiguous += weight
+                elif distance < corridor_km:
+                    expected += weight
+            self.assertGreaterEqual(penalty, expected)
+            self.assertLessEqual(penalty, expected + ambiguous)
+
+    def test_routes_without_coordinates_get_no_penalty(self):
+        penalties = corridor_penalties([[], [[77.2, 28.6]], []], [[28.6, 77.2]], [5], 1.0)
+        self.assertEqual(list(penalties), [0, 5, 0])
+        self.assertEqual(list(corridor_penalties([[], []], [[28.6, 77.2]], [5], 1.0)), [0, 0])
+
+    def test_baseline_severity_weights(self):
+        profile = get_profile('wheelchair')
+        reports = [report('Critical', 'Other'), report('Critical', 'Other'),
+                   report('High', 'Other'), report('Medium', 'Other')]
+        routes = [
+            {'type': route_type, 'distance_km': 0, 'coordinates': [[77.2, 28.6], [77.21, 28.6]]}
+            for route_type in ('fastest', 'safest', 'community_verified')
+        ]
+        points = [[28.6, 77.2]] * len(reports)
+        scores = profile.score(routes, points, profile.hazard_weights(reports), {'condition': 'Clear'})
+        # 2 critical, 1 high: 2*5+3, 2*2+1 and 2*3+2, as before profiles existed
+        self.assertEqual(list(scores), [87, 95, 92])
+        rain = profile.score(routes, points, profile.hazard_weights(reports), {'condition': 'Rain'})
+        self.assertEqual(list(rain), [87, 100, 92])
+
+    def test_profiles_weigh_problem_types(self):
+        hazards = [report('High', 'stairs')]
+        wheelchair = get_profile('wheelchair').hazard_weights(hazards)
+        visual = get_profile('visual').hazard_weights(hazards)
+        self.assertEqual(wheelchair['fastest'][0], 4.5)
+        self.assertEqual(visual['fastest'][0], 3)
+        self.assertEqual(get_profile('unknown').name, 'wheelchair')
+
+    def test_profiles_match_names_and_labels_in_any_case(self):
+        for value in ('visual', 'Visual', 'VISUAL', 'Visual Impairment', ' visual impairment '):
+            self.assertEqual(get_profile(value).name, 'visual')
+        self.assertEqual(get_profile('Mobility Issues').name, 'mobility')
+        self.assertEqual(get_profile(None).name, 'wheelchair')
+
+    def test_settings_overrides_merge_nested_weights(self):
+        overrides = {
+            'wheelchair': {'problem_type_weights': {'Stairs': 2.0}},
+            'visual': {'severity_weights': {'fastest': {'Critical': 6}}},
+        }
+        with override_settings(ROUTE_SCORING_PROFILES=overrides), mock.patch.dict(scoring._registry, clear=True):
+            wheelchair = get_profile('wheelchair')
+            visual = get_profile('visual')
+        self.assertEqual(wheelchair.problem_type_weights, {'stairs': 2.0, 'broken ramp': 1.5, 'pothole': 1.25})
+        weights = visual.hazard_weights([report('Critical'), report('High')])
+        self.assertEqual(list(weights['fastest']), [6, 3])
+        self.assertEqual(list(weights['safest']), [2, 1])
+
+    def test_custom_severity_weights(self):
+        profile = ScoringProfile('test', 'Wheelchair', severity_weights={'fastest': {'Low': 1}})
+        weights = profile.hazard_weights([report('Low'), report('Critical')])
+        self.assertEqual(list(weights['fastest']), [1, 0])
+        self.assertEqual(list(weights['safest']), [0, 0])
+
+
+class PolylineTests(SimpleTestCase):
+    # Reference example from Google's polyline algorithm documentation
+    GOOGLE_EXAMPLE = '_p~iF~ps|U_ulLnnqC_mqNvxq`@'
+    GOOGLE_POINTS = [[-120.2, 38.5], [-120.95, 40.7], [-126.453, 43.252]]
+
+    def test_encode_reference_example(self):
+        self.assertEqual(encode(self.GOOGLE_POINTS), self.GOOGLE_EXAMPLE)
+
+    def test_decode_reference_example(self):
+        self.assertEqual(decode(self.GOOGLE_EXAMPLE), self.GOOGLE_POINTS)
+
+    def test_empty(self):
+        self.assertEqual(encode([]), '')
+        self.assertEqual(decode(''), [])
+
+    def test_round_trip_precisions(self):
+        points = [[77.2090123, 28.6139456], [77.2101, 28.6145], [77.1999, 28.6001], [-0.0001, -0.0001]]
+        for precision in range(1, 8):
+            with self.subTest(precision=precision):
+                decoded = decode(encode(points, precision), precision)
+                for (lon, lat), (dlon, dlat) in zip(points, decoded):
+                    self.assertAlmostEqual(lon, dlon, delta=10 ** -precision)
+                    self.assertAlmostEqual(lat, dlat, delta=10 ** -precision)
+
+    def test_repeated_points(self):
+        points = [[77.2, 28.6], [77.2, 28.6], [77.2, 28.6]]
+        self.assertEqual(decode(encode(points)), points)
+
+    def test_truncated_input(self):
+        with self.assertRaises(ValueError):
+            decode(self.GOOGLE_EXAMPLE[:-1])
+
+    def test_invalid_character(self):
+        with self.assertRaises(ValueError):
+            decode('_p~iF ~ps|U')
+
+
+class WeatherServiceTests(SimpleTestCase):
+    def setUp(self):
+        self.upstream = FakeWeatherUpstream(condition='Rain').start()
+        self.addCleanup(self.upstream.stop)
+        overrides = override_settings(
+            OPENWEATHER_API_KEY='test-key',
+            OPENWEATHER_URL=self.upstream.url,
+            WEATHER_CACHE_TTL=60,
+            WEATHER_STALE_TTL=0,
+            WEATHER_BREAKER_THRESHOLD=2,
+            WEATHER_BREAKER_RESET=60,
+        )
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        self.service = WeatherService()
+
+    def test_nearby_points_share_a_cell(self):
+        self.service.get_weather(28.6139, 77.2090)
+        weather = self.service.get_weather(28.6201, 77.2150)
+        self.assertEqual(weather['condition'], 'Rain')
+        self.assertEqual(self.upstream.request_count, 1)
+
+    def test_fresh_entries_are_served_from_cache(self):
+        self.service.get_weather(28.61, 77.20)
+        self.service.get_weather(28.61, 77.20)
+        self.assertEqual(self.upstream.request_count, 1)
+        stats = self.service.stats()
+        self.assertEqual((stats['lookups'], stats['fresh_hits'], stats['misses']), (2, 1, 1))
+        self.assertEqual(stats['hit_rate'], 0.5)
+        self.assertEqual(stats['cache']['size'], 1)
+
+    def test_expired_entries_are_fetched_again(self):
+        self.service.get_weather(28.61, 77.20)
+        self.service.ttl = 0
+        time.sleep(0.01)
+        self.upstream.condition = 'Clear'
+
+        self.assertEqual(self.service.get_weather(28.61, 77.20)['condition'], 'Clear')
+        self.assertEqual(self.upstream.request_count, 2)
+        self.assertEqual(self.service.stats()['misses'], 2)
+
+    def test_callers_cannot_change_the_cached_value(self):
+        first = self.service.get_weather(28.61, 77.20)
+        first['condition'] = 'Snow'
+        second = self.service.get_weather(28.61, 77.20)
+        second['temperature'] = -40
+        third = self.service.get_weather(28.61, 77.20)
+        self.assertEqual(third['condition'], 'Rain')
+        self.assertNotEqual(third['temperature'], -40)
+
+    def test_concurrent_misses_are_coalesced(self):
+        self.upstream.delay = 0.2
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(self.service.get_weather(28.61, 77.20)))
+            for _ in range(10)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(self.upstream.request_count, 1)
+        self.assertEqual([w['condition'] for w in results], ['Rain'] * 10)
+
+    def test_session_reuses_connections(self):
+        for i in range(5):
+            self.service.get_weather(10 + i, 77.20)
+        self.assertEqual(self.upstream.request_count, 5)
+        self.assertEqual(len(self.upstream.connections), 1)
+
+    def test_outage_serves_last_known_value(self):
+        self.service.get_weather(28.61, 77.20)
+        self.service.ttl = 0
+        time.sleep(0.01)
+        self.upstream.fail()
+
+        weather = self.service.get_weather(28.61, 77.20)
+        self.assertEqual(weather['condition'], 'Rain')
+        self.assertTrue(weather['stale'])
+
+    def test_circuit_opens_after_failures(self):
+        self.upstream.fail()
+        for i in range(5):
+            weather = self.service.get_weather(10 + i, 77.20)
+            self.assertEqual(weather['condition'], 'Unknown')
+
+        # Threshold is 2, so the remaining lookups never reach upstream
+        self.assertEqual(self.upstream.request_count, 2)
+        self.assertEqual(self.service.breaker.state, 'open')
+
+    def test_circuit_recovers_after_reset_timeout(self):
+        self.upstream.fail()
+        self.service.get_weather(10, 77.20)
+        self.service.get_weather(11, 77.20)
+        self.assertEqual(self.service.breaker.state, 'open')
+
+        self.upstream.recover()
+        self.service.breaker.reset_timeout = 0
+        weather = self.service.get_weather(12, 77.20)
+        self.assertEqual(weather['condition'], 'Rain')
+        self.assertEqual(self.service.breaker.state, 'closed')
+
+
+class WeatherPrefetcherTests(SimpleTestCase):
+    def setUp(self):
+        self.upstream = FakeWeatherUpstream().start()
+        self.addCleanup(self.upstream.stop)
+        overrides = override_settings(
+            OPENWEATHER_API_KEY='test-key',
+            OPENWEATHER_URL=self.upstream.url,
+            WEATHER_CACHE_TTL=60,
+            WEATHER_PREFETCH_LEAD=30,
+            WEATHER_PREFETCH_CELLS=2,
+            WEATHER_PREFETCH_RATE=60,
+        )
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        self.service = WeatherService()
+        self.prefetcher = WeatherPrefetcher(self.service)
+
+    def test_refreshes_hottest_expiring_cells(self):
+        for _ in range(5):
+            self.service.get_weather(10, 77)
+        for _ in range(3):
+            self.service.get_weather(20, 77)
+        self.service.get_weather(30, 77)
+        self.assertEqual(self.upstream.request_count, 3)
+
+        # Nothing is close to expiry yet
+        self.assertEqual(self.prefetcher.run_once(), [])
+
+        self.service.ttl = 10
+        for future in self.prefetcher.run_once():
+            future.result()
+        refreshed = {float(r['lat']) for r in self.upstream.requests[3:]}
+        self.assertEqual(refreshed, {10.05, 20.05})
+
+    def test_respects_rate_limit(self):
+        for lat in range(10):
+            self.service.get_weather(lat, 77)
+        self.service.ttl = 0
+        self.prefetcher.max_cells = 10
+        self.prefetcher.limiter.tokens = 3
+        self.assertEqual(len(self.prefetcher.run_once()), 3)
+        self.assertEqual(self.prefetcher.rate_limited, 1)
+
+
+class FlakyStorage:
+    """Storage stand-in that fails a set number of times before succeeding."""
+
+    def __init__(self, failures=0, raises=False):
+        self.failures = failures
+        self.raises = raises
+        self.attempts = 0
+        self.uploaded = []
+
+    def upload_file(self, file_obj):
+        self.attempts += 1
+        if self.attempts <= self.failures:
+            if self.raises:
+                raise ConnectionError("storage unavailable")
+            return None
+        self.uploaded.append((file_obj.name, file_obj.read()))
+        return f"https://storage.test/reports/{file_obj.name}"
+
+
+class PhotoUploadTests(SimpleTestCase):
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp(suffix='.jpg')
+        with os.fdopen(fd, 'wb') as fh:
+            fh.write(b'photo-bytes')
+        self.addCleanup(os.remove, self.path)
+        self.delays = []
+
+    def test_uploads_spooled_file(self):
+        storage = FlakyStorage()
+        url = upload_with_retries(storage, self.path, sleep=self.delays.append)
+        self.assertTrue(url.endswith('.jpg'))
+        self.assertEqual(storage.uploaded[0][1], b'photo-bytes')
+        self.assertEqual(self.delays, [])
+
+    def test_retries_with_backoff(self):
+        storage = FlakyStorage(failures=2, raises=True)
+        url = upload_with_retries(storage, self.path, retries=3, backoff=1, sleep=self.delays.append)
+        self.assertIsNotNone(url)
+        self.assertEqual(storage.attempts, 3)
+        self.assertEqual(len(self.delays), 2)
+        self.assertTrue(1 <= self.delays[0] <= 1.5)
+        self.assertTrue(2 <= self.delays[1] <= 3)
+
+    def test_gives_up_after_retries(self):
+        storage = FlakyStorage(failures=10)
+        url = upload_with_retries(storage, self.path, retries=2, backoff=1, sleep=self.delays.append)
+        self.assertIsNone(url)
+        self.assertEqual(storage.attempts, 3)
+
+
+@override_settings(PHOTO_RESUMABLE_THRESHOLD=1024, PHOTO_UPLOAD_CHUNK_SIZE=1024)
+class StreamingUploadTests(SimpleTestCase):
+    def setUp(self):
+        self.upstream = FakeStorageUpstream().start()
+        self.addCleanup(self.upstream.stop)
+        self.service = supabase_service_for(self.upstream)
+        self.content = os.urandom(5000)
+        fd, self.path = tempfile.mkstemp(suffix='.jpg')
+        with os.fdopen(fd, 'wb') as fh:
+            fh.write(self.content)
+        self.addCleanup(os.remove, self.path)
+
+    def upload(self, name):
+        with open(self.path, 'rb') as fh:
+            return self.service.upload_file(File(fh), name)
+
+    def test_resumable_upload_in_chunks(self):
+        self.assertIsNotNone(self.upload('reports/a.jpg'))
+        stored = self.upstream.objects['reports/a.jpg']
+        self.assertEqual(stored['size'], len(self.content))
+        self.assertEqual(stored['sha256'], hashlib.sha256(self.content).hexdigest())
+
+    def test_resumes_after_failed_chunk(self):
+        self.upstream.fail_next_patch = True
+        self.assertIsNotNone(self.upload('reports/b.jpg'))
+        stored = self.upstream.objects['reports/b.jpg']
+        self.assertEqual(stored['sha256'], hashlib.sha256(self.content).hexdigest())
+
+    @override_settings(PHOTO_RESUMABLE_THRESHOLD=10 * 1024)
+    def test_small_files_use_single_request(self):
+        self.assertIsNotNone(self.upload('reports/c.jpg'))
+        self.assertIn('reports/c.jpg', self.upstream.objects)
+        self.assertEqual(self.upstream.resumable, {})
+
+
+class ImageProcessingTests(SimpleTestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir)
+
+    def make_photo(self, size, orientation=None):
+        path = os.path.join(self.dir, 'photo.jpg')
+        image = Image.new('RGB', size, 'blue')
+        exif = Image.Exif()
+        exif[0x010F] = 'PhoneMaker'  # Make
+        if orientation:
+            exif[0x0112] = orientation
+        image.save(path, 'JPEG', exif=exif)
+        return path
+
+    def test_resizes_and_transcodes(self):
+        src = self.make_photo((4000, 3000))
+        display, thumbnail = normalize_image(src, self.dir, 1600, 320, 80)
+        with Image.open(display) as image:
+            self.assertEqual(image.format, 'WEBP')
+            self.assertEqual(image.size, (1600, 1200))
+            self.assertEqual(len(image.getexif()), 0)
+        with Image.open(thumbnail) as image:
+            self.assertEqual(image.size, (320, 240))
+
+    def test_applies_exif_orientation(self):
+        # Orientation 6 means the camera was rotated 90 degrees
+        src = self.make_photo((400, 300), orientation=6)
+        display, _ = normalize_image(src, self.dir, 1600, 320, 80)
+        with Image.open(display) as image:
+            self.assertEqual(image.size, (300, 400))
+
+    def test_small_photos_are_not_upscaled(self):
+        src = self.make_photo((200, 100))
+        display, thumbnail = normalize_image(src, self.dir, 1600, 320, 80)
+        with Image.open(display) as image:
+            self.assertEqual(image.size, (200, 100))
+
+
+class ContentDeduplicationTests(SimpleTestCase):
+    def setUp(self):
+        self.upstream = FakeStorageUpstream().start()
+        self.addCleanup(self.upstream.stop)
+        self.service = supabase_service_for(self.upstream)
+        self.service.index = MemoryObjectIndex()
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir)
+
+    def write(self, name, content):
+        path = os.path.join(self.dir, name)
+        with open(path, 'wb') as fh:
+            fh.write(content)
+        return path
+
+    def upload(self, path):
+        with open(path, 'rb') as fh:
+            return self.service.upload_file(File(fh))
+
+    def test_objects_are_named_by_content_hash(self):
+        content = b'hazard photo'
+        self.upload(self.write('a.jpg', content))
+        expected = f"reports/{hashlib.sha256(content).hexdigest()}.jpg"
+        self.assertEqual(list(self.upstream.objects), [expected])
+
+    def test_duplicate_content_is_not_uploaded_again(self):
+        first = self.upload(self.write('a.jpg', b'same bytes'))
+        second = self.upload(self.write('retry.jpg', b'same bytes'))
+        self.assertEqual(first, second)
+        self.assertEqual(len(self.upstream.objects), 1)
+        self.assertEqual(len(self.service.index.objects), 1)
+
+    def test_different_content_is_stored_separately(self):
+        self.upload(self.write('a.jpg', b'one'))
+        self.upload(self.write('b.jpg', b'two'))
+        self.assertEqual(len(self.upstream.objects), 2)
+
+    def test_deleted_objects_are_forgotten(self):
+        url = self.upload(self.write('a.jpg', b'gone'))
+        self.assertTrue(self.service.delete_file(url))
+        self.assertEqual(self.upstream.objects, {})
+        self.assertEqual(self.service.index.objects, {})
+
+
+class StorageBackendTests:
+    """Behaviour every storage backend must share; mixed into the cases below."""
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir)
+
+    def upload(self, name, content, file_path=None):
+        path = os.path.join(self.dir, name)
+        with open(path, 'wb') as fh:
+            fh.write(content)
+        with open(path, 'rb') as fh:
+            return self.backend.upload_file(File(fh), file_path or f"reports/{name}")
+
+    def test_exists(self):
+        self.upload('a.jpg', b'photo')
+        self.assertTrue(self.backend.exists('reports/a.jpg'))
+        self.assertFalse(self.backend.exists('reports/missing.jpg'))
+
+    def test_public_url_round_trip(self):
+        url = self.upload('a.jpg', b'photo')
+        self.assertEqual(url, self.backend.get_public_url('reports/a.jpg'))
+        self.assertEqual(self.backend.path_from_url(url), 'reports/a.jpg')
+        self.assertIsNone(self.backend.path_from_url('https://elsewhere.example/a.jpg'))
+
+    def test_list_files_in_bounded_pages(self):
+        for i in range(5):
+            self.upload(f"{i}.jpg", b'x', f"uploads/r{i % 2}/{i}.jpg")
+        pages = list(self.backend.list_files('uploads', page_size=2))
+        self.assertTrue(all(len(page) <= 2 for page in pages))
+        paths = sorted(item['path'] for page in pages for item in page)
+        self.assertEqual(paths, sorted(f"uploads/r{i % 2}/{i}.jpg" for i in range(5)))
+        self.assertIsNotNone(pages[0][0]['updated_at'])
+
+    def test_batch_delete(self):
+        urls = [self.upload(f"{i}.jpg", os.urandom(100)) for i in range(5)]
+        deleted = self.backend.delete_files(urls[:3] + ['reports/missing.jpg'])
+        self.assertEqual(deleted, 3)
+        self.assertFalse(self.backend.exists('reports/0.jpg'))
+        self.assertTrue(self.backend.exists('reports/4.jpg'))
+
+
+class LocalStorageBackendTests(StorageBackendTests, SimpleTestCase):
+    def setUp(self):
+        super().setUp()
+        self.root = os.path.join(self.dir, 'storage')
+        self.backend = LocalStorageBackend(self.root, '/media/storage/', index=MemoryObjectIndex())
+
+    def test_writes_under_root(self):
+        url = self.upload('a.jpg', b'photo')
+        self.assertEqual(url, '/media/storage/reports/a.jpg')
+        with open(os.path.join(self.root, 'reports', 'a.jpg'), 'rb') as fh:
+            self.assertEqual(fh.read(), b'photo')
+
+    def test_rejects_paths_outside_root(self):
+        self.assertIsNone(self.upload('a.jpg', b'photo', '../escape.jpg'))
+        self.assertFalse(os.path.exists(os.path.join(self.dir, 'escape.jpg')))
+
+
+class SupabaseStorageBackendTests(StorageBackendTests, SimpleTestCase):
+    def setUp(self):
+        super().setUp()
+        self.upstream = FakeStorageUpstream().start()
+        self.addCleanup(self.upstream.stop)
+        self.backend = supabase_service_for(self.upstream)
+        self.backend.index = MemoryObjectIndex()
+
+    def test_batch_delete_is_one_request(self):
+        urls = [self.upload(f"{i}.jpg", b'x' * i) for i in range(1, 4)]
+        self.backend.delete_files(urls)
+        self.assertEqual(self.upstream.delete_requests, 1)
+
+
+def jpeg_bytes(size=(64, 48)):
+    buffer = io.BytesIO()
+    Image.new('RGB', size, 'green').save(buffer, 'JPEG')
+    return buffer.getvalue()
+
+
+class LazyStartupTests(SimpleTestCase):
+    def test_storage_client_is_created_on_first_use(self):
+        with override_settings(PHOTO_STORAGE_BACKEND='supabase'), \
+                mock.patch.object(SupabaseStorageBackend, '_create_client', return_value=None) as create:
+            storage = DefaultPhotoStorage()
+            storage.bucket_name
+            create.assert_not_called()
+            storage.client
+            storage.client
+        create.assert_called_once_with()
+
+    def test_importing_the_api_builds_no_clients(self):
+        script = (
+            "import sys, django; django.setup(); "
+            "import accessibility.serializers, accessibility.views; "
+            "from django.utils.functional import empty; "
+            "from accessibility.storage import photo_storage; "
+            "from accessibility.weather import weather_service; "
+            "print(photo_storage._wrapped is empty, weather_service._wrapped is empty, 'supabase' in sys.modules)"
+        )
+        result = subprocess.run(
+            [sys.executable, '-c', script], capture_output=True, text=True,
+            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        )
+        self.assertEqual(result.stdout.split(), ['True', 'True', 'False'], result.stderr)
+
+
+class SignedUploadTests(SimpleTestCase):
+    REPORT_ID = '6f1c2a9e-0000-4000-8000-000000000001'
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir)
+        self.backend = LocalStorageBackend(self.dir, '/media/storage/', index=MemoryObjectIndex())
+        patcher = mock.patch('accessibility.views.photo_storage', self.backend)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def put(self, url, body, content_type='image/jpeg'):
+        token = url.rstrip('/').rsplit('/', 1)[-1]
+        request = APIRequestFactory().put(url, body, content_type=content_type)
+        return SignedPhotoUploadView.as_view()(request, token=token)
+
+    def test_local_round_trip(self):
+        body = jpeg_bytes()
+        path = direct_upload_path(self.REPORT_ID, 'photo.jpg')
+        upload = self.backend.create_signed_upload(path, 'image/jpeg', len(body))
+        self.assertEqual(upload['method'], 'PUT')
+
+        response = self.put(upload['url'], body)
+        self.assertEqual(response.status_code, 201)
+        self.assertIsNone(verify_direct_upload(self.backend, self.REPORT_ID, path))
+        self.assertEqual(self.backend.stat(path), {'size': len(body), 'content_type': 'image/jpeg'})
+
+    def test_rejects_tampered_and_expired_tokens(self):
+        path = direct_upload_path(self.REPORT_ID, 'photo.jpg')
+        url = self.backend.create_signed_upload(path, 'image/jpeg', 3)['url']
+        self.assertEqual(self.put(url.replace('/upload/', '/upload/x'), b'abc').status_code, 403)
+        with override_settings(PHOTO_SIGNED_UPLOAD_TTL=-1):
+            self.assertEqual(self.put(url, b'abc').status_code, 403)
+        self.assertFalse(self.backend.exists(path))
+
+    def test_rejects_body_of_unsigned_size(self):
+        path = direct_upload_path(self.REPORT_ID, 'photo.jpg')
+        url = self.backend.create_signed_upload(path, 'image/jpeg', 3)['url']
+        self.assertEqual(self.put(url, b'too long').status_code, 400)
+
+    def test_finalize_rejects_and_deletes_non_images(self):
+        path = direct_upload_path(self.REPORT_ID, 'photo.jpg')
+        url = self.backend.create_signed_upload(path, 'image/jpeg', 11)['url']
+        self.put(url, b'not a photo')
+        self.assertIn('not allowed', verify_direct_upload(self.backend, self.REPORT_ID, path))
+        self.assertFalse(self.backend.exists(path))
+
+    def test_finalize_checks_path_belongs_to_report(self):
+        path = direct_upload_path('someone-else', 'photo.jpg')
+        self.assertIsNotNone(verify_direct_upload(self.backend, self.REPORT_ID, path))
+
+    def test_finalize_rejects_paths_leaving_the_report_prefix(self):
+        victim = f"reports/{'a' * 64}.webp"
+        self.backend._save(jpeg_bytes(), victim, 'image/jpeg', 1)
+        for path in (
+            f"uploads/{self.REPORT_ID}/../../{victim}",
+            f"uploads/{self.REPORT_ID}/./x/../photo.jpg",
+            f"uploads/{self.REPORT_ID}//photo.jpg",
+        ):
+            with self.subTest(path=path):
+                self.assertEqual(
+                    verify_direct_upload(self.backend, self.REPORT_ID, path), 'Path was not issued for this report'
+                )
+        self.assertTrue(self.backend.exists(victim))
+
+    def test_upload_token_names_one_path_for_one_report(self):
+        path = direct_upload_path(self.REPORT_ID, 'photo.jpg')
+        token = direct_upload_token(self.REPORT_ID, path)
+        self.assertEqual(direct_upload_token_path(token, self.REPORT_ID), path)
+        with self.assertRaises(signing.BadSignature):
+            direct_upload_token_path(token, '6f1c2a9e-0000-4000-8000-000000000002')
+        with self.assertRaises(signing.BadSignature):
+            direct_upload_token_path(token[:-1], self.REPORT_ID)
+
+    def test_signed_url_cannot_overwrite_the_uploaded_object(self):
+        body = jpeg_bytes()
+        path = direct_upload_path(self.REPORT_ID, 'photo.jpg')
+        url = self.backend.create_signed_upload(path, 'image/jpeg', len(body))['url']
+        self.assertEqual(self.put(url, body).status_code, 201)
+        self.assertIsNone(verify_direct_upload(self.backend, self.REPORT_ID, path))
+
+        response = self.put(url, b'x' * len(body))
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['error'], 'Upload URL has already been used')
+        with open(self.backend._resolve(path), 'rb') as fh:
+            self.assertEqual(fh.read(), body)
+
+    def test_supabase_signed_upload(self):
+        with FakeStorageUpstream() as upstream:
+            backend = supabase_service_for(upstream)
+            body = jpeg_bytes()
+            path = direct_upload_path(self.REPORT_ID, 'photo.jpg')
+            upload = backend.create_signed_upload(path, 'image/jpeg', len(body))
+            response = requests.put(upload['url'], data=body, headers=upload['headers'])
+            self.assertEqual(response.status_code, 200)
+            self.assertIsNone(verify_direct_upload(backend, self.REPORT_ID, path))
+
+
+class PhotoReconciliationTests(SimpleTestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir)
+        self.backend = LocalStorageBackend(self.dir, '/media/storage/', index=MemoryObjectIndex())
+        for name in ('reports/kept.webp', 'reports/orphan.webp', 'uploads/r1/orphan.jpg', 'test/other.jpg'):
+            self.backend._save(b'x', name, 'image/webp', 1)
+        self.queued = []
+        for name, replacement in (
+            ('referenced_urls', lambda urls: {u for u in urls if 'kept' in u}),
+            ('queued_urls', lambda urls: set()),
+            ('queue_photo_deletion', lambda *urls: self.queued.extend(urls) or len(urls)),
+        ):
+            patcher = mock.patch.object(photo_gc, name, replacement)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_queues_unreferenced_objects_under_gc_prefixes(self):
+        scanned, queued = photo_gc.reconcile(self.backend, page_size=1, grace_period=-60)
+        self.assertEqual((scanned, queued), (3, 2))
+        self.assertEqual(sorted(self.queued), [
+            '/media/storage/reports/orphan.webp',
+            '/media/storage/uploads/r1/orphan.jpg',
+        ])
+
+    def test_recent_objects_are_left_alone(self):
+        self.assertEqual(photo_gc.reconcile(self.backend, grace_period=3600), (3, 0))
+
+
+class PhotoDeletionTests(TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir)
+        self.backend = LocalStorageBackend(self.dir, '/media/storage/')
+        self.user = get_user_model().objects.create(username='reporter')
+
+    def upload(self, content):
+        path = os.path.join(self.dir, 'upload.jpg')
+        with open(path, 'wb') as fh:
+            fh.write(content)
+        with open(path, 'rb') as fh:
+            return self.backend.upload_file(File(fh))
+
+    def report(self, photo_url):
+        return AccessibilityReport.objects.create(
+            user=self.user, latitude=28.6, longitude=77.2, problem_type='Pothole',
+            description='x', photo_url=photo_url,
+        )
+
+    def age_index(self):
+        StoredObject.objects.update(used_at=timezone.now() - timedelta(days=1))
+
+    def stored(self, url):
+        return self.backend.exists(self.backend.path_from_url(url))
+
+    def test_deduplicated_object_survives_while_another_report_uses_it(self):
+        url = self.upload(b'shared photo')
+        first, second = self.report(url), self.report(self.upload(b'shared photo'))
+        self.age_index()
+        first.delete()
+
+        self.assertEqual(photo_gc.process_deletions(self.backend), (0, 1))
+        self.assertTrue(self.stored(url))
+        self.assertIsNone(StoredObject.objects.get(url=url).removed_at)
+
+        second.delete()
+        self.assertEqual(photo_gc.process_deletions(self.backend), (1, 0))
+        self.assertFalse(self.stored(url))
+        self.assertFalse(StoredObject.objects.exists())
+        self.assertFalse(PhotoDeletion.objects.exists())
+
+    def test_object_just_handed_to_an_upload_is_kept(self):
+        url = self.upload(b'reused photo')
+        self.age_index()
+        self.report(url).delete()
+        # A new upload of the same bytes gets the URL before its report is saved
+        self.assertEqual(self.upload(b'reused photo'), url)
+
+        self.assertEqual(photo_gc.process_deletions(self.backend), (0, 1))
+        self.assertTrue(self.stored(url))
+
+    def test_failed_delete_stays_queued_and_stops_reuse(self):
+        url = self.upload(b'doomed photo')
+        self.age_index()
+        self.report(url).delete()
+
+        with mock.patch.object(self.backend, '_delete', side_effect=OSError('storage down')):
+            self.assertEqual(photo_gc.process_deletions(self.backend), (0, 0))
+        self.assertEqual(list(PhotoDeletion.objects.values_list('url', 'attempts')), [(url, 1)])
+        self.assertIsNotNone(StoredObject.objects.get(url=url).removed_at)
+        self.assertIsNone(self.backend.index.lookup(hashlib.sha256(b'doomed photo').hexdigest()))
+
+        # Storing the bytes again revives the row, so the retry keeps the object
+        self.assertEqual(self.upload(b'doomed photo'), url)
+        self.assertIsNone(StoredObject.objects.get(url=url).removed_at)
+        self.assertEqual(photo_gc.process_deletions(self.backend), (0, 1))
+        self.assertTrue(self.stored(url))
+
+    def test_report_edits_cannot_swap_the_photo(self):
+        serializer = AccessibilityReportSerializer(
+            self.report('/media/storage/reports/a.webp'), data={'photo_url': '/elsewhere.jpg'}, partial=True
+        )
+        self.assertTrue(serializer.is_valid())
+        self.assertNotIn('photo_url', serializer.validated_data)
+
+
+class ContributionCounterTests(SimpleTestCase):
+    def setUp(self):
+        patcher = mock.patch('accessibility.signals.bump')
+        self.bump = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_creates_and_deletes_move_the_right_counter(self):
+        report = AccessibilityReport(user_id=7)
+        feedback = RouteFeedback(user_id=7)
+        signals.count_contribution(AccessibilityReport, report, created=True)
+        signals.count_contribution(RouteFeedback, feedback, created=True)
+        signals.uncount_contribution(AccessibilityReport, report)
+        self.assertEqual(self.bump.call_args_list, [
+            mock.call(7, 'report_count', 1),
+            mock.call(7, 'feedback_count', 1),
+            mock.call(7, 'report_count', -1),
+        ])
+
+    def test_updates_do_not_count(self):
+        signals.count_contribution(AccessibilityReport, AccessibilityReport(user_id=7), created=False)
+        self.bump.assert_not_called()
+
+
+class FeedbackAggregationTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create(username='rater')
+
+    def feedback(self, rating, disability_type='Wheelchair', age=120):
+        row = RouteFeedback.objects.create(
+            user=self.user, rating=rating, disability_type=disability_type,
+            start_lat=28.6005, start_lon=77.2005, end_lat=28.6005, end_lon=77.2095,
+        )
+        created_at = timezone.now() - timedelta(seconds=age)
+        RouteFeedback.objects.filter(pk=row.pk).update(created_at=created_at)
+        return row
+
+    def test_ratings_are_folded_per_cell_and_profile(self):
+        self.feedback(5)
+        self.feedback(4, 'wheelchair')
+        self.assertEqual(aggregate_feedback(), 2)
+
+        rows = SegmentRating.objects.all()
+        self.assertTrue(rows)
+        for row in rows:
+            self.assertEqual(row.disability_type, 'wheelchair')
+            self.assertEqual((row.rating_count, row.rating_sum), (2, 9))
+
+    def test_resumes_after_watermark(self):
+        self.feedback(5)
+        self.assertEqual(aggregate_feedback(), 1)
+        self.assertEqual(aggregate_feedback(), 0)
+        self.feedback(1, age=90)
+        self.assertEqual(aggregate_feedback(), 1)
+        self.assertEqual({row.rating_count for row in SegmentRating.objects.all()}, {2})
+
+    def test_updated_rows_are_stamped(self):
+        self.feedback(5)
+        aggregate_feedback()
+        stale = timezone.now() - timedelta(days=1)
+        SegmentRating.objects.update(updated_at=stale)
+
+        self.feedback(1, age=90)
+        aggregate_feedback()
+
+        for row in SegmentRating.objects.all():
+            self.assertGreater(row.updated_at, stale + timedelta(hours=23))
+
+    def test_recent_rows_wait_for_the_safety_lag(self):
+        self.feedback(5, age=0)
+        with override_settings(FEEDBACK_SAFETY_LAG=60):
+            self.assertEqual(aggregate_feedback(), 0)
+        with override_settings(FEEDBACK_SAFETY_LAG=0):
+            self.assertEqual(aggregate_feedback(), 1)
+
+    def test_late_commit_older_than_watermark_is_not_skipped(self):
+        self.feedback(5, age=30)
+        # A transaction that began earlier commits after the next run
+        with override_settings(FEEDBACK_SAFETY_LAG=60):
+            self.assertEqual(aggregate_feedback(), 0)
+            self.feedback(4, age=45)
+        with override_settings(FEEDBACK_SAFETY_LAG=20):
+            self.assertEqual(aggregate_feedback(), 2)
+
+    @override_settings(FEEDBACK_MIN_RATINGS=1, FEEDBACK_SCORE_WEIGHT=5)
+    def test_adjustment_matches_route_disability_to_feedback_label(self):
+        route = [[77.2005, 28.6005], [77.2095, 28.6005]]
+        self.assertEqual(community_adjustment(route, 'wheelchair'), 0)
+
+        self.feedback(5, 'Wheelchair')
+        aggregate_feedback()
+
+        self.assertGreater(community_adjustment(route, 'wheelchair'), 0)
+        self.assertEqual(community_adjustment(route, 'WHEELCHAIR'), community_adjustment(route, 'wheelchair'))
+        self.assertEqual(community_adjustment(route, 'visual'), 0)
+
+
+class ReachabilityCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create(username='reporter')
+        self.profile = get_profile('wheelchair')
+
+    def hazard(self, **fields):
+        values = {
+            'latitude': 28.6031, 'longitude': 77.2031, 'severity': 'Critical',
+            'problem_type': 'Stairs', 'disability_types': ['Wheelchair'], 'description': 'x',
+        }
+        values.update(fields)
+        return AccessibilityReport.objects.create(user=self.user, **values)
+
+    def area(self):
+        return reachable_area(28.6, 77.2, self.profile, 1.0)
+
+    def test_repeat_lookups_are_served_from_cache(self):
+        self.hazard()
+        first = self.area()
+        self.assertEqual(first['blocked_cells'], 1)
+        # Only the version lookup
+        with self.assertNumQueries(1):
+            self.assertEqual(self.area(), first)
+
+    def test_blocking_changes_invalidate(self):
+        report = self.hazard()
+        self.assertEqual(self.area()['blocked_cells'], 1)
+
+        report.status = 'Resolved'
+        report.save()
+        self.assertEqual(self.area()['blocked_cells'], 0)
+
+        AccessibilityReport.objects.get(pk=report.pk).delete()
+        self.hazard(latitude=28.6051)
+        self.assertEqual(self.area()['blocked_cells'], 1)
+
+    def test_unrelated_edits_keep_the_cache(self):
+        report = self.hazard()
+        self.area()
+        version = hazard_version()
+
+        report.description = 'Still there'
+        report.save()
+        self.hazard(severity='Low')
+        AccessibilityReport.objects.get(pk=report.pk).save(update_fields=['photo_status'])
+        self.assertEqual(hazard_version(), version)
+
+    def test_version_bumped_elsewhere_invalidates_local_entries(self):
+        self.hazard()
+        self.area()
+        # As another process would see it: rows change, then the shared version moves
+        AccessibilityReport.objects.update(status='Resolved')
+        CacheVersion.objects.filter(name='hazards').update(version=F('version') + 1)
+        self.assertEqual(self.area()['blocked_cells'], 0)
+
+
+class RouteChangesTests(TestCase):
+    ROUTE = [[77.2, 28.6], [77.21, 28.6]]
+
+    def setUp(self):
+        self.user = get_user_model().objects.create(username='traveller')
+        self.factory = APIRequestFactory()
+        self.since = timezone.now() - timedelta(hours=1)
+
+    def hazard(self, age=None, **fields):
+        values = {
+            'latitude': 28.6, 'longitude': 77.205, 'severity': 'High',
+            'problem_type': 'Stairs', 'disability_types': ['Wheelchair'], 'description': 'x',
+        }
+        values.update(fields)
+        report = AccessibilityReport.objects.create(user=self.user, **values)
+        if age is not None:
+            stamp = timezone.now() - age
+            AccessibilityReport.objects.filter(pk=report.pk).update(
+                created_at=stamp, status_changed_at=stamp, updated_at=stamp
+            )
+            report.refresh_from_db()
+        return report
+
+    def changes(self, **data):
+        data.setdefault('since', self.since.isoformat())
+        request = self.factory.post('/api/routes/changes/', data, format='json')
+        force_authenticate(request, user=self.user)
+        return RouteChangesView.as_view()(request)
+
+    def test_route_ids_are_recalled_from_the_database(self):
+        route_id = remember_routes([self.ROUTE])[0]
+        self.assertEqual(recall_route(route_id), self.ROUTE)
+        self.assertEqual(self.changes(route_id=route_id).status_code, 200)
+
+    def test_unknown_route(self):
+        response = self.changes(route_id='0123456789abcdef')
+        self.assertEqual(response.status_code, 404)
+
+    def test_added_resolved_and_deleted_hazards(self):
+        added = self.hazard()
+        self.hazard(longitude=77.5)  # Far off the route
+        resolved = self.hazard(age=timedelta(days=1))
+        resolved.status = 'Resolved'
+        resolved.save()
+        deleted = self.hazard(age=timedelta(days=1))
+        AccessibilityReport.objects.get(pk=deleted.pk).delete()
+
+        response = self.changes(polyline=encode(self.ROUTE))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([r['id'] for r in response.data['new_hazards']], [str(added.pk)])
+        self.assertEqual([r['id'] for r in response.data['resolved_hazards']], [str(resolved.pk)])
+        self.assertEqual(response.data['deleted_hazards'], [str(deleted.pk)])
+
+    def test_edits_after_an_old_resolution_are_not_resolutions(self):
+        report = self.hazard(age=timedelta(days=2))
+        report.status = 'Resolved'
+        report.save()
+        AccessibilityReport.objects.filter(pk=report.pk).update(
+            status_changed_at=timezone.now() - timedelta(days=1)
+        )
+        report = AccessibilityReport.objects.get(pk=report.pk)
+        report.description = 'Edited'
+        report.save()
+
+        response = self.changes(polyline=encode(self.ROUTE))
+        self.assertEqual(response.data['resolved_hazards'], [])
+        self.assertEqual(response.data['new_hazards'], [])
+
+    def test_since_older_than_retention(self):
+        response = self.changes(polyline=encode(self.ROUTE), since=(timezone.now() - timedelta(days=30)).isoformat())
+        self.assertEqual(response.status_code, 400)
+
+
+@override_settings(PHOTO_UPLOAD_RETRIES=0)
+class PhotoUploadRetryTests(TestCase):
+    def setUp(self):
+        spool = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, spool)
+        overrides = override_settings(PHOTO_SPOOL_DIR=spool)
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+
+        user = get_user_model().objects.create(username='photographer')
+        self.report = AccessibilityReport.objects.create(
+            user=user, latitude=28.6, longitude=77.2, problem_type='Pothole',
+            description='x', photo_status='pending',
+        )
+        self.path = os.path.join(spool, f"{self.report.pk}.txt")
+        with open(self.path, 'wb') as fh:
+            fh.write(b'not an image, uploaded as is')
+        self.queue = PhotoUploadQueue(storage=FlakyStorage(failures=1), max_workers=1)
+        patcher = mock.patch.object(uploads, 'photo_upload_queue', self.queue)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = mock.patch('accessibility.management.commands.retry_photo_uploads.photo_upload_queue', self.queue)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_failed_upload_is_retried_by_the_command(self):
+        before = AccessibilityReport.objects.get(pk=self.report.pk).updated_at
+        with self.assertLogs('accessibility.uploads', 'ERROR'):
+            self.assertIsNone(self.queue.process(str(self.report.pk), self.path))
+
+        report = AccessibilityReport.objects.get(pk=self.report.pk)
+        self.assertEqual(report.photo_status, 'failed')
+        self.assertGreater(report.updated_at, before)
+        self.assertTrue(os.path.exists(self.path))
+
+        out = io.StringIO()
+        call_command('retry_photo_uploads', stdout=out)
+
+        self.assertIn('Uploaded 1, failed 0', out.getvalue())
+        report = AccessibilityReport.objects.get(pk=self.report.pk)
+        self.assertEqual(report.photo_status, 'uploaded')
+        self.assertTrue(report.photo_url.startswith('https://storage.test/'))
+        self.assertFalse(os.path.exists(self.path))
+
+    def test_files_locked_by_a_live_worker_are_skipped(self):
+        with claim_spooled(self.path) as claimed:
+            self.assertTrue(claimed)
+            out = io.StringIO()
+            call_command('retry_photo_uploads', stdout=out)
+        self.assertIn('in progress elsewhere 1', out.getvalue())
+        self.assertEqual(self.queue.storage.attempts, 0)
+
+    def test_files_not_named_after_a_report_are_skipped(self):
+        stray = os.path.join(os.path.dirname(self.path), 'notes.txt')
+        with open(stray, 'wb') as fh:
+            fh.write(b'left here by hand')
+
+        out, err = io.StringIO(), io.StringIO()
+        call_command('retry_photo_uploads', stdout=out, stderr=err)
+
+        self.assertIn('skipped 1', out.getvalue())
+        self.assertEqual(self.queue.storage.attempts, 1)
+        self.assertIn('notes.txt', err.getvalue())
+        self.assertTrue(os.path.exists(stray))
+
+
+class DirectUploadFinalizeTests(TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir)
+        self.backend = LocalStorageBackend(self.dir, '/media/storage/', index=MemoryObjectIndex())
+        patcher = mock.patch('accessibility.views.photo_storage', self.backend)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.user = get_user_model().objects.create(username='uploader')
+        self.report = AccessibilityReport.objects.create(
+            user=self.user, latitude=28.6, longitude=77.2, problem_type='Pothole', description='x',
+        )
+        self.factory = APIRequestFactory()
+
+    def post(self, view, data):
+        request = self.factory.post('/', data, format='json')
+        force_authenticate(request, user=self.user)
+        return view.as_view()(request, pk=self.report.pk)
+
+    def test_finalize_attaches_the_path_signed_into_the_token(self):
+        body = jpeg_bytes()
+        issued = self.post(ReportPhotoUploadURLView, {
+            'filename': 'photo.jpg', 'content_type': 'image/jpeg', 'size': len(body),
+        }).data
+        token = issued['url'].rstrip('/').rsplit('/', 1)[-1]
+        SignedPhotoUploadView.as_view()(
+            self.factory.put(issued['url'], body, content_type='image/jpeg'), token=token
+        )
+
+        other = f"uploads/{self.report.pk}/../../reports/{'a' * 64}.webp"
+        response = self.post(ReportPhotoFinalizeView, {'upload_token': issued['upload_token'], 'path': other})
+        self.assertEqual(response.status_code, 400)
+
+        response = self.post(ReportPhotoFinalizeView, {'upload_token': issued['upload_token']})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['photo_url'], f"/media/storage/{issued['path']}")
+        self.assertEqual(AccessibilityReport.objects.get(pk=self.report.pk).photo_status, 'uploaded')
+
+
+class RouteWeatherDeadlineTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create(username='walker')
+        self.factory = APIRequestFactory()
+
+    def calculate(self):
+        request = self.factory.post('/api/routes/calculate/', {
+            'start': {'lat': 28.61, 'lon': 77.20},
+            'end': {'lat': 28.63, 'lon': 77.22},
+            'user_disability': 'wheelchair',
+        }, format='json')
+        force_authenticate(request, user=self.user)
+        return RouteCalculationView.as_view()(request)
+
+    def test_slow_weather_upstream_does_not_hold_the_route(self):
+        with FakeWeatherUpstream(delay=1.0) as upstream, override_settings(
+            OPENWEATHER_API_KEY='test-key', OPENWEATHER_URL=upstream.url, ROUTE_WEATHER_DEADLINE=0.1,
+        ):
+            with mock.patch('accessibility.views.weather_service', WeatherService()):
+                started = time.monotonic()
+                response = self.calculate()
+                elapsed = time.monotonic() - started
+
+        self.assertEqual(response.status_code, 200)
+        self.assertLess(elapsed, 0.9)
+        self.assertEqual(response.data['weather']['condition'], 'Unknown')
+        self.assertTrue(response.data['weather']['stale'])
+        self.assertEqual(len(response.data['routes']), 3)
+
+    def test_weather_errors_fall_back(self):
+        with mock.patch('accessibility.views.weather_service.get_weather', side_effect=KeyError('main')):
+            response = self.calculate()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['weather'], {'condition': 'Unknown', 'temperature': 20, 'stale': True})
+
+    def test_stale_flag_is_passed_through(self):
+        stale = {'condition': 'Rain', 'temperature': 18, 'stale': True}
+        with mock.patch('accessibility.views.weather_service.get_weather', return_value=stale):
+            response = self.calculate()
+        self.assertEqual(response.data['weather'], stale)
+
+
+class MyContributionsTests(TestCase):
+    def setUp(self):
+        User = get_user_model()
+        self.user = User.objects.create(username='asha')
+        self.other = User.objects.create(username='ravi')
+        self.factory = APIRequestFactory()
+
+    def add_report(self, user):
+        return AccessibilityReport.objects.create(
+            user=user, latitude=28.6, longitude=77.2, problem_type='Pothole', description='x',
+        )
+
+    def add_feedback(self, user):
+        return RouteFeedback.objects.create(
+            user=user, start_lat=28.6, start_lon=77.2, end_lat=28.7, end_lon=77.3,
+            disability_type='wheelchair', rating=4,
+        )
+
+    def pages(self, view, page_size=3):
+        """Follow next links; returns (counts, ids) across every page."""
+        counts, ids = [], []
+        url = f'/api/mine/?page_size={page_size}'
+        while url:
+            request = self.factory.get(url)
+            force_authenticate(request, user=self.user)
+            response = view.as_view()(request)
+            self.assertEqual(response.status_code, 200)
+            counts.append(response.data['count'])
+            ids.extend(row['id'] for row in response.data['results'])
+            url = response.data['next']
+        return counts, ids
+
+    def check_pages(self, view, model, mine):
+        # Equal timestamps are the hard case for keyset paging
+        model.objects.update(created_at=timezone.now())
+        counts, ids = self.pages(view)
+        self.assertEqual(len(ids), len(set(ids)))
+        self.assertEqual(set(ids), {str(row.pk) for row in mine})
+        self.assertEqual(set(counts), {len(mine)})
+
+    def test_my_reports_pages_without_gaps_or_duplicates(self):
+        mine = [self.add_report(self.user) for _ in range(8)]
+        self.add_report(self.other)
+        self.check_pages(MyReportsView, AccessibilityReport, mine)
+
+    def test_my_feedback_pages_without_gaps_or_duplicates(self):
+        mine = [self.add_feedback(self.user) for _ in range(7)]
+        self.add_feedback(self.other)
+        self.check_pages(MyRouteFeedbackView, RouteFeedback, mine)
+
+    def test_counts_follow_deletes(self):
+        reports = [self.add_report(self.user) for _ in range(4)]
+        feedback = [self.add_feedback(self.user) for _ in range(3)]
+        self.add_report(self.other)
+        reports[0].delete()
+        AccessibilityReport.objects.filter(pk=reports[1].pk).delete()
+        feedback[2].delete()
+
+        counts, ids = self.pages(MyReportsView)
+        self.assertEqual((set(counts), len(ids)), ({2}, 2))
+        counts, ids = self.pages(MyRouteFeedbackView)
+        self.assertEqual((set(counts), len(ids)), ({2}, 2))
 
-# Create your tests here.
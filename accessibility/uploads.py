@@ -0,0 +1,308 @@
+"""
+Background upload of report photos.
+
+Report creation no longer waits for object storage. The uploaded photo is
+spooled to PHOTO_SPOOL_DIR, the report is saved with photo_status 'pending',
+and a worker pool takes over once the transaction commits: the photo is
+normalized to WebP display and thumbnail variants (see images.py), and both
+are pushed to storage, retrying with exponential backoff. photo_url,
+photo_thumbnail_url and photo_status are filled in when the upload finishes.
+
+Spool files are named after the report ID and stay in the spool until
+their upload succeeds, so uploads that failed or were interrupted by a
+restart can be retried with `python manage.py retry_photo_uploads`. A
+worker holds an exclusive lock on the spool file while it works on it, and
+the command skips locked files, so a photo is never uploaded twice at once.
+The lock goes away with the process that held it.
+
+Clients can also skip Django entirely: they ask for a signed upload URL,
+send the photo straight to storage, then finalize, which checks the stored
+object before attaching it to the report. Those photos are stored as sent.
+The upload URL comes with an upload token that signs the issued path, and
+finalize only ever looks at that path.
+"""
+import logging
+import os
+import posixpath
+import random
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core import signing
+from django.core.files import File
+from django.db import DatabaseError, close_old_connections, transaction
+
+try:
+    import fcntl
+except ImportError:  # Windows; spool files are not locked
+    fcntl = None
+
+from .images import process_photo
+from .photo_gc import queue_photo_deletion
+
+logger = logging.getLogger(__name__)
+
+FINALIZE_SALT = 'accessibility.uploads.finalize'
+
+
+def spool_dir():
+    path = getattr(settings, 'PHOTO_SPOOL_DIR', os.path.join(settings.MEDIA_ROOT, 'photo_spool'))
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def spool_photo(photo, report_id):
+    """
+    Copy an uploaded photo to the spool directory in chunks.
+
+    Returns:
+        Path of the spooled file
+    """
+    extension = os.path.splitext(photo.name)[1].lower()
+    path = os.path.join(spool_dir(), f"{report_id}{extension}")
+    with open(path, 'wb') as out:
+        for chunk in photo.chunks():
+            out.write(chunk)
+    return path
+
+
+def spooled_photos():
+    """Yield (report_id, path) for every file waiting in the spool."""
+    directory = spool_dir()
+    for name in os.listdir(directory):
+        path = os.path.join(directory, name)
+        if os.path.isfile(path):
+            yield os.path.splitext(name)[0], path
+
+
+@contextmanager
+def claim_spooled(path):
+    """
+    Lock a spool file for this process.
+
+    Yields True if the lock was taken, False if another worker holds it or
+    the file is already gone.
+    """
+    try:
+        fh = open(path, 'rb')
+    except FileNotFoundError:
+        yield False
+        return
+    try:
+        if fcntl is not None:
+            try:
+                fcntl.flock(fh.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                yield False
+                return
+        yield True
+    finally:
+        fh.close()
+
+
+def upload_with_retries(storage, path, retries=None, backoff=None, sleep=time.sleep):
+    """
+    Upload a spooled file, retrying failures with exponential backoff.
+
+    Args:
+        storage: object with an upload_file(file_obj) -> url|None method
+        path: spooled file to upload
+        retries: attempts after the first one
+        backoff: base delay in seconds, doubled per attempt with jitter
+
+    Returns:
+        Public URL, or None if every attempt failed
+    """
+    if retries is None:
+        retries = getattr(settings, 'PHOTO_UPLOAD_RETRIES', 3)
+    if backoff is None:
+        backoff = getattr(settings, 'PHOTO_UPLOAD_BACKOFF', 1.0)
+
+    for attempt in range(retries + 1):
+        try:
+            with open(path, 'rb') as fh:
+                url = storage.upload_file(File(fh, name=os.path.basename(path)))
+            if url:
+                return url
+            logger.warning(f"Photo upload attempt {attempt + 1} returned no URL: {path}")
+        except Exception as e:
+            logger.warning(f"Photo upload attempt {attempt + 1} failed for {path}: {e}")
+
+        if attempt < retries:
+            sleep(backoff * (2 ** attempt) * (1 + random.random() / 2))
+
+    return None
+
+
+def allowed_content_types():
+    """Content types matching ALLOWED_UPLOAD_EXTENSIONS."""
+    from .storage import CONTENT_TYPES
+    extensions = getattr(settings, 'ALLOWED_UPLOAD_EXTENSIONS', list(CONTENT_TYPES))
+    return {CONTENT_TYPES[ext] for ext in extensions if ext in CONTENT_TYPES}
+
+
+def direct_upload_path(report_id, filename):
+    """Fresh storage path for a photo the client uploads itself."""
+    extension = os.path.splitext(filename)[1].lower()
+    return f"uploads/{report_id}/{uuid.uuid4().hex}{extension}"
+
+
+def direct_upload_token(report_id, path):
+    """Token that lets finalize attach exactly this path to the report."""
+    return signing.dumps({'report': str(report_id), 'path': path}, salt=FINALIZE_SALT)
+
+
+def direct_upload_token_path(token, report_id):
+    """
+    Path signed into a token from direct_upload_token().
+
+    Raises:
+        signing.BadSignature: token is forged, expired or for another report
+    """
+    claims = signing.loads(token, salt=FINALIZE_SALT, max_age=getattr(settings, 'PHOTO_FINALIZE_TTL', 3 * 60 * 60))
+    if claims.get('report') != str(report_id):
+        raise signing.BadSignature('Upload token was not issued for this report')
+    return claims['path']
+
+
+def verify_direct_upload(storage, report_id, path):
+    """
+    Check an object a client uploaded with a signed URL.
+
+    Objects that fail the size or type checks are deleted.
+
+    Returns:
+        Error message, or None if the object can be attached to the report
+    """
+    # Backends resolve '..', so a prefix test alone would let a path reach
+    # other reports' objects
+    if (
+        posixpath.normpath(path) != path
+        or '..' in path.split('/')
+        or not path.startswith(f"uploads/{report_id}/")
+    ):
+        return 'Path was not issued for this report'
+
+    info = storage.stat(path)
+    if info is None:
+        return 'Uploaded photo not found'
+
+    max_size = getattr(settings, 'MAX_UPLOAD_SIZE', 10 * 1024 * 1024)
+    error = None
+    if not info['size'] or info['size'] > max_size:
+        error = f"File size must be between 1 byte and {max_size // (1024 * 1024)}MB"
+    elif info['content_type'] not in allowed_content_types():
+        error = f"File type not allowed: {info['content_type']}"
+
+    if error:
+        storage.delete_file(path)
+    return error
+
+
+class PhotoUploadQueue:
+    """
+    Worker pool that uploads spooled photos and updates their reports.
+    """
+
+    def __init__(self, storage=None, max_workers=None):
+        self._storage = storage
+        self.executor = ThreadPoolExecutor(
+            max_workers=max_workers or getattr(settings, 'PHOTO_UPLOAD_WORKERS', 4),
+            thread_name_prefix='photo-upload',
+        )
+
+    @property
+    def storage(self):
+        if self._storage is None:
+            from .storage import photo_storage
+            self._storage = photo_storage
+        return self._storage
+
+    def enqueue(self, report_id, path):
+        """Upload a spooled photo once the current transaction commits."""
+        transaction.on_commit(lambda: self.executor.submit(self.process, report_id, path))
+
+    def process(self, report_id, path):
+        """
+        Upload a spooled photo and record the result on its report.
+
+        The spool file is removed once the photo is stored or the report is
+        gone; after a failure it stays for retry_photo_uploads.
+
+        Returns:
+            Public URL, or None if the upload failed or another worker has
+            the file
+        """
+        # Worker threads get their own DB connection; don't leak it
+        close_old_connections()
+        variants = ()
+        try:
+            with claim_spooled(path) as claimed:
+                if not claimed:
+                    logger.info(f"Photo for report {report_id} is being uploaded elsewhere")
+                    return None
+
+                try:
+                    variants = process_photo(path, os.path.join(spool_dir(), 'processed'))
+                except Exception as e:
+                    # Pillow validated the upload, so this is rare; keep the original
+                    logger.error(f"Could not process photo for report {report_id}: {e}")
+
+                if variants:
+                    display_path, thumbnail_path = variants
+                    url = upload_with_retries(self.storage, display_path)
+                    thumbnail_url = upload_with_retries(self.storage, thumbnail_path) if url else None
+                else:
+                    url = upload_with_retries(self.storage, path)
+                    thumbnail_url = None
+
+                if url:
+                    if self._update_report(
+                        report_id, photo_url=url, photo_thumbnail_url=thumbnail_url, photo_status='uploaded'
+                    ):
+                        logger.info(f"Photo for report {report_id} uploaded: {url}")
+                    else:
+                        # Report deleted while we were uploading
+                        queue_photo_deletion(url, thumbnail_url)
+                    os.remove(path)
+                elif self._update_report(report_id, photo_status='failed'):
+                    logger.error(f"Photo upload for report {report_id} failed; kept in the spool for retry")
+                else:
+                    os.remove(path)
+                return url
+        except Exception:
+            logger.exception(f"Photo upload worker failed for report {report_id}")
+        finally:
+            for variant in variants:
+                if os.path.exists(variant):
+                    os.remove(variant)
+            close_old_connections()
+
+    def _update_report(self, report_id, **fields):
+        """
+        Save photo fields on a report, through save() so updated_at and the
+        post_save signals see the change.
+
+        Returns:
+            False if the report no longer exists
+        """
+        from .models import AccessibilityReport
+
+        report = AccessibilityReport.objects.filter(pk=report_id).first()
+        if report is None:
+            return False
+        for name, value in fields.items():
+            setattr(report, name, value)
+        try:
+            report.save(update_fields=[*fields, 'updated_at'])
+        except DatabaseError:
+            # Deleted between the read and the save
+            return False
+        return True
+
+
+# Global instance
+photo_upload_queue = PhotoUploadQueue()
@@ -1,20 +1,40 @@
 from django.urls import path
 from .views import (
     AccessibilityReportListCreateView,
+    MyReportsView,
     AccessibilityReportDetailView,
+    ReportPhotoUploadURLView,
+    ReportPhotoFinalizeView,
+    SignedPhotoUploadView,
     RouteCalculationView,
     RouteFeedbackView,
+    MyRouteFeedbackView,
+    ContributionStatsView,
+    ReachabilityView,
+    RouteChangesView,
     WeatherView,
 )
 
 urlpatterns = [
     # Reports
     path('reports/', AccessibilityReportListCreateView.as_view(), name='report-list-create'),
+    path('reports/mine/', MyReportsView.as_view(), name='report-mine'),
     path('reports/<uuid:pk>/', AccessibilityReportDetailView.as_view(), name='report-detail'),
+    path('reports/<uuid:pk>/photo/upload-url/', ReportPhotoUploadURLView.as_view(), name='report-photo-upload-url'),
+    path('reports/<uuid:pk>/photo/finalize/', ReportPhotoFinalizeView.as_view(), name='report-photo-finalize'),
+    
+    # Signed uploads for the local storage backend
+    path('storage/upload/<str:token>/', SignedPhotoUploadView.as_view(), name='storage-signed-upload'),
     
     # Routes
     path('routes/calculate/', RouteCalculationView.as_view(), name='route-calculate'),
     path('routes/feedback/', RouteFeedbackView.as_view(), name='route-feedback'),
+    path('routes/feedback/mine/', MyRouteFeedbackView.as_view(), name='route-feedback-mine'),
+    path('routes/reachable/', ReachabilityView.as_view(), name='route-reachable'),
+    path('routes/changes/', RouteChangesView.as_view(), name='route-changes'),
+    
+    # Contributions
+    path('me/contributions/', ContributionStatsView.as_view(), name='contribution-stats'),
     
     # Weather
     path('weather/', WeatherView.as_view(), name='weather'),
@@ -3,19 +3,41 @@ from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, AllowAny as allowany
 from rest_framework.parsers import MultiPartParser, FormParser, JSONParser
+from rest_framework.pagination import CursorPagination
 from django.db.models import Q
 from math import radians, cos, sin, asin, sqrt
-import requests
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+import contextvars
+import logging
+import time
 from django.conf import settings
+from django.core import signing
+from django.utils import timezone
 
-from .models import AccessibilityReport, RouteFeedback
+from .models import AccessibilityReport, DeletedReport, RouteFeedback
 from .serializers import (
     AccessibilityReportSerializer,
     AccessibilityReportCreateSerializer,
     RouteFeedbackSerializer,
     RouteCalculationSerializer,
+    ReachabilitySerializer,
+    RouteChangesSerializer,
+    PhotoUploadURLSerializer,
+    PhotoFinalizeSerializer,
 )
-from .storage import supabase_storage
+from .contributions import get_stats
+from .feedback import community_adjustment
+from . import polyline
+from .polyline import apply_geometry, geometry_options
+from .reachability import reachable_area
+from .routes import changes_retention, recall_route, remember_routes
+from .scoring import ROUTE_STRATEGIES, get_profile, within_corridor
+from .storage import LocalStorageBackend, photo_storage
+from .photo_gc import queue_photo_deletion
+from .uploads import direct_upload_path, direct_upload_token, direct_upload_token_path, verify_direct_upload
+from .weather import weather_service
+
+logger = logging.getLogger(__name__)
 
 
 def haversine_distance(lat1, lon1, lat2, lon2):
@@ -29,6 +51,15 @@ def haversine_distance(lat1, lon1, lat2, lon2):
     return km
 
 
+# Shared pool for upstream I/O issued while serving a request. Only network
+# calls run here; ORM queries stay on the request thread so they keep using
+# the request's database connection.
+upstream_executor = ThreadPoolExecutor(
+    max_workers=getattr(settings, 'UPSTREAM_MAX_WORKERS', 8),
+    thread_name_prefix='upstream',
+)
+
+
 class AccessibilityReportListCreateView(APIView):
     parser_classes = [MultiPartParser, FormParser, JSONParser]
     permission_classes = [IsAuthenticated]
@@ -107,6 +138,42 @@ class AccessibilityReportListCreateView(APIView):
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+class MineCursorPagination(CursorPagination):
+    """
+    Newest first, keyset-paged along the (user, created_at) indexes.
+
+    The cursor holds created_at plus an offset into rows sharing it; the id
+    tiebreak keeps those rows in the same order on every page.
+    """
+    ordering = ('-created_at', '-id')
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+
+def paginated_mine(view, request, queryset, serializer_class, counter):
+    """One page of the requesting user's rows, counted from their stats row."""
+    paginator = MineCursorPagination()
+    page = paginator.paginate_queryset(
+        queryset.filter(user=request.user).select_related('user'), request, view=view
+    )
+    return Response({
+        'count': get_stats(request.user.pk)[counter],
+        'next': paginator.get_next_link(),
+        'previous': paginator.get_previous_link(),
+        'results': serializer_class(page, many=True).data,
+    })
+
+
+class MyReportsView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        """Get the current user's reports, newest first."""
+        return paginated_mine(
+            self, request, AccessibilityReport.objects.all(), AccessibilityReportSerializer, 'report_count'
+        )
+
+
 class AccessibilityReportDetailView(APIView):
     permission_classes = [IsAuthenticated]
 
@@ -174,6 +241,126 @@ class AccessibilityReportDetailView(APIView):
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
+class ReportPhotoUploadURLView(APIView):
+    """
+    Issue a short-lived signed URL the client uploads a report photo to.
+
+    The photo goes straight to storage; POST the returned upload_token to
+    the finalize endpoint afterwards to attach it to the report.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, pk):
+        report = AccessibilityReport.objects.filter(pk=pk).first()
+        if not report:
+            return Response(
+                {'error': 'Report not found'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+
+        if report.user != request.user:
+            return Response(
+                {'error': 'You do not have permission to edit this report'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+
+        serializer = PhotoUploadURLSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        if not photo_storage.is_configured():
+            return Response(
+                {'error': 'Photo storage is not configured'},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE
+            )
+
+        data = serializer.validated_data
+        path = direct_upload_path(report.id, data['filename'])
+        try:
+            upload = photo_storage.create_signed_upload(path, data['content_type'], data['size'])
+        except Exception as e:
+            return Response(
+                {'error': f'Could not create upload URL: {str(e)}'},
+                status=status.HTTP_502_BAD_GATEWAY
+            )
+
+        upload['url'] = request.build_absolute_uri(upload['url'])
+        return Response(
+            {'path': path, 'upload_token': direct_upload_token(report.id, path), **upload},
+            status=status.HTTP_201_CREATED
+        )
+
+
+class ReportPhotoFinalizeView(APIView):
+    """Attach a photo uploaded with a signed URL to its report."""
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, pk):
+        report = AccessibilityReport.objects.filter(pk=pk).first()
+        if not report:
+            return Response(
+                {'error': 'Report not found'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+
+        if report.user != request.user:
+            return Response(
+                {'error': 'You do not have permission to edit this report'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+
+        serializer = PhotoFinalizeSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        data = serializer.validated_data
+        try:
+            path = direct_upload_token_path(data['upload_token'], report.id)
+        except signing.BadSignature:
+            return Response({'error': 'Invalid or expired upload token'}, status=status.HTTP_400_BAD_REQUEST)
+        if data.get('path', path) != path:
+            return Response({'error': 'Path does not match the upload token'}, status=status.HTTP_400_BAD_REQUEST)
+
+        error = verify_direct_upload(photo_storage, report.id, path)
+        if error:
+            return Response({'error': error}, status=status.HTTP_400_BAD_REQUEST)
+
+        queue_photo_deletion(report.photo_url, report.photo_thumbnail_url)
+        report.photo_url = photo_storage.get_public_url(path)
+        report.photo_thumbnail_url = None
+        report.photo_status = 'uploaded'
+        report.save(update_fields=['photo_url', 'photo_thumbnail_url', 'photo_status', 'updated_at'])
+        return Response(AccessibilityReportSerializer(report).data, status=status.HTTP_200_OK)
+
+
+class SignedPhotoUploadView(APIView):
+    """
+    Receive a signed upload for the local storage backend.
+
+    Stands in for the storage service's own upload endpoint, so the
+    signed-URL flow also works in development and tests. The signed token
+    is the only credential.
+    """
+    authentication_classes = []
+    permission_classes = [allowany]
+
+    def put(self, request, token):
+        if not isinstance(photo_storage, LocalStorageBackend):
+            return Response({'error': 'Not found'}, status=status.HTTP_404_NOT_FOUND)
+
+        size = int(request.META.get('CONTENT_LENGTH') or 0)
+        try:
+            path = photo_storage.accept_signed_upload(token, request.stream, size)
+        except signing.SignatureExpired:
+            return Response({'error': 'Upload URL has expired'}, status=status.HTTP_403_FORBIDDEN)
+        except signing.BadSignature:
+            return Response({'error': 'Invalid upload URL'}, status=status.HTTP_403_FORBIDDEN)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response({'path': path}, status=status.HTTP_201_CREATED)
+
+
 class RouteCalculationView(APIView):
     permission_classes = [IsAuthenticated]
 
@@ -184,51 +371,54 @@ class RouteCalculationView(APIView):
         if not serializer.is_valid():
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+        geometry = geometry_options(request)
+
         data = serializer.validated_data
         start = data['start']
         end = data['end']
         disability = data['user_disability']
 
-        # Get weather data
-        weather = self.get_weather(start['lat'], start['lon'])
+        # Fetch weather in the background while the hazards are queried, so
+        # the response waits for the slower of the two instead of their sum.
+        deadline = time.monotonic() + getattr(settings, 'ROUTE_WEATHER_DEADLINE', 2.0)
+        # Run in this request's context so its upstream time is attributed here
+        weather_future = upstream_executor.submit(
+            contextvars.copy_context().run, self.get_weather, start['lat'], start['lon']
+        )
 
         # Get nearby reports
         reports = self.get_nearby_reports(start, end, disability)
 
+        try:
+            weather = weather_future.result(
+                timeout=max(0, deadline - time.monotonic())
+            )
+        except Exception as e:
+            # Weather only adjusts the scores; never fail or hold back a route for it
+            weather_future.cancel()
+            if not isinstance(e, FutureTimeoutError):
+                logger.error(f"Weather lookup failed, routing without it: {e}")
+            weather = {'condition': 'Unknown', 'temperature': 20, 'stale': True}
+
         # Calculate routes
         routes = self.calculate_routes(start, end, reports, weather, disability)
 
+        for route in routes:
+            apply_geometry(route, geometry)
+
         return Response({
             'routes': routes,
             'weather': weather,
         }, status=status.HTTP_200_OK)
 
     def get_weather(self, lat, lon):
-        """Get weather data from OpenWeatherMap."""
-        api_key = getattr(settings, 'OPENWEATHER_API_KEY', None)
-        if not api_key:
-            return {'condition': 'Unknown', 'temperature': 20}
-
-        try:
-            url = f"http://api.openweathermap.org/data/2.5/weather"
-            params = {
-                'lat': lat,
-                'lon': lon,
-                'appid': api_key,
-                'units': 'metric'
-            }
-            response = requests.get(url, params=params, timeout=5)
-            
-            if response.status_code == 200:
-                data = response.json()
-                return {
-                    'condition': data['weather'][0]['main'],
-                    'temperature': round(data['main']['temp'])
-                }
-        except Exception as e:
-            print(f"Weather API error: {e}")
-        
-        return {'condition': 'Unknown', 'temperature': 20}
+        """Get the weather fields used for route scoring."""
+        weather = weather_service.get_weather(lat, lon)
+        return {
+            'condition': weather['condition'],
+            'temperature': weather['temperature'],
+            'stale': weather.get('stale', False),
+        }
 
     def get_nearby_reports(self, start, end, disability):
         """Get reports near the route."""
@@ -238,15 +428,7 @@ class RouteCalculationView(APIView):
         min_lon = min(start['lon'], end['lon']) - 0.1
         max_lon = max(start['lon'], end['lon']) + 0.1
 
-        # Mapping disability profiles to disability types
-        disability_mapping = {
-            'wheelchair': 'Wheelchair',
-            'visual': 'Visual Impairment',
-            'hearing': 'Hearing Impairment',
-            'mobility': 'Mobility Issues',
-        }
-        
-        disability_type = disability_mapping.get(disability, 'Wheelchair')
+        profile = get_profile(disability)
 
         reports = AccessibilityReport.objects.filter(
             status='Active',
@@ -257,57 +439,19 @@ class RouteCalculationView(APIView):
         )
 
         # Filter reports relevant to user's disability
-        relevant_reports = []
-        for report in reports:
-            if disability_type in report.disability_types:
-                relevant_reports.append(report)
-
-        return relevant_reports
+        return [report for report in reports if profile.is_relevant(report)]
 
     def calculate_routes(self, start, end, reports, weather, disability):
         """Calculate three route options."""
+        profile = get_profile(disability)
         distance = haversine_distance(
             start['lat'], start['lon'],
             end['lat'], end['lon']
         )
 
-        # Count hazards by severity
-        critical_count = sum(1 for r in reports if r.severity == 'Critical')
-        high_count = sum(1 for r in reports if r.severity == 'High')
-        medium_count = sum(1 for r in reports if r.severity == 'Medium')
-
-        # Calculate base scores
-        base_score = 100
-        
-        # Route 1: Fastest (direct route, minimal consideration for accessibility)
-        fastest_score = base_score - (distance * 2)
-        fastest_score -= (critical_count * 5 + high_count * 3)
-        fastest_score = max(0, min(100, fastest_score))
-
-        # Route 2: Safest (maximum accessibility, avoids all hazards)
-        safest_distance = distance * 1.3  # 30% longer to avoid hazards
-        safest_score = base_score - (safest_distance * 1.5)
-        safest_score -= (critical_count * 2 + high_count * 1)
-        
-        # Weather bonus for safest route
-        if weather['condition'] == 'Rain':
-            safest_score += 10
-        
-        safest_score = max(0, min(100, safest_score))
-        hazards_avoided = critical_count + high_count + medium_count
-
-        # Route 3: Community Verified (balanced approach)
-        community_distance = distance * 1.15  # 15% longer
-        community_score = base_score - (community_distance * 1.8)
-        community_score -= (critical_count * 3 + high_count * 2)
-        community_score = max(0, min(100, community_score))
-
-        routes = [
+        candidates = [
             {
                 'type': 'fastest',
-                'distance': f"{distance:.1f} km",
-                'duration': f"{int(distance * 12)} min",
-                'accessibility_score': round(fastest_score),
                 'coordinates': [
                     [start['lon'], start['lat']],
                     [end['lon'], end['lat']],
@@ -315,10 +459,6 @@ class RouteCalculationView(APIView):
             },
             {
                 'type': 'safest',
-                'distance': f"{safest_distance:.1f} km",
-                'duration': f"{int(safest_distance * 12)} min",
-                'accessibility_score': round(safest_score),
-                'hazards_avoided': hazards_avoided,
                 'coordinates': [
                     [start['lon'], start['lat']],
                     [(start['lon'] + end['lon']) / 2, (start['lat'] + end['lat']) / 2],
@@ -327,19 +467,154 @@ class RouteCalculationView(APIView):
             },
             {
                 'type': 'community_verified',
-                'distance': f"{community_distance:.1f} km",
-                'duration': f"{int(community_distance * 12)} min",
-                'accessibility_score': round(community_score),
                 'coordinates': [
                     [start['lon'], start['lat']],
                     [end['lon'], end['lat']],
                 ]
             },
         ]
+        for candidate in candidates:
+            candidate['distance_km'] = distance * ROUTE_STRATEGIES[candidate['type']]['detour']
+
+        # Community verified routes are nudged by what other users with the
+        # same disability said about the areas they cross
+        adjustments = [
+            community_adjustment(candidate['coordinates'], disability)
+            if candidate['type'] == 'community_verified' else 0
+            for candidate in candidates
+        ]
+
+        hazard_points = [[float(r.latitude), float(r.longitude)] for r in reports]
+        scores = profile.score(
+            candidates, hazard_points, profile.hazard_weights(reports), weather,
+            adjustments=adjustments,
+        )
+        hazards_avoided = sum(
+            1 for r in reports if r.severity in ('Critical', 'High', 'Medium')
+        )
+
+        route_ids = remember_routes([candidate['coordinates'] for candidate in candidates])
+
+        routes = []
+        for candidate, score, route_id in zip(candidates, scores, route_ids):
+            route_distance = candidate['distance_km']
+            route = {
+                'id': route_id,
+                'type': candidate['type'],
+                'distance': f"{route_distance:.1f} km",
+                'duration': f"{int(route_distance * 12)} min",
+                'accessibility_score': round(float(score)),
+            }
+            if candidate['type'] == 'safest':
+                route['hazards_avoided'] = hazards_avoided
+            route['coordinates'] = candidate['coordinates']
+            routes.append(route)
 
         return routes
 
 
+class ReachabilityView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        """Get the area reachable from an origin without crossing blocking hazards."""
+        serializer = ReachabilitySerializer(data=request.data)
+
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        geometry = geometry_options(request)
+        data = serializer.validated_data
+        origin = data['origin']
+
+        area = reachable_area(
+            origin['lat'], origin['lon'],
+            get_profile(data['user_disability']),
+            data['budget_km'],
+        )
+        # The cached dict is shared, so encode geometry on a copy
+        return Response(apply_geometry(dict(area), geometry), status=status.HTTP_200_OK)
+
+
+class RouteChangesView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        """Get hazards created or resolved along a known route since a timestamp."""
+        serializer = RouteChangesSerializer(data=request.data)
+
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        data = serializer.validated_data
+        coordinates = None
+        if data.get('route_id'):
+            coordinates = recall_route(data['route_id'])
+        if coordinates is None and data.get('polyline'):
+            try:
+                coordinates = polyline.decode(data['polyline'], data['precision'])
+            except ValueError as e:
+                return Response({'polyline': [str(e)]}, status=status.HTTP_400_BAD_REQUEST)
+        if not coordinates:
+            return Response(
+                {'error': 'Route not found, send its polyline instead'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+
+        since = data['since']
+        if since < timezone.now() - changes_retention():
+            return Response(
+                {'error': 'since is older than the change history, recalculate the route instead'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        corridor_km = getattr(settings, 'ROUTE_HAZARD_CORRIDOR_KM', 1.0)
+        margin = corridor_km / 111.32
+        lons = [lon for lon, _ in coordinates]
+        lats = [lat for _, lat in coordinates]
+        bbox = {
+            'latitude__gte': min(lats) - margin,
+            'latitude__lte': max(lats) + margin,
+            'longitude__gte': min(lons) - margin * 2,
+            'longitude__lte': max(lons) + margin * 2,
+        }
+        profile = get_profile(data['user_disability']) if data.get('user_disability') else None
+
+        def near_route(items):
+            if profile is not None:
+                items = [item for item in items if profile.is_relevant(item)]
+            mask = within_corridor(
+                coordinates,
+                [[float(item.latitude), float(item.longitude)] for item in items],
+                corridor_km,
+            )
+            return [item for item, inside in zip(items, mask) if inside]
+
+        # Anything created or whose status changed since then has a newer
+        # updated_at, so the (updated_at, latitude, longitude) index narrows
+        # this to the few recently touched rows near the route.
+        changed = near_route(list(AccessibilityReport.objects.filter(
+            updated_at__gt=since, status_changed_at__gt=since, **bbox,
+        ).select_related('user')))
+        deleted = near_route(list(DeletedReport.objects.filter(
+            deleted_at__gt=since, created_at__lte=since, **bbox,
+        )))
+
+        # Reports created or reactivated since then are new to the client;
+        # ones it already knew that stopped being active are resolved.
+        new_hazards = [r for r in changed if r.status == 'Active']
+        resolved_hazards = [
+            r for r in changed if r.status != 'Active' and r.created_at <= since
+        ]
+
+        return Response({
+            'since': since,
+            'new_hazards': AccessibilityReportSerializer(new_hazards, many=True).data,
+            'resolved_hazards': AccessibilityReportSerializer(resolved_hazards, many=True).data,
+            'deleted_hazards': [str(report.report_id) for report in deleted],
+        }, status=status.HTTP_200_OK)
+
+
 class RouteFeedbackView(APIView):
     permission_classes = [IsAuthenticated]
 
@@ -360,6 +635,24 @@ class RouteFeedbackView(APIView):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+class MyRouteFeedbackView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        """Get the current user's route feedback, newest first."""
+        return paginated_mine(
+            self, request, RouteFeedback.objects.all(), RouteFeedbackSerializer, 'feedback_count'
+        )
+
+
+class ContributionStatsView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        """Get the current user's report and feedback counts."""
+        return Response(get_stats(request.user.pk), status=status.HTTP_200_OK)
+
+
 class WeatherView(APIView):
     permission_classes = [IsAuthenticated]
 
@@ -374,38 +667,16 @@ class WeatherView(APIView):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        api_key = getattr(settings, 'OPENWEATHER_API_KEY', None)
-        if not api_key:
+        try:
+            lat = float(lat)
+            lon = float(lon)
+        except ValueError:
             return Response(
-                {'condition': 'Unknown', 'temperature': 20},
-                status=status.HTTP_200_OK
+                {'error': 'Latitude and longitude must be numbers'},
+                status=status.HTTP_400_BAD_REQUEST
             )
 
-        try:
-            url = "http://api.openweathermap.org/data/2.5/weather"
-            params = {
-                'lat': lat,
-                'lon': lon,
-                'appid': api_key,
-                'units': 'metric'
-            }
-            response = requests.get(url, params=params, timeout=5)
-            
-            if response.status_code == 200:
-                data = response.json()
-                weather_data = {
-                    'condition': data['weather'][0]['main'],
-                    'description': data['weather'][0]['description'],
-                    'temperature': round(data['main']['temp']),
-                    'feels_like': round(data['main']['feels_like']),
-                    'humidity': data['main']['humidity'],
-                }
-                return Response(weather_data, status=status.HTTP_200_OK)
-            
-        except Exception as e:
-            print(f"Weather API error: {e}")
-        
         return Response(
-            {'condition': 'Unknown', 'temperature': 20},
+            weather_service.get_weather(lat, lon),
             status=status.HTTP_200_OK
         )
@@ -0,0 +1,431 @@
+"""
+Cached access to OpenWeatherMap.
+
+Weather barely changes across a city within a few minutes, so requests are
+quantized to ~10 km grid cells and cached per cell. Within WEATHER_CACHE_TTL
+an entry is served as is. For a further WEATHER_STALE_TTL it is still served
+immediately while a background refresh fetches a new value
+(stale-while-revalidate). Only a cold or fully expired cell waits for the
+upstream API.
+
+Upstream calls share one pooled keep-alive session. Concurrent misses for
+the same cell are coalesced into a single call, and a circuit breaker stops
+calling a failing upstream for a while, serving the last known value for a
+cell instead.
+
+With WEATHER_PREFETCH_ENABLED, a background thread keeps the most requested
+cells warm by refreshing them shortly before they expire, so busy areas
+never wait for upstream on the request path.
+"""
+import logging
+import random
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from math import floor
+
+import requests
+from django.conf import settings
+from django.utils.functional import LazyObject
+from requests.adapters import HTTPAdapter
+
+from saarthi_backend.cache import LRUCache
+from saarthi_backend.metrics import track_upstream
+
+logger = logging.getLogger(__name__)
+
+UNKNOWN_WEATHER = {'condition': 'Unknown', 'temperature': 20}
+
+
+class CircuitBreaker:
+    """
+    Stops calls to a dependency after repeated failures.
+
+    After failure_threshold consecutive failures the breaker opens and
+    allow() returns False for reset_timeout seconds. Then a single trial
+    call is let through: success closes the breaker, failure reopens it.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold=5, reset_timeout=30):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    logger.warning("Weather upstream circuit opened")
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
+
+class CountMinSketch:
+    """
+    Fixed-size approximate frequency counter.
+
+    Estimates never undercount; overcounting is bounded by the table width.
+    """
+
+    def __init__(self, width=1024, depth=4):
+        self.width = width
+        self.seeds = [random.randrange(1 << 30) for _ in range(depth)]
+        self.table = [[0] * width for _ in range(depth)]
+
+    def _slots(self, key):
+        for row, seed in zip(self.table, self.seeds):
+            yield row, hash((seed, key)) % self.width
+
+    def add(self, key, count=1):
+        for row, slot in self._slots(key):
+            row[slot] += count
+
+    def estimate(self, key):
+        return min(row[slot] for row, slot in self._slots(key))
+
+    def decay(self):
+        """Halve all counts so old popularity fades."""
+        for row in self.table:
+            for i, value in enumerate(row):
+                row[i] = value >> 1
+
+
+class HotCellTracker:
+    """
+    Tracks which weather cells are requested most.
+
+    Frequencies live in a count-min sketch; a bounded LRU of recently seen
+    cells supplies the candidates to rank, since a sketch can't list keys.
+    """
+
+    def __init__(self, candidates=512):
+        self.sketch = CountMinSketch()
+        self.max_candidates = candidates
+        self.candidates = OrderedDict()
+        self._lock = threading.Lock()
+
+    def record(self, cell):
+        with self._lock:
+            self.sketch.add(cell)
+            self.candidates[cell] = None
+            self.candidates.move_to_end(cell)
+            if len(self.candidates) > self.max_candidates:
+                self.candidates.popitem(last=False)
+
+    def hottest(self, n):
+        with self._lock:
+            ranked = sorted(self.candidates, key=self.sketch.estimate, reverse=True)
+            return [cell for cell in ranked[:n] if self.sketch.estimate(cell) > 0]
+
+    def decay(self):
+        with self._lock:
+            self.sketch.decay()
+
+
+class RateLimiter:
+    """Token bucket allowing `rate` acquisitions per minute."""
+
+    def __init__(self, rate):
+        self.capacity = max(1, rate)
+        self.tokens = float(self.capacity)
+        self.refill_per_second = rate / 60.0
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def try_acquire(self):
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.refill_per_second)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return True
+            return False
+
+
+class WeatherPrefetcher:
+    """
+    Background thread that refreshes hot cells before they expire.
+
+    Every WEATHER_PREFETCH_INTERVAL seconds, the WEATHER_PREFETCH_CELLS
+    hottest cells that expire within WEATHER_PREFETCH_LEAD seconds are
+    refreshed, at most WEATHER_PREFETCH_CONCURRENCY at a time and within
+    WEATHER_PREFETCH_RATE upstream calls per minute.
+    """
+
+    def __init__(self, service):
+        self.service = service
+        self.interval = getattr(settings, 'WEATHER_PREFETCH_INTERVAL', 30)
+        self.max_cells = getattr(settings, 'WEATHER_PREFETCH_CELLS', 50)
+        self.lead = getattr(settings, 'WEATHER_PREFETCH_LEAD', 60)
+        self.limiter = RateLimiter(getattr(settings, 'WEATHER_PREFETCH_RATE', 30))
+        self.executor = ThreadPoolExecutor(
+            max_workers=getattr(settings, 'WEATHER_PREFETCH_CONCURRENCY', 2),
+            thread_name_prefix='weather-prefetch',
+        )
+        self.prefetches = 0
+        self.rate_limited = 0
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def ensure_started(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name='weather-prefetcher', daemon=True
+                )
+                self._thread.start()
+                logger.info("Weather prefetcher started")
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.run_once()
+            except Exception as e:
+                logger.error(f"Weather prefetch failed: {e}")
+
+    def run_once(self):
+        """Schedule refreshes for hot cells that are about to expire."""
+        scheduled = []
+        for cell in self.service.tracker.hottest(self.max_cells):
+            entry = self.service.cache.get_entry(cell, count=False)
+            if entry is not None and time.monotonic() - entry[1] < self.service.ttl - self.lead:
+                continue
+            if not self.limiter.try_acquire():
+                self.rate_limited += 1
+                break
+            scheduled.append(self.executor.submit(self.service._load, cell))
+            self.prefetches += 1
+
+        self.service.tracker.decay()
+        return scheduled
+
+
+class WeatherService:
+    """
+    Weather lookups shared by every view that needs current conditions.
+    """
+
+    def __init__(self):
+        self.cell_deg = getattr(settings, 'WEATHER_CELL_DEG', 0.1)
+        self.ttl = getattr(settings, 'WEATHER_CACHE_TTL', 600)
+        self.stale_ttl = getattr(settings, 'WEATHER_STALE_TTL', 1800)
+        self.timeout = getattr(settings, 'WEATHER_TIMEOUT', 5)
+        self.url = getattr(
+            settings, 'OPENWEATHER_URL', "http://api.openweathermap.org/data/2.5/weather"
+        )
+        self.cache = LRUCache(maxsize=getattr(settings, 'WEATHER_CACHE_SIZE', 2048))
+        self.breaker = CircuitBreaker(
+            failure_threshold=getattr(settings, 'WEATHER_BREAKER_THRESHOLD', 5),
+            reset_timeout=getattr(settings, 'WEATHER_BREAKER_RESET', 30),
+        )
+
+        pool_size = getattr(settings, 'WEATHER_POOL_SIZE', 10)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+        self._inflight = {}
+        self._inflight_lock = threading.Lock()
+        self._refresh_executor = ThreadPoolExecutor(
+            max_workers=2, thread_name_prefix='weather-refresh'
+        )
+        self.tracker = HotCellTracker()
+        self.prefetcher = None
+        if getattr(settings, 'WEATHER_PREFETCH_ENABLED', False):
+            self.prefetcher = WeatherPrefetcher(self)
+
+        self.fresh_hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.fallbacks = 0
+        self.upstream_calls = 0
+        self.upstream_errors = 0
+        self.short_circuited = 0
+
+    @property
+    def api_key(self):
+        return getattr(settings, 'OPENWEATHER_API_KEY', None)
+
+    def cell_for(self, lat, lon):
+        """Return the cache key for the cell containing a point."""
+        return floor(float(lat) / self.cell_deg), floor(float(lon) / self.cell_deg)
+
+    def cell_center(self, cell):
+        return (cell[0] + 0.5) * self.cell_deg, (cell[1] + 0.5) * self.cell_deg
+
+    def get_weather(self, lat, lon):
+        """
+        Get current weather for a location.
+
+        Returns:
+            Weather dict with at least 'condition' and 'temperature'. Falls
+            back to UNKNOWN_WEATHER if no API key is configured or the
+            upstream call fails with nothing cached.
+        """
+        if not self.api_key:
+            return dict(UNKNOWN_WEATHER)
+
+        cell = self.cell_for(lat, lon)
+        self.tracker.record(cell)
+        if self.prefetcher is not None:
+            self.prefetcher.ensure_started()
+
+        # Cached dicts are shared; callers get copies they are free to change
+        entry = self.cache.get_entry(cell)
+        if entry is not None:
+            value, stored_at = entry
+            age = time.monotonic() - stored_at
+            if age <= self.ttl:
+                self.fresh_hits += 1
+                return dict(value)
+            if age <= self.ttl + self.stale_ttl:
+                self.stale_hits += 1
+                self._refresh_in_background(cell)
+                return dict(value)
+
+        self.misses += 1
+        value = self._load(cell)
+        if value is not None:
+            return dict(value)
+        if entry is not None:
+            # Upstream is down; the last known value beats no value at all
+            self.fallbacks += 1
+            return {**entry[0], 'stale': True}
+        return dict(UNKNOWN_WEATHER)
+
+    def _load(self, cell):
+        """
+        Fetch a cell from upstream and cache it, at most once at a time.
+
+        Callers that miss on a cell already being fetched wait for that
+        call instead of issuing their own. Returns None on failure.
+        """
+        with self._inflight_lock:
+            future = self._inflight.get(cell)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._inflight[cell] = future
+
+        if not leader:
+            self.coalesced += 1
+            try:
+                return future.result(timeout=self.timeout + 1)
+            except Exception:
+                return None
+
+        value = None
+        try:
+            lat, lon = self.cell_center(cell)
+            value = self._fetch(lat, lon)
+            if value is not None:
+                self.cache.set(cell, value)
+        finally:
+            with self._inflight_lock:
+                del self._inflight[cell]
+            future.set_result(value)
+        return value
+
+    def _refresh_in_background(self, cell):
+        with self._inflight_lock:
+            if cell in self._inflight:
+                return
+        self._refresh_executor.submit(self._load, cell)
+
+    def _fetch(self, lat, lon):
+        """Call OpenWeatherMap for a point."""
+        if not self.breaker.allow():
+            self.short_circuited += 1
+            return None
+
+        self.upstream_calls += 1
+        try:
+            params = {
+                'lat': lat,
+                'lon': lon,
+                'appid': self.api_key,
+                'units': 'metric'
+            }
+            with track_upstream('weather'):
+                response = self.session.get(self.url, params=params, timeout=self.timeout)
+
+            if response.status_code == 200:
+                data = response.json()
+                self.breaker.record_success()
+                return {
+                    'condition': data['weather'][0]['main'],
+                    'description': data['weather'][0]['description'],
+                    'temperature': round(data['main']['temp']),
+                    'feels_like': round(data['main']['feels_like']),
+                    'humidity': data['main']['humidity'],
+                }
+            logger.warning(f"Weather API returned {response.status_code}")
+        except Exception as e:
+            logger.error(f"Weather API error: {e}")
+
+        self.upstream_errors += 1
+        self.breaker.record_failure()
+        return None
+
+    def stats(self):
+        lookups = self.fresh_hits + self.stale_hits + self.misses
+        return {
+            'lookups': lookups,
+            'fresh_hits': self.fresh_hits,
+            'stale_hits': self.stale_hits,
+            'misses': self.misses,
+            'hit_rate': round((self.fresh_hits + self.stale_hits) / lookups, 4) if lookups else 0.0,
+            'coalesced': self.coalesced,
+            'fallbacks': self.fallbacks,
+            'upstream_calls': self.upstream_calls,
+            'upstream_errors': self.upstream_errors,
+            'short_circuited': self.short_circuited,
+            'circuit': self.breaker.state,
+            'prefetches': self.prefetcher.prefetches if self.prefetcher else 0,
+            'cache': self.cache.stats(),
+        }
+
+
+class DefaultWeatherService(LazyObject):
+    """
+    Proxy for the process's WeatherService, built on first use.
+
+    Like photo_storage, so importing the views doesn't open a session or
+    start executor threads.
+    """
+
+    def _setup(self):
+        self._wrapped = WeatherService()
+
+
+# Global instance, created on first use
+weather_service = DefaultWeatherService()
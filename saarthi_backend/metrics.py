@@ -0,0 +1,315 @@
+"""
+In-process request metrics in the Prometheus text format.
+
+RequestMetricsMiddleware (saarthi_backend/middleware.py) times every
+request and splits it into database, serializer and upstream HTTP time.
+Serializer time is only measured with METRICS_SERIALIZER_TIMING on, as it
+needs instrument_serializers() to patch DRF.
+The results go into the histograms below, labelled by view, and are served
+at /metrics together with the stats() counters of the shared services
+listed in METRICS_STATS.
+
+Code that calls third-party services wraps the call in track_upstream(),
+which records it per service and adds it to the current request's
+upstream time. Work handed to a thread pool only counts towards the
+request if it is submitted through contextvars.copy_context().run.
+
+Metrics are per process. Each server process reports its own numbers,
+so scrape every worker or run a single one per target.
+"""
+import contextvars
+import math
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.http import Http404, HttpResponse
+from django.utils.crypto import constant_time_compare
+from django.utils.functional import LazyObject, empty
+from django.utils.module_loading import import_string
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Seconds, from 5 ms to 10 s
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def _number(value):
+    if value == math.inf:
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Histogram:
+    """Thread-safe cumulative histogram with fixed buckets, per label set."""
+
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DURATION_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        self._series = {}  # label values -> [bucket counts..., sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labelvalues):
+        with self._lock:
+            series = self._series.get(labelvalues)
+            if series is None:
+                series = self._series[labelvalues] = [0] * len(self.buckets) + [0.0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+                    break
+            series[-1] += value
+
+    def samples(self):
+        with self._lock:
+            series = {labels: list(values) for labels, values in self._series.items()}
+        for labelvalues, values in sorted(series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, values):
+                cumulative += count
+                yield (f"{self.name}_bucket{_labels(self.labelnames, labelvalues, [('le', _number(bound))])}",
+                       cumulative)
+            yield f"{self.name}_sum{_labels(self.labelnames, labelvalues)}", values[-1]
+            yield f"{self.name}_count{_labels(self.labelnames, labelvalues)}", cumulative
+
+
+class Counter:
+    """Thread-safe monotonically increasing count, per label set."""
+
+    kind = 'counter'
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labelvalues, amount=1):
+        with self._lock:
+            self._values[labelvalues] = self._values.get(labelvalues, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            values = dict(self._values)
+        for labelvalues, value in sorted(values.items()):
+            yield f"{self.name}{_labels(self.labelnames, labelvalues)}", value
+
+
+class MetricsRegistry:
+    """Metrics of this process, rendered in the Prometheus text format."""
+
+    def __init__(self):
+        self._metrics = []
+
+    def histogram(self, *args, **kwargs):
+        metric = Histogram(*args, **kwargs)
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, *args, **kwargs):
+        metric = Counter(*args, **kwargs)
+        self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(f"{sample} {_number(value)}" for sample, value in metric.samples())
+        lines.extend(render_stats(getattr(settings, 'METRICS_STATS', {})))
+        return '\n'.join(lines) + '\n'
+
+
+def _flatten(stats, prefix):
+    for key, value in stats.items():
+        name = f"{prefix}_{key}"
+        if isinstance(value, dict):
+            yield from _flatten(value, name)
+        elif isinstance(value, (bool, int, float)):
+            yield name, float(value) if isinstance(value, bool) else value
+
+
+def render_stats(sources):
+    """
+    Gauges for the numeric fields of service stats() dicts.
+
+    sources maps a metric prefix to the dotted path of an object with a
+    stats() method, e.g. {'weather': 'accessibility.weather.weather_service'}.
+    Nested dicts are flattened; non-numeric fields are skipped, and so are
+    lazy services this process hasn't built yet.
+    """
+    lines = []
+    for prefix, path in sources.items():
+        try:
+            source = import_string(path)
+            if isinstance(source, LazyObject) and source._wrapped is empty:
+                continue
+            stats = source.stats()
+        except Exception:
+            continue
+        for name, value in _flatten(stats, f"saarthi_{prefix}"):
+            lines.append(f"# TYPE {name} gauge")
+            lines.append(f"{name} {_number(value)}")
+    return lines
+
+
+# Global instance
+registry = MetricsRegistry()
+
+REQUEST_SECONDS = registry.histogram(
+    'saarthi_request_duration_seconds', 'Wall time per request.', ['view', 'method'])
+REQUEST_DB_SECONDS = registry.histogram(
+    'saarthi_request_db_seconds', 'Database time per request.', ['view', 'method'])
+REQUEST_DB_QUERIES = registry.histogram(
+    'saarthi_request_db_queries', 'Database queries per request.', ['view', 'method'],
+    buckets=QUERY_COUNT_BUCKETS)
+REQUEST_SERIALIZER_SECONDS = registry.histogram(
+    'saarthi_request_serializer_seconds', 'Serializer validation and rendering time per request.',
+    ['view', 'method'])
+REQUEST_UPSTREAM_SECONDS = registry.histogram(
+    'saarthi_request_upstream_seconds', 'Third-party HTTP time per request.', ['view', 'method'])
+RESPONSES = registry.counter(
+    'saarthi_responses_total', 'Responses by status code.', ['view', 'method', 'status'])
+UPSTREAM_CALL_SECONDS = registry.histogram(
+    'saarthi_upstream_call_seconds', 'Duration of calls to third-party services.', ['service'])
+
+
+class RequestTimings:
+    """Time spent in each component while serving one request, in seconds."""
+
+    def __init__(self):
+        self.db = 0.0
+        self.queries = 0
+        self.serializer = 0.0
+        self.upstream = 0.0
+        self._serializer_depth = 0
+        self._lock = threading.Lock()
+
+    def add_upstream(self, seconds):
+        # Upstream calls may run on pool threads
+        with self._lock:
+            self.upstream += seconds
+
+    def db_wrapper(self, execute, sql, params, many, context):
+        """connection.execute_wrapper() hook."""
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db += time.perf_counter() - started
+            self.queries += 1
+
+
+current_timings = contextvars.ContextVar('current_timings', default=None)
+
+
+@contextmanager
+def track_upstream(service):
+    """Time a call to a third-party service."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        UPSTREAM_CALL_SECONDS.observe(elapsed, service)
+        timings = current_timings.get()
+        if timings is not None:
+            timings.add_upstream(elapsed)
+
+
+@contextmanager
+def track_serializer():
+    """Time serializer work; nested serializers count once."""
+    timings = current_timings.get()
+    if timings is None:
+        yield
+        return
+    timings._serializer_depth += 1
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings._serializer_depth -= 1
+        if not timings._serializer_depth:
+            timings.serializer += time.perf_counter() - started
+
+
+_originals = {}
+
+
+def instrument_serializers():
+    """
+    Route DRF serializer validation and rendering through track_serializer().
+
+    This patches the DRF base classes for the whole process, so every
+    serializer is covered without changing its class. It is opt-in:
+    RequestMetricsMiddleware only applies it with METRICS_SERIALIZER_TIMING
+    on, and the serializer histogram stays at zero otherwise.
+    """
+    if _originals:
+        return
+    from rest_framework.serializers import BaseSerializer, ListSerializer
+
+    def timed(fn):
+        def wrapper(*args, **kwargs):
+            with track_serializer():
+                return fn(*args, **kwargs)
+        return wrapper
+
+    # Serializer.data and ListSerializer.data both build on BaseSerializer.data
+    _originals[BaseSerializer, 'data'] = BaseSerializer.__dict__['data']
+    BaseSerializer.data = property(timed(BaseSerializer.data.fget))
+    for cls in (BaseSerializer, ListSerializer):
+        _originals[cls, 'is_valid'] = cls.__dict__['is_valid']
+        cls.is_valid = timed(cls.__dict__['is_valid'])
+
+
+def uninstrument_serializers():
+    """Undo instrument_serializers()."""
+    for (cls, name), original in _originals.items():
+        setattr(cls, name, original)
+    _originals.clear()
+
+
+def record_request(view, method, status_code, wall, timings):
+    REQUEST_SECONDS.observe(wall, view, method)
+    REQUEST_DB_SECONDS.observe(timings.db, view, method)
+    REQUEST_DB_QUERIES.observe(timings.queries, view, method)
+    REQUEST_SERIALIZER_SECONDS.observe(timings.serializer, view, method)
+    REQUEST_UPSTREAM_SECONDS.observe(timings.upstream, view, method)
+    RESPONSES.inc(view, method, str(status_code))
+
+
+def metrics_view(request):
+    """
+    Prometheus scrape endpoint.
+
+    Scrapers must send METRICS_TOKEN as a bearer token. Without a token the
+    endpoint only exists with DEBUG on.
+    """
+    token = getattr(settings, 'METRICS_TOKEN', '')
+    if not token:
+        if not settings.DEBUG:
+            raise Http404
+    elif not constant_time_compare(request.headers.get('Authorization', ''), f"Bearer {token}"):
+        return HttpResponse(status=403)
+    return HttpResponse(registry.render(), content_type=CONTENT_TYPE)
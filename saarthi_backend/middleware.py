@@ -0,0 +1,100 @@
+"""
+Per-request timing and optional profiling.
+
+RequestMetricsMiddleware records wall, database, serializer and upstream
+HTTP time for every request into the histograms in saarthi_backend/metrics.py.
+Serializer time needs METRICS_SERIALIZER_TIMING on and reads zero otherwise.
+
+With PROFILE_SLOW_REQUESTS on, a PROFILE_SAMPLE_RATE fraction of requests
+also runs under cProfile, and the stats of any sampled request slower than
+PROFILE_SLOW_THRESHOLD_MS are written to PROFILE_DIR for inspection:
+
+    python -m pstats profiles/<file>.prof
+"""
+import cProfile
+import logging
+import os
+import random
+import re
+import threading
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+from .metrics import RequestTimings, current_timings, instrument_serializers, record_request
+
+logger = logging.getLogger(__name__)
+
+
+def view_label(request):
+    """Name of the URL pattern that served the request, for metric labels."""
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unmatched'
+    return match.view_name or match._func_path
+
+
+class RequestMetricsMiddleware:
+    """Goes first in MIDDLEWARE so the timings cover the whole stack."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if getattr(settings, 'METRICS_SERIALIZER_TIMING', False):
+            instrument_serializers()
+        self.profile = getattr(settings, 'PROFILE_SLOW_REQUESTS', False)
+        self.sample_rate = getattr(settings, 'PROFILE_SAMPLE_RATE', 0.01)
+        self.slow_threshold = getattr(settings, 'PROFILE_SLOW_THRESHOLD_MS', 500) / 1000
+        self.profile_dir = getattr(settings, 'PROFILE_DIR', 'profiles')
+        # cProfile allows one active profiler per process on Python 3.12+
+        self._profile_lock = threading.Lock()
+
+    def __call__(self, request):
+        timings = RequestTimings()
+        token = current_timings.set(timings)
+        profiler = self._start_profiler()
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(timings.db_wrapper))
+                response = self.get_response(request)
+        finally:
+            wall = time.perf_counter() - started
+            current_timings.reset(token)
+            if profiler is not None:
+                profiler.disable()
+                self._profile_lock.release()
+
+        view = view_label(request)
+        record_request(view, request.method, response.status_code, wall, timings)
+        if profiler is not None and wall >= self.slow_threshold:
+            self._dump(profiler, view, request.method, wall)
+        return response
+
+    def _start_profiler(self):
+        if not self.profile or random.random() >= self.sample_rate:
+            return None
+        if not self._profile_lock.acquire(blocking=False):
+            return None
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Another profiler (e.g. a debugger) is already active
+            self._profile_lock.release()
+            return None
+        return profiler
+
+    def _dump(self, profiler, view, method, wall):
+        name = re.sub(r'[^A-Za-z0-9_.-]+', '_', view)
+        path = os.path.join(
+            self.profile_dir, f"{time.strftime('%Y%m%d-%H%M%S')}-{method}-{name}-{wall * 1000:.0f}ms.prof"
+        )
+        try:
+            os.makedirs(self.profile_dir, exist_ok=True)
+            profiler.dump_stats(path)
+            logger.info(f"Slow request profiled: {method} {view} took {wall * 1000:.0f} ms, stats in {path}")
+        except OSError as e:
+            logger.error(f"Could not write request profile {path}: {e}")
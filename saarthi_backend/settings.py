@@ -5,6 +5,7 @@ Django settings for saarthi_backend project.
 from pathlib import Path
 from datetime import timedelta
 import os
+import tempfile
 from dotenv import load_dotenv
 
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -35,6 +36,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'saarthi_backend.middleware.RequestMetricsMiddleware',  # First, to time the whole stack
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',  # CORS
@@ -43,6 +45,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'users.middleware.PasswordHashingBusyMiddleware',  # 503 when password hashing is at capacity
 ]
 
 ROOT_URLCONF = 'saarthi_backend.urls'
@@ -114,6 +117,23 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# At most PASSWORD_HASH_SLOTS PBKDF2 hashes run at once across all worker
+# processes on a host, so sign-up bursts cannot starve other requests
+# (users/hashing.py). The hasher uses the stock algorithm name, so existing
+# hashes keep verifying.
+PASSWORD_HASHERS = [
+    'users.hashing.ThrottledPBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+    'django.contrib.auth.hashers.ScryptPasswordHasher',
+]
+PASSWORD_HASH_SLOTS = 2  # Concurrent hashes per host, below its core count; 0 for no limit
+PASSWORD_HASH_WAIT = 2  # Seconds to wait for a free slot before answering 503
+PASSWORD_HASH_LOCK_DIR = os.path.join(tempfile.gettempdir(), 'saarthi-password-hashing')  # Must be host-local
+PASSWORD_HASH_RETRY_AFTER = 2  # Seconds, sent with 503 responses
+
 LANGUAGE_CODE = 'en-us'
 TIME_ZONE = 'Asia/Kolkata'
 USE_I18N = True
@@ -131,7 +151,7 @@ AUTH_USER_MODEL = 'users.User'
 # REST Framework Configuration
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'users.authentication.CachedJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         # 'rest_framework.permissions.IsAuthenticated',  # Temporarily disabled for development
@@ -146,8 +166,35 @@ SIMPLE_JWT = {
     'REFRESH_TOKEN_LIFETIME': timedelta(days=30),
     'ROTATE_REFRESH_TOKENS': True,
     'BLACKLIST_AFTER_ROTATION': True,
+    'TOKEN_OBTAIN_SERIALIZER': 'users.serializers.ClaimsTokenObtainPairSerializer',
 }
 
+# Authenticated users are served from a per-process cache of user rows
+# (users/authentication.py). With AUTH_TOKEN_USER, a cache miss builds the
+# user from token claims instead of querying; claims may lag profile edits
+# made in other processes until the user logs in again. Claims can't show a
+# deactivated user, so AUTH_TOKEN_USER only takes effect with
+# SIMPLE_JWT['CHECK_USER_IS_ACTIVE'] set to False (and CHECK_REVOKE_TOKEN off).
+AUTH_USER_CACHE_TTL = 60  # Seconds
+AUTH_USER_CACHE_SIZE = 10000
+AUTH_TOKEN_USER = os.environ.get('AUTH_TOKEN_USER', '0') == '1'
+
+# Serialized profile payloads per process, keyed by user and updated_at (users/cards.py)
+USER_CARD_CACHE_SIZE = 10000
+
+# Volunteer presence and proximity matching (users/presence.py)
+VOLUNTEER_PRESENCE_TTL = 120  # Seconds without a heartbeat before a volunteer drops out
+VOLUNTEER_PRESENCE_CELL_DEG = 0.01  # Spatial index cell size (~1.1 km)
+VOLUNTEER_PRESENCE_SYNC_INTERVAL = 2  # Seconds between index refreshes from the database
+VOLUNTEER_RATING_WEIGHT = 0.2  # A 5-star volunteer ranks as if this much closer
+VOLUNTEER_NEARBY_MAX_KM = 10
+VOLUNTEER_AREA_MAX_DEG = 0.5  # Largest bounding box side for the active-volunteers listing
+VOLUNTEER_AREA_CELL_DEG = 0.01  # The listing returns counts per cell of this size, never exact positions
+
+# Volunteer leaderboard (users/leaderboard.py)
+LEADERBOARD_SYNC_INTERVAL = 5  # Seconds between incremental refreshes from the database
+LEADERBOARD_RELOAD_INTERVAL = 300  # Seconds between full reloads, which drop removed volunteers
+
 # CORS Settings (allow React Native app to connect)
 CORS_ALLOW_ALL_ORIGINS = True  # For development only
 CORS_ALLOW_CREDENTIALS = True
@@ -164,6 +211,109 @@ SUPABASE_KEY = os.environ.get('SUPABASE_KEY', '')
 SUPABASE_SERVICE_ROLE_KEY = os.environ.get('SUPABASE_SERVICE_ROLE_KEY', '')
 SUPABASE_BUCKET_NAME = os.environ.get('SUPABASE_BUCKET_NAME', 'report-images')
 
+# Where report photos are stored: 'supabase', 'local' or a dotted class path
+# (see accessibility/storage.py). 'local' writes under PHOTO_STORAGE_ROOT and
+# needs no network, e.g. for development and load tests.
+PHOTO_STORAGE_BACKEND = os.environ.get('PHOTO_STORAGE_BACKEND', 'supabase')
+PHOTO_STORAGE_ROOT = os.path.join(MEDIA_ROOT, 'storage')
+PHOTO_STORAGE_URL = os.environ.get('PHOTO_STORAGE_URL', MEDIA_URL + 'storage/')
+PHOTO_SIGNED_UPLOAD_TTL = 10 * 60  # Seconds a local signed upload URL stays valid
+PHOTO_FINALIZE_TTL = 3 * 60 * 60  # Seconds an upload token can be finalized; outlasts Supabase's 2 h URLs
+
 # File upload settings
 MAX_UPLOAD_SIZE = 10 * 1024 * 1024  # 10MB
+FILE_UPLOAD_MAX_MEMORY_SIZE = 1024 * 1024  # Larger uploads are written to a temp file
+PHOTO_RESUMABLE_THRESHOLD = 6 * 1024 * 1024  # Bigger photos use chunked TUS uploads
+PHOTO_UPLOAD_CHUNK_SIZE = 6 * 1024 * 1024  # Supabase requires 6MB TUS chunks
 ALLOWED_UPLOAD_EXTENSIONS = ['.jpg', '.jpeg', '.png', '.gif', '.webp']
+
+# Report photos are spooled here and uploaded by a background worker pool
+PHOTO_SPOOL_DIR = os.path.join(MEDIA_ROOT, 'photo_spool')
+PHOTO_UPLOAD_WORKERS = 4
+PHOTO_UPLOAD_RETRIES = 3  # Attempts after the first
+PHOTO_UPLOAD_BACKOFF = 1.0  # Seconds, doubled per attempt
+PHOTO_PROCESS_WORKERS = 2  # Processes for resizing/transcoding photos
+PHOTO_MAX_DIMENSION = 1600  # Longest side of the stored display image, px
+PHOTO_THUMBNAIL_SIZE = 320  # Longest side of the thumbnail, px
+PHOTO_WEBP_QUALITY = 80
+
+# Orphaned photo cleanup (python manage.py collect_orphan_photos)
+PHOTO_GC_BATCH_SIZE = 1000  # Objects per storage delete call
+PHOTO_GC_PAGE_SIZE = 1000  # Objects per listing page when reconciling
+PHOTO_GC_GRACE_PERIOD = 24 * 60 * 60  # Seconds before an unreferenced object is collected
+PHOTO_GC_REUSE_WINDOW = 60 * 60  # Seconds queued objects stay after an upload was handed their URL
+PHOTO_GC_MAX_ATTEMPTS = 5  # Failed delete batches before a queued photo is left for inspection
+
+# Route calculation
+UPSTREAM_MAX_WORKERS = 8  # Threads for third-party calls made during a request
+ROUTE_WEATHER_DEADLINE = 2.0  # Seconds a route waits for weather before giving up
+ROUTE_ID_TTL = 24 * 60 * 60  # Seconds a returned route ID can be used for change checks
+ROUTE_CHANGES_RETENTION = 7 * 24 * 60 * 60  # Seconds back a change check may look; deletions are kept this long
+
+# Per-disability route scoring. Entries are merged over the defaults in
+# accessibility/scoring.py key by key, nested weight tables included, e.g.
+# ROUTE_SCORING_PROFILES = {
+#     'wheelchair': {'problem_type_weights': {'Broken Ramp': 2.0}},
+#     'visual': {'severity_weights': {'fastest': {'Critical': 6}}},
+# }
+ROUTE_SCORING_PROFILES = {}
+# Hazards closer than this to a route count against it. Before route
+# corridors, every hazard in the ~0.1 degree lookup box counted.
+ROUTE_HAZARD_CORRIDOR_KM = 1.0
+
+# Grid used to bucket locations for aggregates and caches
+GRID_CELL_DEG = 0.01  # ~1.1 km
+
+# Route feedback aggregation (python manage.py aggregate_feedback)
+FEEDBACK_EWMA_ALPHA = 0.2  # Weight of the newest rating in a cell's rolling average
+FEEDBACK_MIN_RATINGS = 5  # Ratings before a cell counts at full weight
+FEEDBACK_SCORE_WEIGHT = 5  # Score points per rating point above/below neutral
+FEEDBACK_SAFETY_LAG = 60  # Seconds; newer rows wait so late-committing transactions are not skipped
+
+# Reachability (isochrone) endpoint. Results are cached in the default
+# cache under a hazard version kept in the database, so a change to a
+# blocking report invalidates them in every worker process.
+REACHABILITY_CELL_DEG = 0.002  # ~220 m expansion grid
+REACHABILITY_MAX_DISTANCE_KM = 5
+REACHABILITY_CACHE_TTL = 600  # seconds
+
+# Weather (OpenWeatherMap) cache. Lookups are quantized to WEATHER_CELL_DEG
+# cells; a cell is fresh for WEATHER_CACHE_TTL seconds and then served stale
+# for up to WEATHER_STALE_TTL more while it refreshes in the background.
+OPENWEATHER_API_KEY = os.environ.get('OPENWEATHER_API_KEY', '')
+WEATHER_CELL_DEG = 0.1  # ~10 km
+WEATHER_CACHE_TTL = 600
+WEATHER_STALE_TTL = 1800
+WEATHER_CACHE_SIZE = 2048  # Cells kept per worker process
+WEATHER_TIMEOUT = 5  # Seconds per upstream call
+WEATHER_POOL_SIZE = 10  # Keep-alive connections to the weather API per process
+WEATHER_BREAKER_THRESHOLD = 5  # Consecutive failures before upstream calls stop
+WEATHER_BREAKER_RESET = 30  # Seconds before a trial call is let through again
+
+# Background refresh of the busiest weather cells (one thread per process)
+WEATHER_PREFETCH_ENABLED = os.environ.get('WEATHER_PREFETCH_ENABLED', '') == '1'
+WEATHER_PREFETCH_INTERVAL = 30  # Seconds between refresh rounds
+WEATHER_PREFETCH_CELLS = 50  # Hottest cells considered per round
+WEATHER_PREFETCH_LEAD = 60  # Refresh cells expiring within this many seconds
+WEATHER_PREFETCH_CONCURRENCY = 2  # Parallel upstream calls
+WEATHER_PREFETCH_RATE = 30  # Max upstream calls per minute
+
+# Request metrics, served at /metrics in the Prometheus text format
+# (saarthi_backend/metrics.py). Scrapers must send METRICS_TOKEN as a bearer
+# token; without one the endpoint returns 404 unless DEBUG is on.
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+# Time DRF serializers per request; patches the DRF base classes process-wide
+METRICS_SERIALIZER_TIMING = os.environ.get('METRICS_SERIALIZER_TIMING', '0') == '1'
+# Services whose stats() are exported as gauges: metric prefix -> dotted path
+METRICS_STATS = {
+    'weather': 'accessibility.weather.weather_service',
+    'password_hashing': 'users.hashing.hashing_slots',
+    'auth_user_cache': 'users.authentication.user_rows',
+    'user_card_cache': 'users.cards.user_cards',
+}
+
+# Sampled cProfile dumps of slow requests (saarthi_backend/middleware.py)
+PROFILE_SLOW_REQUESTS = os.environ.get('PROFILE_SLOW_REQUESTS', '0') == '1'
+PROFILE_SAMPLE_RATE = 0.01  # Fraction of requests run under the profiler
+PROFILE_SLOW_THRESHOLD_MS = 500  # Sampled requests at least this slow are dumped
+PROFILE_DIR = BASE_DIR / 'profiles'
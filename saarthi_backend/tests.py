@@ -0,0 +1,111 @@
+import os
+import shutil
+import tempfile
+import time
+
+from django.http import Http404, HttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+from rest_framework import serializers
+
+from .metrics import (
+    Histogram, UPSTREAM_CALL_SECONDS, metrics_view, registry, track_upstream, uninstrument_serializers,
+)
+from .middleware import RequestMetricsMiddleware
+
+
+class PointSerializer(serializers.Serializer):
+    lat = serializers.FloatField()
+    lon = serializers.FloatField()
+
+
+def sample(name):
+    """Current value of one exported sample, or None."""
+    for line in registry.render().splitlines():
+        if line.startswith(name + ' '):
+            return float(line.rsplit(' ', 1)[1])
+    return None
+
+
+class HistogramTests(SimpleTestCase):
+    def test_text_format(self):
+        histogram = Histogram('test_seconds', 'Test.', ['view'], buckets=(0.1, 1.0))
+        histogram.observe(0.05, 'a"b')
+        histogram.observe(0.5, 'a"b')
+        histogram.observe(5, 'a"b')
+        self.assertEqual([f"{name} {value}" for name, value in histogram.samples()], [
+            'test_seconds_bucket{view="a\\"b",le="0.1"} 1',
+            'test_seconds_bucket{view="a\\"b",le="1.0"} 2',
+            'test_seconds_bucket{view="a\\"b",le="+Inf"} 3',
+            'test_seconds_sum{view="a\\"b"} 5.55',
+            'test_seconds_count{view="a\\"b"} 3',
+        ])
+
+
+class RequestMetricsMiddlewareTests(SimpleTestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+
+    def view(self, request):
+        with track_upstream('test-upstream'):
+            time.sleep(0.01)
+        serializer = PointSerializer(data={'lat': 1, 'lon': 2})
+        serializer.is_valid()
+        PointSerializer(serializer.validated_data).data
+        return HttpResponse(status=201)
+
+    def test_request_is_split_into_components(self):
+        count = '{view="unmatched",method="POST"}'
+        before = sample(f'saarthi_request_duration_seconds_count{count}') or 0
+        upstream_before = sample(f'saarthi_request_upstream_seconds_sum{count}') or 0
+
+        with override_settings(METRICS_SERIALIZER_TIMING=True):
+            middleware = RequestMetricsMiddleware(self.view)
+        self.addCleanup(uninstrument_serializers)
+        response = middleware(self.factory.post('/nowhere/'))
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(sample(f'saarthi_request_duration_seconds_count{count}'), before + 1)
+        self.assertGreaterEqual(sample(f'saarthi_request_upstream_seconds_sum{count}') - upstream_before, 0.01)
+        self.assertGreater(sample(f'saarthi_request_serializer_seconds_sum{count}'), 0)
+        self.assertIsNotNone(sample('saarthi_responses_total{view="unmatched",method="POST",status="201"}'))
+        self.assertIn(('test-upstream',), UPSTREAM_CALL_SECONDS._series)
+
+    @override_settings(METRICS_SERIALIZER_TIMING=False)
+    def test_serializers_are_not_patched_by_default(self):
+        is_valid = serializers.BaseSerializer.is_valid
+        count = '{view="unmatched",method="PUT"}'
+
+        RequestMetricsMiddleware(self.view)(self.factory.put('/nowhere/'))
+
+        self.assertIs(serializers.BaseSerializer.is_valid, is_valid)
+        self.assertEqual(sample(f'saarthi_request_serializer_seconds_sum{count}'), 0)
+
+    def test_slow_sampled_requests_are_dumped(self):
+        profile_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, profile_dir)
+        with override_settings(PROFILE_SLOW_REQUESTS=True, PROFILE_SAMPLE_RATE=1.0,
+                               PROFILE_SLOW_THRESHOLD_MS=0, PROFILE_DIR=profile_dir):
+            middleware = RequestMetricsMiddleware(self.view)
+        middleware(self.factory.get('/nowhere/'))
+        files = os.listdir(profile_dir)
+        self.assertEqual(len(files), 1)
+        self.assertRegex(files[0], r'-GET-unmatched-\d+ms\.prof$')
+
+    @override_settings(METRICS_TOKEN='secret')
+    def test_metrics_endpoint_token(self):
+        self.assertEqual(metrics_view(self.factory.get('/metrics')).status_code, 403)
+        response = metrics_view(self.factory.get('/metrics', HTTP_AUTHORIZATION='Bearer secret'))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        self.assertIn(b'# TYPE saarthi_request_duration_seconds histogram', response.content)
+        response = metrics_view(self.factory.get('/metrics', HTTP_AUTHORIZATION='Bearer wrong'))
+        self.assertEqual(response.status_code, 403)
+
+    @override_settings(METRICS_TOKEN='', DEBUG=False)
+    def test_metrics_endpoint_without_token_is_hidden(self):
+        with self.assertRaises(Http404):
+            metrics_view(self.factory.get('/metrics'))
+
+    @override_settings(METRICS_TOKEN='', DEBUG=True)
+    def test_metrics_endpoint_without_token_in_debug(self):
+        self.assertEqual(metrics_view(self.factory.get('/metrics')).status_code, 200)
@@ -19,7 +19,7 @@ django.setup()
 from accessibility.serializers import AccessibilityReportCreateSerializer
 from django.contrib.auth.models import User
 from django.test import RequestFactory
-from accessibility.storage import supabase_storage
+from accessibility.storage import photo_storage
 
 
 def create_test_image():
@@ -125,7 +125,7 @@ def test_supabase_status():
     """Test Supabase configuration status."""
     print("Checking Supabase configuration...")
     
-    if supabase_storage.is_configured():
+    if photo_storage.is_configured():
         print("✅ Supabase storage is configured")
     else:
         print("⚠️  Supabase storage is NOT configured")
@@ -17,7 +17,7 @@ sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'saarthi_backend.settings')
 django.setup()
 
-from accessibility.storage import supabase_storage
+from accessibility.storage import photo_storage
 from django.conf import settings
 
 
@@ -65,7 +65,7 @@ def test_supabase_configuration():
     print("✅ All required environment variables are set")
     
     # Test storage service initialization
-    if supabase_storage.is_configured():
+    if photo_storage.is_configured():
         print("✅ Supabase storage service is properly initialized")
         return True
     else:
@@ -77,7 +77,7 @@ def test_file_upload():
     """Test file upload to Supabase."""
     print("\nTesting file upload...")
     
-    if not supabase_storage.is_configured():
+    if not photo_storage.is_configured():
         print("❌ Cannot test upload: Supabase not configured")
         return False
     
@@ -87,7 +87,7 @@ def test_file_upload():
         print("✅ Test image created")
         
         # Upload file
-        file_url = supabase_storage.upload_file(test_file, "test/test_upload.jpg")
+        file_url = photo_storage.upload_file(test_file, "test/test_upload.jpg")
         
         if file_url:
             print(f"✅ File uploaded successfully: {file_url}")
@@ -105,20 +105,20 @@ def test_file_deletion():
     """Test file deletion from Supabase."""
     print("\nTesting file deletion...")
     
-    if not supabase_storage.is_configured():
+    if not photo_storage.is_configured():
         print("❌ Cannot test deletion: Supabase not configured")
         return False
     
     try:
         # First upload a file
         test_file = create_test_image()
-        file_url = supabase_storage.upload_file(test_file, "test/test_delete.jpg")
+        file_url = photo_storage.upload_file(test_file, "test/test_delete.jpg")
         
         if file_url:
             print("✅ File uploaded for deletion test")
             
             # Now delete it
-            deleted = supabase_storage.delete_file("test/test_delete.jpg")
+            deleted = photo_storage.delete_file("test/test_delete.jpg")
             
             if deleted:
                 print("✅ File deleted successfully")
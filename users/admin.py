@@ -1,6 +1,6 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
-from .models import User
+from .models import User, VolunteerPresence, VolunteerScore
 
 @admin.register(User)
 class UserAdmin(BaseUserAdmin):
@@ -12,7 +12,7 @@ class UserAdmin(BaseUserAdmin):
             'fields': (
                 'user_type', 'phone_number', 'disability_type',
                 'needs_wheelchair_access', 'needs_tactile_paths',
-                'needs_audio_guidance', 'profile_picture'
+                'needs_audio_guidance', 'city', 'profile_picture'
             )
         }),
         ('Volunteer Info', {
@@ -27,4 +27,20 @@ class UserAdmin(BaseUserAdmin):
         ('Saarthi Info', {
             'fields': ('user_type', 'phone_number', 'disability_type')
         }),
-    )
\ No newline at end of file
+    )
+
+@admin.register(VolunteerPresence)
+class VolunteerPresenceAdmin(admin.ModelAdmin):
+    list_display = ['user', 'is_active', 'latitude', 'longitude', 'volunteer_rating', 'last_seen', 'updated_at']
+    list_filter = ['is_active']
+    search_fields = ['user__username']
+    readonly_fields = ['user', 'is_active', 'latitude', 'longitude', 'volunteer_rating', 'last_seen', 'updated_at']
+
+
+@admin.register(VolunteerScore)
+class VolunteerScoreAdmin(admin.ModelAdmin):
+    list_display = ['username', 'city', 'points', 'rating', 'updated_at']
+    list_filter = ['city']
+    search_fields = ['username']
+    ordering = ['-points', '-rating', 'user']
+    readonly_fields = ['user', 'username', 'city', 'points', 'rating', 'updated_at']
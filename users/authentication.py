@@ -0,0 +1,147 @@
+"""
+JWT authentication without a database query per request.
+
+simplejwt's JWTAuthentication loads the user row for every authenticated
+request. CachedJWTAuthentication keeps recently seen rows in a short-TTL
+per-process cache instead, and builds a fresh User instance from the cached
+values for each request, so views can modify and save it as usual.
+
+With AUTH_TOKEN_USER on, a cache miss does not query either: request.user
+is a ClaimsUser built from the identity claims that
+ClaimsTokenObtainPairSerializer signs into the token. Other fields load
+(through the cache) the first time a view touches one. Claims can lag
+profile edits made in other processes until the token is reissued.
+Claims can't tell whether the user has since been deactivated or changed
+their password, so they are only used when simplejwt's
+CHECK_USER_IS_ACTIVE and CHECK_REVOKE_TOKEN are both off; otherwise every
+cache miss loads the row and runs those checks.
+
+Writes to a user row (profile updates, admin edits) invalidate the cached
+row through the signals in users/signals.py; queryset updates that skip
+those signals (volunteer availability in users/presence.py) invalidate it
+directly.
+"""
+import threading
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import DEFAULT_DB_ALIAS
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+from saarthi_backend.cache import LRUCache
+
+from .models import ClaimsUser
+
+User = get_user_model()
+
+# Claims signed into access tokens for AUTH_TOKEN_USER mode
+TOKEN_USER_CLAIMS = ('username', 'user_type', 'disability_type')
+
+
+class UserRowCache:
+    """
+    Per-process cache of user rows as {attname: value} dicts.
+
+    Keys are str(user_id), matching how simplejwt stores the ID claim.
+    """
+
+    def __init__(self, maxsize=None, ttl=None):
+        self.cache = LRUCache(
+            maxsize=maxsize or getattr(settings, 'AUTH_USER_CACHE_SIZE', 10000),
+            ttl=ttl if ttl is not None else getattr(settings, 'AUTH_USER_CACHE_TTL', 60),
+        )
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def get(self, user_id):
+        return self.cache.get(str(user_id))
+
+    def set(self, user_id, row):
+        self.cache.set(str(user_id), row)
+
+    def load(self, user_id):
+        """Fetch a row from the database and cache it. None if there is no such user."""
+        generation = self._generation
+        fields = [field.attname for field in User._meta.concrete_fields]
+        row = User.objects.filter(pk=user_id).values(*fields).first()
+        if row is not None:
+            with self._lock:
+                # Don't cache a row read before a concurrent invalidation
+                if generation == self._generation:
+                    self.cache.set(str(user_id), row)
+        return row
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._generation += 1
+            self.cache.delete(str(user_id))
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self.cache.clear()
+
+    def stats(self):
+        return self.cache.stats()
+
+
+def user_from_row(row, model=User):
+    """
+    Build a model instance from a (possibly partial) row.
+
+    Fields missing from row are deferred, as with QuerySet.only().
+    """
+    fields = [field.attname for field in model._meta.concrete_fields if field.attname in row]
+    return model.from_db(DEFAULT_DB_ALIAS, fields, [row[name] for name in fields])
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication that serves users from user_rows when it can.
+    """
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+
+        row = user_rows.get(user_id)
+        if row is None and self.use_claims(validated_token):
+            return ClaimsUser.from_claims(validated_token)
+
+        if row is None:
+            row = user_rows.load(user_id)
+        if row is None:
+            raise AuthenticationFailed(_("User not found"), code="user_not_found")
+
+        user = user_from_row(row)
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+
+        if api_settings.CHECK_REVOKE_TOKEN:
+            if validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != get_md5_hash_password(user.password):
+                raise AuthenticationFailed(
+                    _("The user's password has been changed."), code="password_changed"
+                )
+
+        return user
+
+    @staticmethod
+    def use_claims(validated_token):
+        # The active and revocation checks need the current row: a user can
+        # be deactivated or change their password after the token is issued
+        return (
+            getattr(settings, 'AUTH_TOKEN_USER', False)
+            and not api_settings.CHECK_USER_IS_ACTIVE
+            and not api_settings.CHECK_REVOKE_TOKEN
+            and all(claim in validated_token for claim in TOKEN_USER_CLAIMS)
+        )
+
+
+# Global instance
+user_rows = UserRowCache()
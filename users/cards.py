@@ -0,0 +1,95 @@
+"""
+Serialized user payloads with conditional GET support.
+
+Profiles change rarely but the app fetches its own on every launch and
+screen change, and report screens look up the same reporters over and
+over. Responses carry an ETag and Last-Modified derived from the user's
+updated_at, so clients revalidating an unchanged profile get a bodyless
+304 without anything being serialized.
+
+Full responses come from a per-process cache of serialized payloads keyed
+by (user ID, updated_at): a save produces a new key, so an outdated
+payload is never served, and old entries age out of the LRU. Rows come
+from the authentication row cache (users/authentication.py), so another
+process's edit can take up to AUTH_USER_CACHE_TTL seconds to show up.
+
+Cached payloads are serialized without the request, so file fields hold
+site-relative URLs; each response makes them absolute for its own scheme
+and host, as DRF would.
+
+Writes that bypass save() must set updated_at themselves, as
+users/presence.py does.
+"""
+from django.conf import settings
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+from rest_framework.response import Response
+
+from saarthi_backend.cache import LRUCache
+
+# Bump when UserSerializer's output changes, so clients drop cached bodies
+CARD_VERSION = 1
+
+# UserSerializer fields rendered as URLs relative to the requested host
+FILE_FIELDS = ('profile_picture',)
+
+
+def user_validators(user):
+    """(etag, last_modified timestamp) for a user's payload."""
+    stamp = user.updated_at.timestamp()
+    etag = quote_etag(f"u{CARD_VERSION}-{user.pk}-{int(stamp * 1_000_000)}")
+    return etag, int(stamp)
+
+
+class UserCardCache:
+    """
+    Per-process cache of UserSerializer payloads keyed by (user ID, updated_at).
+    """
+
+    def __init__(self, maxsize=None):
+        self.cache = LRUCache(maxsize=maxsize or getattr(settings, 'USER_CARD_CACHE_SIZE', 10000))
+
+    def get(self, user, context=None):
+        from .serializers import UserSerializer
+
+        context = dict(context or {})
+        request = context.pop('request', None)
+        key = (user.pk, user.updated_at)
+        data = self.cache.get(key)
+        if data is None:
+            # A plain dict; ReturnDict would keep the serializer alive
+            data = dict(UserSerializer(user, context=context).data)
+            self.cache.set(key, data)
+        if request is None:
+            return data
+
+        data = dict(data)
+        for name in FILE_FIELDS:
+            if data.get(name):
+                data[name] = request.build_absolute_uri(data[name])
+        return data
+
+    def clear(self):
+        self.cache.clear()
+
+    def stats(self):
+        return self.cache.stats()
+
+
+def conditional_user_response(request, user, context=None):
+    """
+    Response with a user's payload, or a 304 if the client's copy is current.
+    """
+    etag, last_modified = user_validators(user)
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        response = Response(user_cards.get(user, context))
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    # Profiles are per user; clients may keep them but must revalidate
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+# Global instance
+user_cards = UserCardCache()
@@ -0,0 +1,165 @@
+"""
+Host-wide limit on concurrent password hashing.
+
+PBKDF2 is deliberately slow: each login or registration burns a few
+hundred milliseconds of CPU. Unbounded, a burst of sign-ups takes every
+core on the host and starves cheap requests such as map reads.
+
+ThrottledPBKDF2PasswordHasher only hashes while holding one of
+PASSWORD_HASH_SLOTS slots, which are flock()ed files in
+PASSWORD_HASH_LOCK_DIR shared by every worker process on the host. That
+caps the cores credential checks can use per host, however many workers
+the server runs. A request that cannot get a slot within PASSWORD_HASH_WAIT
+seconds fails with PasswordHashingBusy, which users/middleware.py answers
+with a 503 and Retry-After for every view, the admin login included.
+hashing_slots.stats() reports this process's share, including how many
+callers are waiting for a slot; /metrics exports it.
+
+The hash itself runs inline in the request thread. Under sync workers
+that worker is still busy while it waits and hashes; the limit protects
+the host's CPU, not worker capacity. Size PASSWORD_HASH_SLOTS per host,
+below the core count. Without fcntl (Windows) the limit is per process.
+
+The hasher keeps the pbkdf2_sha256 algorithm name, so stored hashes verify
+unchanged either way. Set PASSWORD_HASH_SLOTS = 0 to hash without a limit.
+"""
+import logging
+import os
+import random
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows; slots are per process
+    fcntl = None
+
+from django.conf import settings
+from django.contrib.auth.hashers import PBKDF2PasswordHasher
+
+logger = logging.getLogger(__name__)
+
+
+class PasswordHashingBusy(Exception):
+    """Every hashing slot stayed taken for the whole wait."""
+
+
+class HashingSlots:
+    """
+    Counting semaphore over lock files, shared by the processes of a host.
+    """
+
+    def __init__(self, slots=None, wait=None, lock_dir=None):
+        self.slots = slots if slots is not None else getattr(settings, 'PASSWORD_HASH_SLOTS', 2)
+        self.wait = wait if wait is not None else getattr(settings, 'PASSWORD_HASH_WAIT', 2)
+        self.lock_dir = lock_dir or getattr(
+            settings, 'PASSWORD_HASH_LOCK_DIR',
+            os.path.join(tempfile.gettempdir(), 'saarthi-password-hashing'),
+        )
+        self._lock = threading.Lock()
+        self._local = threading.BoundedSemaphore(max(1, self.slots)) if fcntl is None else None
+        self.waiting = 0
+        self.in_progress = 0
+        self.completed = 0
+        self.rejected = 0
+        self._wait_seconds = 0.0
+        self._busy_seconds = 0.0
+
+    @contextmanager
+    def slot(self):
+        """
+        Hold one hashing slot for the duration of the block.
+
+        Raises:
+            PasswordHashingBusy: no slot came free within self.wait seconds
+        """
+        if not self.slots:
+            yield
+            return
+
+        started = time.monotonic()
+        with self._lock:
+            self.waiting += 1
+        try:
+            fh = self._acquire(started + self.wait)
+        finally:
+            with self._lock:
+                self.waiting -= 1
+        acquired = time.monotonic()
+        with self._lock:
+            self.in_progress += 1
+            self._wait_seconds += acquired - started
+        try:
+            yield
+        finally:
+            if fh is not None:
+                fh.close()  # Closing releases the flock
+            else:
+                self._local.release()
+            with self._lock:
+                self.in_progress -= 1
+                self.completed += 1
+                self._busy_seconds += time.monotonic() - acquired
+
+    def _acquire(self, deadline):
+        if fcntl is None:
+            if self._local.acquire(timeout=max(0.0, deadline - time.monotonic())):
+                return None
+            self._reject()
+
+        os.makedirs(self.lock_dir, exist_ok=True)
+        delay = 0.005
+        while True:
+            # Start at a random slot so waiters don't all contend for slot 0
+            first = random.randrange(self.slots)
+            for i in range(self.slots):
+                fh = open(os.path.join(self.lock_dir, f"slot-{(first + i) % self.slots}.lock"), 'a')
+                try:
+                    fcntl.flock(fh.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    return fh
+                except BlockingIOError:
+                    fh.close()
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                self._reject()
+            time.sleep(min(delay, remaining))
+            delay = min(delay * 2, 0.05)
+
+    def _reject(self):
+        with self._lock:
+            self.rejected += 1
+        logger.warning(f"All {self.slots} password hashing slots busy for {self.wait}s, rejecting")
+        raise PasswordHashingBusy("All password hashing slots are busy")
+
+    def stats(self):
+        """Counters for this process; the slots are shared host-wide."""
+        with self._lock:
+            return {
+                'slots': self.slots,
+                'waiting': self.waiting,
+                'in_progress': self.in_progress,
+                'completed': self.completed,
+                'rejected': self.rejected,
+                'mean_wait_ms': round(self._wait_seconds / self.completed * 1000, 1) if self.completed else 0.0,
+                'mean_ms': round(self._busy_seconds / self.completed * 1000, 1) if self.completed else 0.0,
+            }
+
+
+class ThrottledPBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    """
+    PBKDF2PasswordHasher that only derives keys while holding a hashing slot.
+
+    Verification, salting upgrades and the timing-hardening dummy hashes
+    all go through encode(), so every PBKDF2 call is counted.
+    """
+
+    def encode(self, password, salt, iterations=None):
+        with hashing_slots.slot():
+            return super().encode(password, salt, iterations)
+
+
+# Global instance
+hashing_slots = HashingSlots()
@@ -0,0 +1,373 @@
+"""
+Volunteer leaderboard, overall and per city.
+
+Volunteers rank by points, then rating, then user ID (earlier sign-ups
+first), so every volunteer has a distinct rank. VolunteerScore holds the
+ranking fields of each volunteer and is rewritten by users/signals.py
+whenever a save touches them.
+
+Every process keeps the rankings in memory as indexable skip lists, so
+updates, "my rank" and seeking to a page are O(log n). They pull rows changed
+since the last sync at most every LEADERBOARD_SYNC_INTERVAL seconds, and
+are reloaded in full every LEADERBOARD_RELOAD_INTERVAL seconds to drop
+volunteers removed by other processes.
+
+If VolunteerScore drifts from the users table (bulk updates, manual SQL):
+
+    python manage.py rebuild_leaderboard
+"""
+import random
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+# Fields of the users row the leaderboard depends on
+RANKED_FIELDS = frozenset({
+    'username', 'user_type', 'is_active', 'volunteer_points', 'volunteer_rating', 'city',
+})
+
+
+def city_key(city):
+    """Normalised city name, ignoring case and spacing differences."""
+    return ' '.join((city or '').split()).casefold()
+
+
+class _Node:
+    __slots__ = ('key', 'next', 'width')
+
+    def __init__(self, key, height):
+        self.key = key
+        self.next = [None] * height
+        # Ranks skipped by each forward link, counting the node it lands on
+        self.width = [1] * height
+
+
+class Ranking:
+    """
+    Volunteers in rank order.
+
+    Entries are (-points, -rating, user_id) keys in an indexable skip list:
+    each forward link also records how many ranks it skips, so updates,
+    rank lookups and seeking to a page offset all take O(log n) steps.
+    """
+
+    MAX_HEIGHT = 32
+
+    def __init__(self):
+        self._head = _Node(None, self.MAX_HEIGHT)
+        self._height = 1  # Levels in use
+        self._size = 0
+        self._key_by_user = {}
+
+    def __len__(self):
+        return self._size
+
+    def put(self, user_id, points, rating):
+        key = (-points, -rating, user_id)
+        old = self._key_by_user.get(user_id)
+        if old == key:
+            return
+        if old is not None:
+            self._delete(old)
+        self._insert(key)
+        self._key_by_user[user_id] = key
+
+    def remove(self, user_id):
+        old = self._key_by_user.pop(user_id, None)
+        if old is not None:
+            self._delete(old)
+
+    def rank(self, user_id):
+        """1-based rank, or None if not ranked."""
+        key = self._key_by_user.get(user_id)
+        if key is None:
+            return None
+        node, position = self._head, 0
+        for level in reversed(range(self._height)):
+            while node.next[level] is not None and node.next[level].key <= key:
+                position += node.width[level]
+                node = node.next[level]
+        return position
+
+    def top(self, n, offset=0):
+        """[(rank, user_id, points, rating)] for ranks offset+1 to offset+n"""
+        node, position = self._head, 0
+        for level in reversed(range(self._height)):
+            while node.next[level] is not None and position + node.width[level] <= offset:
+                position += node.width[level]
+                node = node.next[level]
+
+        rows = []
+        node = node.next[0]
+        while node is not None and len(rows) < n:
+            points, rating, user_id = node.key
+            rows.append((offset + len(rows) + 1, user_id, -points, -rating))
+            node = node.next[0]
+        return rows
+
+    def _insert(self, key):
+        # Geometric height: each extra level with probability 1/2
+        bits = random.getrandbits(self.MAX_HEIGHT - 1)
+        height = min((bits & -bits).bit_length() or self.MAX_HEIGHT, self.MAX_HEIGHT)
+        head = self._head
+        if height > self._height:
+            # Newly used head links span the whole list
+            for level in range(self._height, height):
+                head.next[level] = None
+                head.width[level] = self._size + 1
+            self._height = height
+
+        path = [None] * self._height
+        skipped = [0] * self._height
+        node = head
+        for level in reversed(range(self._height)):
+            while node.next[level] is not None and node.next[level].key < key:
+                skipped[level] += node.width[level]
+                node = node.next[level]
+            path[level] = node
+
+        new = _Node(key, height)
+        distance = 0  # From path[level] to the new node's predecessor
+        for level in range(height):
+            before = path[level]
+            new.next[level] = before.next[level]
+            new.width[level] = before.width[level] - distance
+            before.next[level] = new
+            before.width[level] = distance + 1
+            distance += skipped[level]
+        for level in range(height, self._height):
+            path[level].width[level] += 1
+        self._size += 1
+
+    def _delete(self, key):
+        path = [None] * self._height
+        node = self._head
+        for level in reversed(range(self._height)):
+            while node.next[level] is not None and node.next[level].key < key:
+                node = node.next[level]
+            path[level] = node
+
+        target = path[0].next[0]
+        for level in range(self._height):
+            before = path[level]
+            if level < len(target.next):
+                before.width[level] += target.width[level] - 1
+                before.next[level] = target.next[level]
+            else:
+                before.width[level] -= 1
+        self._size -= 1
+
+
+class Leaderboard:
+    """
+    Overall and per-city rankings of this process, synced from VolunteerScore.
+
+    With autosync off, reads never query VolunteerScore; only sync(force=True)
+    and rebuild() do (used by benchmarks and tests).
+    """
+
+    def __init__(self, sync_interval=None, reload_interval=None, autosync=True):
+        self.sync_interval = sync_interval if sync_interval is not None else getattr(
+            settings, 'LEADERBOARD_SYNC_INTERVAL', 5
+        )
+        self.reload_interval = reload_interval if reload_interval is not None else getattr(
+            settings, 'LEADERBOARD_RELOAD_INTERVAL', 300
+        )
+        self._entries = {}  # user_id -> (username, city, points, rating)
+        self._overall = Ranking()
+        self._cities = {}
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        self._synced_at = 0.0
+        self._loaded_at = 0.0
+        self._watermark = None
+        self.autosync = autosync
+
+    def __len__(self):
+        return len(self._entries)
+
+    def put(self, user_id, username, city, points, rating):
+        with self._lock:
+            self._put(user_id, username, city, points, float(rating))
+
+    def remove(self, user_id):
+        with self._lock:
+            self._remove(user_id)
+
+    def _put(self, user_id, username, city, points, rating):
+        old = self._entries.get(user_id)
+        if old is not None and old[1] != city:
+            self._remove_from_city(user_id, old[1])
+        self._entries[user_id] = (username, city, points, rating)
+        self._overall.put(user_id, points, rating)
+        if city:
+            self._cities.setdefault(city, Ranking()).put(user_id, points, rating)
+
+    def _remove(self, user_id):
+        old = self._entries.pop(user_id, None)
+        if old is not None:
+            self._overall.remove(user_id)
+            self._remove_from_city(user_id, old[1])
+
+    def _remove_from_city(self, user_id, city):
+        ranking = self._cities.get(city)
+        if ranking is not None:
+            ranking.remove(user_id)
+            if not ranking:
+                del self._cities[city]
+
+    def _ranking(self, city):
+        if not city:
+            return self._overall
+        return self._cities.get(city_key(city)) or Ranking()
+
+    def top(self, n=10, city=None, offset=0):
+        """
+        A page of the leaderboard, overall or for one city.
+
+        Returns:
+            (count, [(rank, user_id, username, points, rating)])
+        """
+        self.sync()
+        with self._lock:
+            ranking = self._ranking(city)
+            rows = [
+                (rank, user_id, self._entries[user_id][0], points, rating)
+                for rank, user_id, points, rating in ranking.top(n, offset)
+            ]
+            return len(ranking), rows
+
+    def standing(self, user_id):
+        """A volunteer's ranks overall and in their city, or None if unranked."""
+        self.sync()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return None
+            _, city, points, rating = entry
+            standing = {
+                'points': points,
+                'rating': rating,
+                'rank': self._overall.rank(user_id),
+                'count': len(self._overall),
+                'city': city or None,
+                'city_rank': None,
+                'city_count': None,
+            }
+            if city:
+                ranking = self._cities[city]
+                standing.update(city_rank=ranking.rank(user_id), city_count=len(ranking))
+            return standing
+
+    def record(self, user):
+        """Write a user's standing after a save that may have changed it."""
+        from .models import VolunteerScore
+
+        if user.user_type != 'volunteer' or not user.is_active:
+            VolunteerScore.objects.filter(pk=user.pk).delete()
+            self.remove(user.pk)
+            return
+
+        city = city_key(user.city)
+        VolunteerScore.objects.update_or_create(
+            user_id=user.pk,
+            defaults={
+                'username': user.username,
+                'city': city,
+                'points': user.volunteer_points,
+                'rating': user.volunteer_rating,
+                'updated_at': timezone.now(),
+            },
+        )
+        self.put(user.pk, user.username, city, user.volunteer_points, user.volunteer_rating)
+
+    def sync(self, force=False):
+        """Pull standings changed since the last sync, or reload them all when due."""
+        from .models import VolunteerScore
+
+        if not force and (not self.autosync or time.monotonic() - self._synced_at < self.sync_interval):
+            return
+        # One thread refreshes; the others answer from the current rankings
+        if not self._sync_lock.acquire(blocking=force):
+            return
+        try:
+            now = timezone.now()
+            reload = self._watermark is None or time.monotonic() - self._loaded_at >= self.reload_interval
+            rows = VolunteerScore.objects.all()
+            if not reload:
+                # Overlap a little: rows can commit slightly out of order
+                rows = rows.filter(updated_at__gte=self._watermark - timedelta(seconds=self.sync_interval + 5))
+            rows = rows.values_list('user_id', 'username', 'city', 'points', 'rating')
+
+            if reload:
+                fresh = Leaderboard()
+                for user_id, username, city, points, rating in rows.iterator():
+                    fresh._put(user_id, username, city, points, float(rating))
+                with self._lock:
+                    self._entries, self._overall, self._cities = fresh._entries, fresh._overall, fresh._cities
+                self._loaded_at = time.monotonic()
+            else:
+                for row in rows.iterator():
+                    self.put(*row)
+
+            self._watermark = now
+            self._synced_at = time.monotonic()
+        finally:
+            self._sync_lock.release()
+
+    def rebuild(self):
+        """
+        Rewrite VolunteerScore from the users table and reload this process.
+
+        Only rows that differ are written, so other processes pick the
+        repairs up with their next incremental sync.
+
+        Returns:
+            (written, removed) row counts
+        """
+        from .models import User, VolunteerScore
+
+        now = timezone.now()
+        current = {
+            user_id: values
+            for user_id, *values in VolunteerScore.objects.values_list(
+                'user_id', 'username', 'city', 'points', 'rating'
+            ).iterator()
+        }
+        volunteers = User.objects.filter(user_type='volunteer', is_active=True).values_list(
+            'id', 'username', 'city', 'volunteer_points', 'volunteer_rating'
+        )
+
+        changed = []
+        seen = set()
+        for user_id, username, city, points, rating in volunteers.iterator():
+            seen.add(user_id)
+            values = [username, city_key(city), points, rating]
+            if current.get(user_id) != values:
+                changed.append(VolunteerScore(
+                    user_id=user_id, username=values[0], city=values[1],
+                    points=points, rating=rating, updated_at=now,
+                ))
+        removed = [user_id for user_id in current if user_id not in seen]
+
+        with transaction.atomic():
+            VolunteerScore.objects.bulk_create(
+                changed,
+                batch_size=1000,
+                update_conflicts=True,
+                unique_fields=['user'],
+                update_fields=['username', 'city', 'points', 'rating', 'updated_at'],
+            )
+            VolunteerScore.objects.filter(user_id__in=removed).delete()
+
+        self._watermark = None
+        self.sync(force=True)
+        return len(changed), len(removed)
+
+
+# Global instance
+leaderboard = Leaderboard()
@@ -0,0 +1,22 @@
+"""
+Mark volunteers who stopped sending heartbeats inactive.
+
+    python manage.py expire_volunteer_presence [--ttl SECONDS]
+"""
+from django.core.management.base import BaseCommand
+
+from users.presence import volunteer_presence
+
+
+class Command(BaseCommand):
+    help = "Mark volunteers without a recent heartbeat inactive"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--ttl', type=int, default=None,
+            help="Seconds without a heartbeat (default VOLUNTEER_PRESENCE_TTL)",
+        )
+
+    def handle(self, *args, **options):
+        expired = volunteer_presence.expire(options['ttl'])
+        self.stdout.write(self.style.SUCCESS(f"Marked {expired} volunteers inactive"))
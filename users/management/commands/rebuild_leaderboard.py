@@ -0,0 +1,18 @@
+"""
+Repair the volunteer leaderboard from the users table.
+
+    python manage.py rebuild_leaderboard
+"""
+from django.core.management.base import BaseCommand
+
+from users.leaderboard import leaderboard
+
+
+class Command(BaseCommand):
+    help = "Recompute volunteer leaderboard standings from the users table"
+
+    def handle(self, *args, **options):
+        written, removed = leaderboard.rebuild()
+        self.stdout.write(self.style.SUCCESS(
+            f"Rewrote {written} standings, removed {removed}; {len(leaderboard)} volunteers ranked"
+        ))
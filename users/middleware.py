@@ -0,0 +1,29 @@
+"""
+Turns PasswordHashingBusy into a 503 wherever a password is hashed.
+
+Logins, registrations, password changes and the admin login all hash
+through users/hashing.py, so the limit is handled here once instead of in
+each view. DRF re-raises exceptions its handler does not know, so API
+views end up here too.
+"""
+from django.conf import settings
+from django.http import JsonResponse
+
+from .hashing import PasswordHashingBusy
+
+
+class PasswordHashingBusyMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        return self.get_response(request)
+
+    def process_exception(self, request, exception):
+        if not isinstance(exception, PasswordHashingBusy):
+            return None
+        response = JsonResponse(
+            {'error': 'Too many sign-ins right now, please try again shortly'}, status=503
+        )
+        response['Retry-After'] = str(getattr(settings, 'PASSWORD_HASH_RETRY_AFTER', 2))
+        return response
@@ -0,0 +1,25 @@
+# Generated by Django 4.2.7 on 2026-10-19 05:57
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0002_claims_user'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VolunteerPresence',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='presence', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('latitude', models.DecimalField(decimal_places=6, max_digits=9)),
+                ('longitude', models.DecimalField(decimal_places=6, max_digits=9)),
+                ('volunteer_rating', models.DecimalField(decimal_places=2, default=0.0, max_digits=3)),
+                ('last_seen', models.DateTimeField(db_index=True)),
+            ],
+        ),
+    ]
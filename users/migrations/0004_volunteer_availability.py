@@ -0,0 +1,51 @@
+# Generated by Django 4.2.7 on 2026-10-19 05:59
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+def copy_active_flags(apps, schema_editor):
+    """Existing heartbeat rows take their availability from the users table."""
+    VolunteerPresence = apps.get_model('users', 'VolunteerPresence')
+    VolunteerPresence.objects.filter(user__is_volunteer_active=True).update(is_active=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0003_volunteer_presence'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='volunteerpresence',
+            name='is_active',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='volunteerpresence',
+            name='updated_at',
+            field=models.DateTimeField(db_index=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.AlterField(
+            model_name='volunteerpresence',
+            name='last_seen',
+            field=models.DateTimeField(),
+        ),
+        migrations.AlterField(
+            model_name='volunteerpresence',
+            name='latitude',
+            field=models.DecimalField(blank=True, decimal_places=6, max_digits=9, null=True),
+        ),
+        migrations.AlterField(
+            model_name='volunteerpresence',
+            name='longitude',
+            field=models.DecimalField(blank=True, decimal_places=6, max_digits=9, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='volunteerpresence',
+            index=models.Index(fields=['is_active', 'last_seen'], name='users_volun_is_acti_f7a7c5_idx'),
+        ),
+        migrations.RunPython(copy_active_flags, migrations.RunPython.noop),
+    ]
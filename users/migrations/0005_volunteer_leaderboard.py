@@ -0,0 +1,50 @@
+# Generated by Django 4.2.7 on 2026-10-19 06:03
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+from django.utils import timezone
+
+
+def create_scores(apps, schema_editor):
+    """Existing volunteers start out ranked; cities are not known yet."""
+    User = apps.get_model('users', 'User')
+    VolunteerScore = apps.get_model('users', 'VolunteerScore')
+    now = timezone.now()
+    volunteers = User.objects.filter(user_type='volunteer', is_active=True).values_list(
+        'id', 'username', 'volunteer_points', 'volunteer_rating'
+    )
+    VolunteerScore.objects.bulk_create(
+        (
+            VolunteerScore(user_id=user_id, username=username, points=points, rating=rating, updated_at=now)
+            for user_id, username, points, rating in volunteers.iterator()
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0004_volunteer_availability'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VolunteerScore',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='score', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('username', models.CharField(max_length=150)),
+                ('city', models.CharField(blank=True, default='', max_length=100)),
+                ('points', models.IntegerField(default=0)),
+                ('rating', models.DecimalField(decimal_places=2, default=0.0, max_digits=3)),
+                ('updated_at', models.DateTimeField(db_index=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='city',
+            field=models.CharField(blank=True, default='', max_length=100),
+        ),
+        migrations.RunPython(create_scores, migrations.RunPython.noop),
+    ]
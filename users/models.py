@@ -48,6 +48,8 @@ class User(AbstractUser):
         default=0.0
     )
     volunteer_points = models.IntegerField(default=0)
+    # Free text; volunteers are also ranked within their city
+    city = models.CharField(max_length=100, blank=True, default='')
     
     # QR Code for volunteer verification
     volunteer_qr_code = models.CharField(
@@ -72,4 +74,98 @@ class User(AbstractUser):
     class Meta:
         db_table = 'users'
         verbose_name = 'User'
-        verbose_name_plural = 'Users'
\ No newline at end of file
+        verbose_name_plural = 'Users'
+
+
+class ClaimsUser(User):
+    """
+    User built from access-token claims instead of a database row.
+    
+    Only the fields carried in the token are loaded. Touching any other
+    field loads the rest of the row in one go, from the per-process user
+    cache when it has it (see users/authentication.py).
+    """
+    
+    class Meta:
+        proxy = True
+    
+    @classmethod
+    def from_claims(cls, token):
+        from rest_framework_simplejwt.settings import api_settings
+        from .authentication import TOKEN_USER_CLAIMS, user_from_row
+        
+        row = {claim: token[claim] for claim in TOKEN_USER_CLAIMS}
+        row[cls._meta.pk.attname] = cls._meta.pk.to_python(token[api_settings.USER_ID_CLAIM])
+        return user_from_row(row, cls)
+    
+    def refresh_from_db(self, using=None, fields=None):
+        deferred = self.get_deferred_fields()
+        if fields is None or not set(fields) <= deferred:
+            return super().refresh_from_db(using=using, fields=fields)
+        
+        from .authentication import user_rows
+        row = user_rows.get(self.pk) or user_rows.load(self.pk)
+        if row is None:
+            raise User.DoesNotExist(f"User {self.pk} no longer exists")
+        for attname in deferred:
+            setattr(self, attname, row[attname])
+
+
+class VolunteerPresence(models.Model):
+    """
+    Availability and last location heartbeat of a volunteer.
+    
+    Toggles and heartbeats write this narrow row rather than the users row.
+    Each process keeps an in-memory spatial index of active volunteers
+    built from it (see users/presence.py).
+    """
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='presence'
+    )
+    is_active = models.BooleanField(default=False)
+    # Unknown until the first heartbeat after going active
+    latitude = models.DecimalField(max_digits=9, decimal_places=6, null=True, blank=True)
+    longitude = models.DecimalField(max_digits=9, decimal_places=6, null=True, blank=True)
+    # Copied from the user at heartbeat time so nearby searches need no join
+    volunteer_rating = models.DecimalField(max_digits=3, decimal_places=2, default=0.0)
+    last_seen = models.DateTimeField()
+    # Set on every write; processes sync their index from it
+    updated_at = models.DateTimeField(db_index=True)
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['is_active', 'last_seen']),
+        ]
+    
+    def __str__(self):
+        state = 'active' if self.is_active else 'inactive'
+        return f"{self.user_id} ({state}) @ {self.latitude}, {self.longitude}"
+
+
+class VolunteerScore(models.Model):
+    """
+    Leaderboard standing of a volunteer.
+    
+    A narrow copy of the ranking fields of the users row, written whenever
+    those change. Each process ranks volunteers in memory from this table
+    (see users/leaderboard.py).
+    """
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='score'
+    )
+    username = models.CharField(max_length=150)
+    # Normalised with leaderboard.city_key(); empty when unknown
+    city = models.CharField(max_length=100, blank=True, default='')
+    points = models.IntegerField(default=0)
+    rating = models.DecimalField(max_digits=3, decimal_places=2, default=0.0)
+    # Set on every write; processes sync their rankings from it
+    updated_at = models.DateTimeField(db_index=True)
+    
+    def __str__(self):
+        return f"{self.username}: {self.points} points"
@@ -0,0 +1,331 @@
+"""
+Volunteer availability and live locations.
+
+Availability lives in the narrow VolunteerPresence table rather than the
+users row: going active or inactive is a locked single-row update, and
+location heartbeats are accepted only while active. users.is_volunteer_active
+is kept as a one-column mirror for profile responses.
+
+Every process keeps a PresenceIndex of active volunteers with a known
+location, bucketed into grid cells (accessibility/grid.py), so nearest and
+in-area searches only visit nearby cells. The index pulls rows changed
+since its last sync at most every VOLUNTEER_PRESENCE_SYNC_INTERVAL seconds,
+so writes handled by other workers show up within that delay.
+
+Volunteers drop out of searches VOLUNTEER_PRESENCE_TTL seconds after their
+last heartbeat; `python manage.py expire_volunteer_presence` then marks
+them inactive in the database.
+"""
+import heapq
+import threading
+import time
+from datetime import timedelta
+from math import asin, cos, radians, sin, sqrt
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from accessibility.grid import cell_index
+
+KM_PER_DEG_LAT = 111.32
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    lat1, lon1, lat2, lon2 = map(radians, [lat1, lon1, lat2, lon2])
+    a = sin((lat2 - lat1) / 2) ** 2 + cos(lat1) * cos(lat2) * sin((lon2 - lon1) / 2) ** 2
+    return 6371 * 2 * asin(sqrt(a))
+
+
+class PresenceIndex:
+    """
+    Thread-safe in-memory grid index of volunteer positions with expiry.
+
+    Entries are (lat, lon, rating, seen_at) per user ID, where seen_at is a
+    time.time() timestamp.
+    """
+
+    def __init__(self, ttl=None, cell_size=None, rating_weight=None):
+        self.ttl = ttl if ttl is not None else getattr(settings, 'VOLUNTEER_PRESENCE_TTL', 120)
+        self.cell_size = cell_size or getattr(settings, 'VOLUNTEER_PRESENCE_CELL_DEG', 0.01)
+        self.rating_weight = rating_weight if rating_weight is not None else getattr(
+            settings, 'VOLUNTEER_RATING_WEIGHT', 0.2
+        )
+        self._entries = {}
+        self._cells = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def put(self, user_id, lat, lon, rating=0.0, seen_at=None):
+        lat, lon = float(lat), float(lon)
+        seen_at = seen_at or time.time()
+        cell = cell_index(lat, lon, self.cell_size)
+        with self._lock:
+            old = self._entries.get(user_id)
+            if old is not None:
+                if old[3] > seen_at:
+                    return  # Older than what we have
+                self._discard(user_id, old)
+            self._entries[user_id] = (lat, lon, float(rating), seen_at)
+            self._cells.setdefault(cell, set()).add(user_id)
+
+    def remove(self, user_id):
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None:
+                self._discard(user_id, entry)
+
+    def _discard(self, user_id, entry):
+        del self._entries[user_id]
+        cell = cell_index(entry[0], entry[1], self.cell_size)
+        members = self._cells.get(cell)
+        if members is not None:
+            members.discard(user_id)
+            if not members:
+                del self._cells[cell]
+
+    def expire(self, now=None):
+        """Drop entries older than ttl. Returns how many were dropped."""
+        cutoff = (now or time.time()) - self.ttl
+        with self._lock:
+            stale = [(uid, entry) for uid, entry in self._entries.items() if entry[3] < cutoff]
+            for user_id, entry in stale:
+                self._discard(user_id, entry)
+        return len(stale)
+
+    def within(self, min_lat, min_lon, max_lat, max_lon, now=None):
+        """
+        Volunteers inside a bounding box.
+
+        Returns:
+            [(user_id, lat, lon, rating, seen_at)]
+        """
+        cutoff = (now or time.time()) - self.ttl
+        row0, col0 = cell_index(min_lat, min_lon, self.cell_size)
+        row1, col1 = cell_index(max_lat, max_lon, self.cell_size)
+        found = []
+        with self._lock:
+            if (row1 - row0 + 1) * (col1 - col0 + 1) <= len(self._cells):
+                cells = (
+                    (row, col) for row in range(row0, row1 + 1) for col in range(col0, col1 + 1)
+                )
+            else:
+                # Box covers more cells than are occupied; walk the occupied ones
+                cells = list(self._cells)
+            for cell in cells:
+                for user_id in self._cells.get(cell, ()):
+                    lat, lon, rating, seen_at = self._entries[user_id]
+                    if seen_at >= cutoff and min_lat <= lat <= max_lat and min_lon <= lon <= max_lon:
+                        found.append((user_id, lat, lon, rating, seen_at))
+        return found
+
+    def _ring(self, row, col, r):
+        if r == 0:
+            yield row, col
+            return
+        for dc in range(-r, r + 1):
+            yield row - r, col + dc
+            yield row + r, col + dc
+        for dr in range(-r + 1, r):
+            yield row + dr, col - r
+            yield row + dr, col + r
+
+    def _ring_clearance_km(self, lat, r):
+        """Distance from a point to anything outside the r rings around its cell."""
+        edge_lat = min(89.0, abs(lat) + (r + 1) * self.cell_size)
+        return r * self.cell_size * KM_PER_DEG_LAT * cos(radians(edge_lat))
+
+    def nearest(self, lat, lon, k=5, max_km=10.0, now=None):
+        """
+        The k best volunteers within max_km of a point.
+
+        Volunteers are ranked by distance discounted by rating: with
+        rating_weight 0.2, a 5-star volunteer ranks as if 20% closer.
+
+        Returns:
+            [(user_id, distance_km, rating)] best first
+        """
+        lat, lon = float(lat), float(lon)
+        cutoff = (now or time.time()) - self.ttl
+        row, col = cell_index(lat, lon, self.cell_size)
+        best = []  # max-heap of (-effective, user_id, distance, rating)
+        max_discount = self.rating_weight
+
+        with self._lock:
+            r = 0
+            while True:
+                for cell in self._ring(row, col, r):
+                    for user_id in self._cells.get(cell, ()):
+                        v_lat, v_lon, rating, seen_at = self._entries[user_id]
+                        if seen_at < cutoff:
+                            continue
+                        distance = haversine_km(lat, lon, v_lat, v_lon)
+                        if distance > max_km:
+                            continue
+                        effective = distance * (1 - self.rating_weight * min(rating, 5.0) / 5)
+                        item = (-effective, user_id, distance, rating)
+                        if len(best) < k:
+                            heapq.heappush(best, item)
+                        elif item > best[0]:
+                            heapq.heapreplace(best, item)
+
+                clearance = self._ring_clearance_km(lat, r)
+                if clearance > max_km:
+                    break
+                # Nothing beyond this ring can beat the current k-th entry
+                if len(best) == k and clearance * (1 - max_discount) >= -best[0][0]:
+                    break
+                r += 1
+
+        return [(user_id, distance, rating) for _, user_id, distance, rating in sorted(best, reverse=True)]
+
+
+class VolunteerPresenceStore:
+    """
+    Writes volunteer availability and heartbeats, and keeps this process's
+    PresenceIndex in sync with the VolunteerPresence table.
+    """
+
+    def __init__(self, index=None, sync_interval=None):
+        self.index = index or PresenceIndex()
+        self.sync_interval = sync_interval if sync_interval is not None else getattr(
+            settings, 'VOLUNTEER_PRESENCE_SYNC_INTERVAL', 2
+        )
+        self._synced_at = 0.0
+        self._watermark = None
+        self._sync_lock = threading.Lock()
+
+    def set_active(self, user, active=None):
+        """
+        Switch a volunteer's availability; active=None flips it.
+
+        The presence row is locked for the read-modify-write, so concurrent
+        toggles apply one after the other. The location is cleared until
+        the next heartbeat.
+
+        Returns:
+            The new availability
+        """
+        from .authentication import user_rows
+        from .models import User, VolunteerPresence
+
+        now = timezone.now()
+        with transaction.atomic():
+            presence, _ = VolunteerPresence.objects.select_for_update().get_or_create(
+                user_id=user.pk,
+                defaults={'last_seen': now, 'updated_at': now},
+            )
+            if active is None:
+                active = not presence.is_active
+            VolunteerPresence.objects.filter(pk=user.pk).update(
+                is_active=active, latitude=None, longitude=None, last_seen=now, updated_at=now
+            )
+            User.objects.filter(pk=user.pk).update(is_volunteer_active=active, updated_at=now)
+
+        # update() skips auto_now and the post_save signal that normally does this
+        user_rows.invalidate(user.pk)
+        self.index.remove(user.pk)
+        return active
+
+    def heartbeat(self, user, lat, lon):
+        """
+        Store an active volunteer's position with a single UPDATE.
+
+        Returns:
+            False if the volunteer is not active
+        """
+        from .models import VolunteerPresence
+
+        now = timezone.now()
+        updated = VolunteerPresence.objects.filter(pk=user.pk, is_active=True).update(
+            latitude=lat,
+            longitude=lon,
+            volunteer_rating=user.volunteer_rating,
+            last_seen=now,
+            updated_at=now,
+        )
+        if updated:
+            self.index.put(user.pk, lat, lon, user.volunteer_rating, now.timestamp())
+        return bool(updated)
+
+    def expire(self, ttl=None):
+        """
+        Mark volunteers without a recent heartbeat inactive.
+
+        Returns:
+            Number of volunteers expired
+        """
+        from .authentication import user_rows
+        from .models import User, VolunteerPresence
+
+        now = timezone.now()
+        cutoff = now - timedelta(seconds=ttl if ttl is not None else self.index.ttl)
+        with transaction.atomic():
+            user_ids = list(
+                VolunteerPresence.objects.select_for_update(skip_locked=True)
+                .filter(is_active=True, last_seen__lt=cutoff)
+                .values_list('user_id', flat=True)
+            )
+            VolunteerPresence.objects.filter(user_id__in=user_ids).update(
+                is_active=False, latitude=None, longitude=None, updated_at=now
+            )
+            # Volunteers marked active before presence tracking existed
+            legacy_ids = list(
+                User.objects.filter(is_volunteer_active=True, presence__isnull=True)
+                .values_list('id', flat=True)
+            )
+            User.objects.filter(pk__in=user_ids + legacy_ids).update(is_volunteer_active=False, updated_at=now)
+
+        for user_id in user_ids + legacy_ids:
+            user_rows.invalidate(user_id)
+            self.index.remove(user_id)
+        return len(user_ids) + len(legacy_ids)
+
+    def sync(self, force=False):
+        """Pull presence rows changed since the last sync into the index."""
+        from .models import VolunteerPresence
+
+        if not force and time.monotonic() - self._synced_at < self.sync_interval:
+            return
+        # One thread refreshes; the others answer from the current index
+        if not self._sync_lock.acquire(blocking=force):
+            return
+        try:
+            now = timezone.now()
+            rows = VolunteerPresence.objects.all()
+            if self._watermark is None:
+                rows = rows.filter(is_active=True, last_seen__gte=now - timedelta(seconds=self.index.ttl))
+            else:
+                # Overlap a little: rows can commit slightly out of order
+                rows = rows.filter(updated_at__gte=self._watermark - timedelta(seconds=self.sync_interval + 5))
+
+            rows = rows.values_list(
+                'user_id', 'is_active', 'latitude', 'longitude', 'volunteer_rating', 'last_seen'
+            )
+            for user_id, is_active, lat, lon, rating, last_seen in rows.iterator():
+                if is_active and lat is not None:
+                    self.index.put(user_id, lat, lon, rating, last_seen.timestamp())
+                else:
+                    self.index.remove(user_id)
+
+            self.index.expire()
+            self._watermark = now
+            self._synced_at = time.monotonic()
+        finally:
+            self._sync_lock.release()
+
+    def nearest(self, lat, lon, k=5, max_km=None):
+        self.sync()
+        if max_km is None:
+            max_km = getattr(settings, 'VOLUNTEER_NEARBY_MAX_KM', 10)
+        return self.index.nearest(lat, lon, k, max_km)
+
+    def within(self, min_lat, min_lon, max_lat, max_lon):
+        self.sync()
+        return self.index.within(min_lat, min_lon, max_lat, max_lon)
+
+
+# Global instance
+volunteer_presence = VolunteerPresenceStore()
@@ -1,7 +1,9 @@
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
 from django.contrib.auth.password_validation import validate_password
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
 import uuid
+from django.conf import settings
 
 User = get_user_model()
 
@@ -22,7 +24,7 @@ class UserRegistrationSerializer(serializers.ModelSerializer):
             'id', 'username', 'email', 'password', 'password_confirm',
             'first_name', 'last_name', 'phone_number', 'user_type',
             'disability_type', 'needs_wheelchair_access',
-            'needs_tactile_paths', 'needs_audio_guidance'
+            'needs_tactile_paths', 'needs_audio_guidance', 'city'
         ]
         extra_kwargs = {
             'first_name': {'required': True},
@@ -60,7 +62,7 @@ class UserSerializer(serializers.ModelSerializer):
             'needs_wheelchair_access', 'needs_tactile_paths',
             'needs_audio_guidance', 'is_volunteer_active',
             'volunteer_rating', 'volunteer_points', 'volunteer_qr_code',
-            'profile_picture', 'created_at'
+            'city', 'profile_picture', 'created_at'
         ]
         read_only_fields = ['id', 'created_at', 'volunteer_rating', 'volunteer_points']
 
@@ -75,5 +77,78 @@ class UserProfileUpdateSerializer(serializers.ModelSerializer):
             'first_name', 'last_name', 'phone_number',
             'disability_type', 'needs_wheelchair_access',
             'needs_tactile_paths', 'needs_audio_guidance',
-            'profile_picture'
-        ]
\ No newline at end of file
+            'city', 'profile_picture'
+        ]
+
+
+class ClaimsTokenObtainPairSerializer(TokenObtainPairSerializer):
+    """
+    Login serializer that signs the user's identity fields into the tokens,
+    so AUTH_TOKEN_USER mode can authenticate without loading the user row
+    """
+    @classmethod
+    def get_token(cls, user):
+        from .authentication import TOKEN_USER_CLAIMS
+        
+        token = super().get_token(user)
+        for claim in TOKEN_USER_CLAIMS:
+            token[claim] = getattr(user, claim)
+        return token
+
+
+class VolunteerAvailabilitySerializer(serializers.Serializer):
+    """
+    Availability to switch to; flips the current one when omitted
+    """
+    is_active = serializers.BooleanField(required=False)
+
+
+class VolunteerHeartbeatSerializer(serializers.Serializer):
+    """
+    Current location of an active volunteer
+    """
+    latitude = serializers.DecimalField(max_digits=9, decimal_places=6, min_value=-90, max_value=90)
+    longitude = serializers.DecimalField(max_digits=9, decimal_places=6, min_value=-180, max_value=180)
+
+
+class NearbyVolunteersSerializer(serializers.Serializer):
+    """
+    Query parameters for the nearest-volunteers search
+    """
+    lat = serializers.FloatField(min_value=-90, max_value=90)
+    lon = serializers.FloatField(min_value=-180, max_value=180)
+    k = serializers.IntegerField(min_value=1, max_value=50, default=5)
+    max_km = serializers.FloatField(min_value=0.1, required=False)
+    
+    def validate_max_km(self, value):
+        limit = getattr(settings, 'VOLUNTEER_NEARBY_MAX_KM', 10)
+        if value > limit:
+            raise serializers.ValidationError(f"Search radius cannot exceed {limit} km.")
+        return value
+
+
+class VolunteerAreaSerializer(serializers.Serializer):
+    """
+    Bounding box for the active-volunteers listing
+    """
+    min_lat = serializers.FloatField(min_value=-90, max_value=90)
+    min_lon = serializers.FloatField(min_value=-180, max_value=180)
+    max_lat = serializers.FloatField(min_value=-90, max_value=90)
+    max_lon = serializers.FloatField(min_value=-180, max_value=180)
+    
+    def validate(self, attrs):
+        if attrs['min_lat'] > attrs['max_lat'] or attrs['min_lon'] > attrs['max_lon']:
+            raise serializers.ValidationError("Minimum coordinates must not exceed maximum coordinates.")
+        limit = getattr(settings, 'VOLUNTEER_AREA_MAX_DEG', 0.5)
+        if attrs['max_lat'] - attrs['min_lat'] > limit or attrs['max_lon'] - attrs['min_lon'] > limit:
+            raise serializers.ValidationError(f"Area cannot span more than {limit} degrees.")
+        return attrs
+
+
+class LeaderboardQuerySerializer(serializers.Serializer):
+    """
+    Query parameters for a leaderboard page
+    """
+    city = serializers.CharField(max_length=100, required=False, allow_blank=True)
+    limit = serializers.IntegerField(min_value=1, max_value=100, default=10)
+    offset = serializers.IntegerField(min_value=0, default=0)
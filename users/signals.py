@@ -0,0 +1,34 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .authentication import user_rows
+from .leaderboard import RANKED_FIELDS, leaderboard
+from .models import ClaimsUser
+
+User = get_user_model()
+
+
+@receiver(post_save, sender=User)
+@receiver(post_save, sender=ClaimsUser)
+@receiver(post_delete, sender=User)
+def invalidate_cached_user(sender, instance, **kwargs):
+    """Authentication must not keep serving a row that has changed."""
+    user_rows.invalidate(instance.pk)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_save, sender=ClaimsUser)
+def update_leaderboard(sender, instance, created, update_fields=None, **kwargs):
+    """Keep a volunteer's standing in step with the fields it ranks by."""
+    if update_fields is not None and not RANKED_FIELDS.intersection(update_fields):
+        return
+    if created and instance.user_type != 'volunteer':
+        return
+    leaderboard.record(instance)
+
+
+@receiver(post_delete, sender=User)
+def remove_from_leaderboard(sender, instance, **kwargs):
+    # The VolunteerScore row goes with the user by cascade
+    leaderboard.remove(instance.pk)
@@ -1,3 +1,563 @@
-from django.test import TestCase
+import random
+import shutil
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import PBKDF2PasswordHasher
+from django.db import connection
+from django.test import (
+    SimpleTestCase, TestCase, TransactionTestCase, override_settings, skipUnlessDBFeature,
+)
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory, force_authenticate
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.tokens import AccessToken
+
+from .authentication import CachedJWTAuthentication, user_rows
+from .cards import user_cards
+from .hashing import HashingSlots, PasswordHashingBusy, ThrottledPBKDF2PasswordHasher
+from .leaderboard import Leaderboard, Ranking, city_key
+from .models import ClaimsUser, VolunteerPresence
+from .presence import PresenceIndex, VolunteerPresenceStore, haversine_km
+from .serializers import ClaimsTokenObtainPairSerializer
+from .views import (
+    ActiveVolunteersView, DispatchVolunteersView, NearbyVolunteersView, UserDetailView, UserProfileView,
+    VolunteerHeartbeatView,
+)
+
+User = get_user_model()
+
+
+def user_row(**overrides):
+    """Full row for an unsaved user, as UserRowCache stores it."""
+    user = User(id=7, username='asha', user_type='volunteer', disability_type='visual', **overrides)
+    return {field.attname: getattr(user, field.attname) for field in User._meta.concrete_fields}
+
+
+def token_user_mode(test):
+    """Run test with AUTH_TOKEN_USER on and the checks that disable it off."""
+    test = mock.patch('users.authentication.api_settings.CHECK_USER_IS_ACTIVE', False)(test)
+    return override_settings(AUTH_TOKEN_USER=True)(test)
+
+
+class CachedAuthenticationTests(SimpleTestCase):
+    """SimpleTestCase refuses database queries, so passing tests made none."""
+
+    def setUp(self):
+        user_rows.clear()
+        self.addCleanup(user_rows.clear)
+        self.auth = CachedJWTAuthentication()
+
+    def token(self, claims=True):
+        user = User(id=7, username='asha', user_type='volunteer', disability_type='visual')
+        if claims:
+            return ClaimsTokenObtainPairSerializer.get_token(user).access_token
+        return AccessToken.for_user(user)
+
+    def test_cached_row_needs_no_query(self):
+        user_rows.set(7, user_row())
+        user = self.auth.get_user(self.token())
+        self.assertIsInstance(user, User)
+        self.assertEqual((user.pk, user.disability_type), (7, 'visual'))
+        self.assertFalse(user._state.adding)
+
+    def test_each_request_gets_its_own_instance(self):
+        user_rows.set(7, user_row())
+        first = self.auth.get_user(self.token())
+        first.is_volunteer_active = True
+        self.assertFalse(self.auth.get_user(self.token()).is_volunteer_active)
+
+    def test_inactive_users_are_rejected(self):
+        user_rows.set(7, user_row(is_active=False))
+        with self.assertRaises(AuthenticationFailed):
+            self.auth.get_user(self.token())
+
+    def test_invalidate(self):
+        user_rows.set(7, user_row())
+        user_rows.invalidate(7)
+        self.assertIsNone(user_rows.get(7))
+
+    @token_user_mode
+    def test_token_user_from_claims(self):
+        user = self.auth.get_user(self.token())
+        self.assertIsInstance(user, ClaimsUser)
+        self.assertEqual(user, User(id=7))
+        self.assertEqual(user.disability_type, 'visual')
+        self.assertIn('phone_number', user.get_deferred_fields())
+
+    @token_user_mode
+    def test_token_user_loads_other_fields_from_cache(self):
+        user = self.auth.get_user(self.token())
+        user_rows.set(7, user_row(phone_number='12345'))
+        self.assertEqual(user.phone_number, '12345')
+        self.assertEqual(user.get_deferred_fields(), set())
+
+    @token_user_mode
+    def test_tokens_without_claims_use_the_row(self):
+        user_rows.set(7, user_row())
+        self.assertNotIsInstance(self.auth.get_user(self.token(claims=False)), ClaimsUser)
+
+    @override_settings(AUTH_TOKEN_USER=True)
+    def test_active_check_keeps_claims_off(self):
+        user_rows.set(7, user_row())
+        self.assertNotIsInstance(self.auth.get_user(self.token()), ClaimsUser)
+
+
+class TokenUserDeactivationTests(TestCase):
+    def setUp(self):
+        user_rows.clear()
+        self.addCleanup(user_rows.clear)
+        self.auth = CachedJWTAuthentication()
+
+    @override_settings(AUTH_TOKEN_USER=True)
+    def test_user_deactivated_after_token_is_issued(self):
+        user = User.objects.create(username='asha', user_type='volunteer', disability_type='visual')
+        token = ClaimsTokenObtainPairSerializer.get_token(user).access_token
+        self.assertEqual(self.auth.get_user(token), user)
+
+        user.is_active = False
+        user.save()
+        user_rows.clear()
+        with self.assertRaises(AuthenticationFailed):
+            self.auth.get_user(token)
+
+
+class PresenceIndexTests(SimpleTestCase):
+    def setUp(self):
+        self.index = PresenceIndex(ttl=60, cell_size=0.01, rating_weight=0.2)
+
+    def test_nearest_by_distance(self):
+        self.index.put(1, 28.6100, 77.2000)
+        self.index.put(2, 28.6200, 77.2000)
+        self.index.put(3, 28.6500, 77.2000)
+        ids = [user_id for user_id, _, _ in self.index.nearest(28.6090, 77.2000, k=2)]
+        self.assertEqual(ids, [1, 2])
+
+    def test_rating_breaks_near_ties(self):
+        self.index.put(1, 28.6100, 77.2000, rating=0)
+        self.index.put(2, 28.6105, 77.2000, rating=5)
+        self.assertEqual(self.index.nearest(28.6000, 77.2000, k=1)[0][0], 2)
+
+    def test_radius_and_expiry(self):
+        now = time.time()
+        self.index.put(1, 28.6100, 77.2000, seen_at=now - 120)
+        self.index.put(2, 28.9000, 77.2000, seen_at=now)
+        self.assertEqual(self.index.nearest(28.6100, 77.2000, max_km=5, now=now), [])
+        self.assertEqual(self.index.expire(now), 1)
+        self.assertEqual(len(self.index), 1)
+
+    def test_moving_volunteer_changes_cell(self):
+        self.index.put(1, 28.6100, 77.2000)
+        self.index.put(1, 28.7000, 77.3000)
+        self.assertEqual(len(self.index), 1)
+        self.assertEqual(self.index.nearest(28.6100, 77.2000, max_km=2), [])
+        self.assertEqual(self.index.nearest(28.7000, 77.3000, max_km=2)[0][0], 1)
+
+    def test_matches_brute_force(self):
+        rng = random.Random(4)
+        points = {i: (28.5 + rng.random() * 0.3, 77.1 + rng.random() * 0.3, rng.random() * 5) for i in range(500)}
+        for user_id, (lat, lon, rating) in points.items():
+            self.index.put(user_id, lat, lon, rating)
+
+        lat, lon = 28.65, 77.25
+        def effective(item):
+            v_lat, v_lon, rating = item[1]
+            return haversine_km(lat, lon, v_lat, v_lon) * (1 - 0.2 * rating / 5)
+        expected = [user_id for user_id, _ in sorted(points.items(), key=effective)
+                    if haversine_km(lat, lon, *points[user_id][:2]) <= 10][:10]
+        self.assertEqual([user_id for user_id, _, _ in self.index.nearest(lat, lon, k=10)], expected)
+
+    def test_within_bounding_box(self):
+        now = time.time()
+        self.index.put(1, 28.6100, 77.2000, seen_at=now)
+        self.index.put(2, 28.6400, 77.2300, seen_at=now)
+        self.index.put(3, 28.6150, 77.2050, seen_at=now - 120)
+        found = self.index.within(28.60, 77.19, 28.62, 77.21, now=now)
+        self.assertEqual([user_id for user_id, *_ in found], [1])
+        # A box much larger than the occupied area walks occupied cells only
+        found = self.index.within(20.0, 70.0, 35.0, 85.0, now=now)
+        self.assertEqual(sorted(user_id for user_id, *_ in found), [1, 2])
+
+
+class ActiveVolunteersViewTests(SimpleTestCase):
+    def setUp(self):
+        now = time.time()
+        self.found = [
+            (1, 28.6112, 77.2034, 4.5, now),
+            (2, 28.6187, 77.2091, 3.0, now),
+            (3, 28.6412, 77.2311, 5.0, now),
+        ]
+
+    def get(self, view, user):
+        request = APIRequestFactory().get('/api/users/volunteers/active/', {
+            'min_lat': 28.60, 'min_lon': 77.19, 'max_lat': 28.65, 'max_lon': 77.24,
+        })
+        force_authenticate(request, user=user)
+        with mock.patch('users.views.volunteer_presence.within', return_value=self.found):
+            return view.as_view()(request)
+
+    def test_only_cell_counts_are_returned(self):
+        response = self.get(ActiveVolunteersView, User(id=7))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['count'], 3)
+        self.assertEqual(response.data['cells'], [
+            {'latitude': 28.615, 'longitude': 77.205, 'count': 2},
+            {'latitude': 28.645, 'longitude': 77.235, 'count': 1},
+        ])
+
+    def test_dispatch_listing_is_staff_only(self):
+        self.assertEqual(self.get(DispatchVolunteersView, User(id=7)).status_code, 403)
+
+        response = self.get(DispatchVolunteersView, User(id=8, is_staff=True))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([volunteer['id'] for volunteer in response.data['volunteers']], [1, 2, 3])
+        self.assertEqual(response.data['volunteers'][0]['latitude'], 28.6112)
+
+
+class VolunteerPresenceStoreTests(TestCase):
+    def setUp(self):
+        user_rows.clear()
+        self.addCleanup(user_rows.clear)
+        self.store = VolunteerPresenceStore(sync_interval=0)
+        self.volunteer = User.objects.create(username='asha', user_type='volunteer')
+
+    def test_toggle_reads_the_stored_state(self):
+        self.assertTrue(self.store.set_active(self.volunteer))
+        self.store.heartbeat(self.volunteer, 28.61, 77.20)
+        # The instance is stale; the locked presence row decides the flip
+        self.assertFalse(self.volunteer.is_volunteer_active)
+        self.assertFalse(self.store.set_active(self.volunteer))
+
+        presence = VolunteerPresence.objects.get(pk=self.volunteer.pk)
+        self.assertFalse(presence.is_active)
+        self.assertIsNone(presence.latitude)
+        self.assertFalse(User.objects.get(pk=self.volunteer.pk).is_volunteer_active)
+        self.assertEqual(len(self.store.index), 0)
+
+    def test_explicit_state_is_idempotent(self):
+        self.assertTrue(self.store.set_active(self.volunteer, True))
+        self.assertTrue(self.store.set_active(self.volunteer, True))
+        self.assertTrue(VolunteerPresence.objects.get(pk=self.volunteer.pk).is_active)
+
+    def test_expire_drops_silent_volunteers_only(self):
+        quiet = User.objects.create(username='ravi', user_type='volunteer')
+        legacy = User.objects.create(username='meena', user_type='volunteer', is_volunteer_active=True)
+        for user in (self.volunteer, quiet):
+            self.store.set_active(user, True)
+            self.store.heartbeat(user, 28.61, 77.20)
+        VolunteerPresence.objects.filter(pk=quiet.pk).update(last_seen=timezone.now() - timedelta(minutes=10))
+        user_rows.set(quiet.pk, {'id': quiet.pk})
+
+        self.assertEqual(self.store.expire(ttl=120), 2)
+
+        self.assertEqual(
+            set(User.objects.filter(is_volunteer_active=True).values_list('pk', flat=True)), {self.volunteer.pk}
+        )
+        self.assertFalse(VolunteerPresence.objects.get(pk=quiet.pk).is_active)
+        self.assertFalse(User.objects.get(pk=legacy.pk).is_volunteer_active)
+        self.assertIsNone(user_rows.get(quiet.pk))
+        self.assertEqual([user_id for user_id, *_ in self.store.nearest(28.61, 77.20)], [self.volunteer.pk])
+
+
+@skipUnlessDBFeature('has_select_for_update')
+class VolunteerToggleConcurrencyTests(TransactionTestCase):
+    """Needs row locks; SQLite has none, so this runs against PostgreSQL."""
+
+    def test_concurrent_toggles_all_apply(self):
+        volunteer = User.objects.create(username='asha', user_type='volunteer')
+        store = VolunteerPresenceStore()
+        errors = []
+
+        def toggle():
+            try:
+                store.set_active(volunteer)
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=toggle) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        # Eight flips from inactive end inactive only if none was lost
+        self.assertFalse(VolunteerPresence.objects.get(pk=volunteer.pk).is_active)
+        self.assertFalse(User.objects.get(pk=volunteer.pk).is_volunteer_active)
+
+
+class VolunteerLocationViewTests(TestCase):
+    def setUp(self):
+        user_rows.clear()
+        self.addCleanup(user_rows.clear)
+        self.store = VolunteerPresenceStore(sync_interval=0)
+        patcher = mock.patch('users.views.volunteer_presence', self.store)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.seeker = User.objects.create(username='kiran', user_type='user')
+
+    def volunteer(self, username, lat, lon, seen=None):
+        """Active volunteer whose last heartbeat was at lat, lon."""
+        user = User.objects.create(username=username, user_type='volunteer')
+        seen = seen or timezone.now()
+        VolunteerPresence.objects.create(
+            user=user, is_active=True, latitude=lat, longitude=lon, last_seen=seen, updated_at=seen
+        )
+        return user
+
+    def nearby(self, user=None, **params):
+        request = APIRequestFactory().get('/api/users/volunteers/nearby/', params)
+        if user is not None:
+            force_authenticate(request, user=user)
+        return NearbyVolunteersView.as_view()(request)
+
+    def heartbeat(self, user=None, **data):
+        request = APIRequestFactory().post('/api/users/volunteer/heartbeat/', data, format='json')
+        if user is not None:
+            force_authenticate(request, user=user)
+        return VolunteerHeartbeatView.as_view()(request)
+
+    def test_authentication_required(self):
+        self.assertEqual(self.nearby(lat=28.61, lon=77.20).status_code, 401)
+        self.assertEqual(self.heartbeat(latitude=28.61, longitude=77.20).status_code, 401)
+
+    def test_nearby_validates_radius_and_limit(self):
+        for params in (
+            {'lon': 77.20},
+            {'lat': 91, 'lon': 77.20},
+            {'lat': 28.61, 'lon': 77.20, 'max_km': 11},
+            {'lat': 28.61, 'lon': 77.20, 'max_km': 0},
+            {'lat': 28.61, 'lon': 77.20, 'k': 0},
+            {'lat': 28.61, 'lon': 77.20, 'k': 51},
+        ):
+            with self.subTest(params=params):
+                self.assertEqual(self.nearby(self.seeker, **params).status_code, 400)
+
+    def test_nearby_orders_by_distance_and_skips_expired(self):
+        far = self.volunteer('far', 28.65, 77.20)
+        near = self.volunteer('near', 28.611, 77.20)
+        middle = self.volunteer('middle', 28.63, 77.20)
+        self.volunteer('quiet', 28.6101, 77.20, seen=timezone.now() - timedelta(minutes=10))
+        self.volunteer('distant', 28.80, 77.20)
+
+        response = self.nearby(self.seeker, lat=28.61, lon=77.20, max_km=10)
+
+        self.assertEqual(response.status_code, 200)
+        volunteers = response.data['volunteers']
+        self.assertEqual([volunteer['id'] for volunteer in volunteers], [near.pk, middle.pk, far.pk])
+        distances = [volunteer['distance_km'] for volunteer in volunteers]
+        self.assertEqual(distances, sorted(distances))
+
+        response = self.nearby(self.seeker, lat=28.61, lon=77.20, k=1)
+        self.assertEqual([volunteer['id'] for volunteer in response.data['volunteers']], [near.pk])
+
+    def test_heartbeat_updates_last_seen(self):
+        volunteer = self.volunteer('asha', 28.60, 77.19, seen=timezone.now() - timedelta(seconds=60))
+        before = VolunteerPresence.objects.get(pk=volunteer.pk).last_seen
+
+        response = self.heartbeat(volunteer, latitude='28.612300', longitude='77.204500')
+
+        self.assertEqual(response.status_code, 204)
+        presence = VolunteerPresence.objects.get(pk=volunteer.pk)
+        self.assertGreater(presence.last_seen, before)
+        self.assertEqual((float(presence.latitude), float(presence.longitude)), (28.6123, 77.2045))
+        response = self.nearby(self.seeker, lat=28.6123, lon=77.2045)
+        self.assertEqual([v['id'] for v in response.data['volunteers']], [volunteer.pk])
+
+    def test_heartbeat_rejects_inactive_and_non_volunteers(self):
+        volunteer = User.objects.create(username='asha', user_type='volunteer')
+        self.assertEqual(self.heartbeat(volunteer, latitude=28.61, longitude=77.20).status_code, 403)
+        self.assertEqual(self.heartbeat(self.seeker, latitude=28.61, longitude=77.20).status_code, 403)
+        self.store.set_active(volunteer, True)
+        self.assertEqual(self.heartbeat(volunteer, latitude=95, longitude=77.20).status_code, 400)
+
+
+class LeaderboardTests(SimpleTestCase):
+    def setUp(self):
+        self.board = Leaderboard(autosync=False)
+        self.board.put(1, 'asha', 'delhi', 120, 4.5)
+        self.board.put(2, 'ravi', 'mumbai', 300, 4.0)
+        self.board.put(3, 'meena', 'delhi', 120, 4.8)
+        self.board.put(4, 'kiran', '', 50, 5.0)
+
+    def test_points_then_rating_then_id(self):
+        count, rows = self.board.top(10)
+        self.assertEqual(count, 4)
+        self.assertEqual([user_id for _, user_id, *_ in rows], [2, 3, 1, 4])
+        self.assertEqual([rank for rank, *_ in rows], [1, 2, 3, 4])
+
+    def test_city_ranking_and_paging(self):
+        count, rows = self.board.top(1, city=' Delhi ', offset=1)
+        self.assertEqual((count, rows), (2, [(2, 1, 'asha', 120, 4.5)]))
+        self.assertEqual(self.board.top(10, city='pune'), (0, []))
+
+    def test_standing_follows_updates(self):
+        self.board.put(1, 'asha', 'mumbai', 500, 4.5)
+        standing = self.board.standing(1)
+        self.assertEqual((standing['rank'], standing['count']), (1, 4))
+        self.assertEqual((standing['city'], standing['city_rank'], standing['city_count']), ('mumbai', 1, 2))
+        self.assertEqual(self.board.top(10, city='delhi')[0], 1)
+
+        self.board.remove(1)
+        self.assertIsNone(self.board.standing(1))
+        self.assertEqual(self.board.standing(4)['city_rank'], None)
+
+    def test_ranking_matches_sort(self):
+        rng = random.Random(7)
+        ranking = Ranking()
+        scores = {}
+        for _ in range(2000):
+            user_id = rng.randrange(300)
+            if rng.random() < 0.2:
+                scores.pop(user_id, None)
+                ranking.remove(user_id)
+                continue
+            scores[user_id] = (rng.randrange(50), rng.choice([3.5, 4.0, 4.5]))
+            ranking.put(user_id, *scores[user_id])
+        expected = sorted(scores, key=lambda user_id: (-scores[user_id][0], -scores[user_id][1], user_id))
+        self.assertEqual(len(ranking), len(expected))
+        self.assertEqual([user_id for _, user_id, _, _ in ranking.top(len(scores))], expected)
+        self.assertEqual([ranking.rank(user_id) for user_id in expected], list(range(1, len(expected) + 1)))
+        for offset in (0, 1, 41, len(expected) - 3, len(expected)):
+            page = ranking.top(5, offset)
+            self.assertEqual([user_id for _, user_id, _, _ in page], expected[offset:offset + 5])
+            self.assertEqual([rank for rank, *_ in page], list(range(offset + 1, offset + 1 + len(page))))
+
+    def test_city_key(self):
+        self.assertEqual(city_key('  New   DELHI '), 'new delhi')
+        self.assertEqual(city_key(None), '')
+
+
+class ConditionalProfileTests(SimpleTestCase):
+    def setUp(self):
+        user_rows.clear()
+        user_cards.clear()
+        self.addCleanup(user_rows.clear)
+        self.factory = APIRequestFactory()
+        self.updated_at = timezone.now()
+
+    def get_profile(self, **headers):
+        user = User(id=7, username='asha', user_type='volunteer', updated_at=self.updated_at)
+        request = self.factory.get('/api/users/profile/', **headers)
+        force_authenticate(request, user=user)
+        return UserProfileView.as_view()(request)
+
+    def test_unchanged_profile_is_not_modified(self):
+        response = self.get_profile()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['username'], 'asha')
+        self.assertEqual(response['Cache-Control'], 'private, no-cache')
+
+        again = self.get_profile(HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(again.status_code, 304)
+        self.assertEqual(again['ETag'], response['ETag'])
+        since = self.get_profile(HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(since.status_code, 304)
+
+    def test_saved_profile_gets_new_etag(self):
+        etag = self.get_profile()['ETag']
+        self.updated_at += timedelta(seconds=5)
+        response = self.get_profile(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_picture_url_follows_each_request_host(self):
+        user_rows.set(7, user_row(updated_at=self.updated_at, profile_picture='profile_pics/asha.jpg'))
+        urls = []
+        for host, secure in (('internal:8000', False), ('api.saarthi.example', True)):
+            request = self.factory.get('/api/users/7/', HTTP_HOST=host, secure=secure)
+            force_authenticate(request, user=User(id=8))
+            urls.append(UserDetailView.as_view()(request, pk=7).data['profile_picture'])
+        self.assertEqual(urls, [
+            'http://internal:8000/media/profile_pics/asha.jpg',
+            'https://api.saarthi.example/media/profile_pics/asha.jpg',
+        ])
+        self.assertEqual(len(user_cards.cache), 1)
+
+    def test_detail_served_from_cached_row(self):
+        user_rows.set(7, user_row(updated_at=self.updated_at))
+        request = self.factory.get('/api/users/7/')
+        force_authenticate(request, user=User(id=8))
+        response = UserDetailView.as_view()(request, pk=7)
+        self.assertEqual((response.status_code, response.data['id']), (200, 7))
+        self.assertEqual(len(user_cards.cache), 1)
+
+
+class HashingSlotsTests(SimpleTestCase):
+    def setUp(self):
+        self.lock_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.lock_dir)
+
+    def test_throttled_hashes_match_stock_pbkdf2(self):
+        encoded = ThrottledPBKDF2PasswordHasher().encode('s3cret-pass', 'saltsalt', 1000)
+        self.assertEqual(encoded, PBKDF2PasswordHasher().encode('s3cret-pass', 'saltsalt', 1000))
+        self.assertTrue(PBKDF2PasswordHasher().verify('s3cret-pass', encoded))
+
+    def test_slots_are_shared_through_the_lock_dir(self):
+        # Two instances stand in for two worker processes on one host
+        first = HashingSlots(slots=1, wait=5, lock_dir=self.lock_dir)
+        second = HashingSlots(slots=1, wait=0.05, lock_dir=self.lock_dir)
+        with first.slot():
+            with self.assertRaises(PasswordHashingBusy):
+                with second.slot():
+                    pass
+        with second.slot():
+            pass
+        self.assertEqual((second.stats()['completed'], second.stats()['rejected']), (1, 1))
+
+    def test_waiters_get_a_slot_once_one_frees(self):
+        slots = HashingSlots(slots=2, wait=5, lock_dir=self.lock_dir)
+        held = threading.Event()
+        release = threading.Event()
+
+        def hold():
+            with slots.slot():
+                held.set()
+                release.wait()
+
+        holders = [threading.Thread(target=hold) for _ in range(2)]
+        for thread in holders:
+            thread.start()
+            held.wait()
+            held.clear()
+        self.assertEqual(slots.stats()['in_progress'], 2)
+
+        waiter = threading.Thread(target=hold)
+        waiter.start()
+        while slots.stats()['waiting'] == 0:
+            time.sleep(0.01)
+        release.set()
+        for thread in holders + [waiter]:
+            thread.join()
+        stats = slots.stats()
+        self.assertEqual(
+            (stats['waiting'], stats['in_progress'], stats['completed'], stats['rejected']), (0, 0, 3, 0)
+        )
+        self.assertGreater(stats['mean_wait_ms'], 0)
+
+
+class PasswordHashingBusyTests(TestCase):
+    def setUp(self):
+        patcher = mock.patch(
+            'users.hashing.hashing_slots.slot', side_effect=PasswordHashingBusy('All slots busy')
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def assertBusy(self, response):
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Retry-After'], '2')
+
+    def test_api_login(self):
+        self.assertBusy(self.client.post(
+            '/api/users/auth/login/', {'username': 'asha', 'password': 'secret'}, content_type='application/json'
+        ))
+
+    def test_admin_login(self):
+        self.assertBusy(self.client.post('/admin/login/', {'username': 'asha', 'password': 'secret'}))
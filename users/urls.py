@@ -8,6 +8,12 @@ from .views import (
     UserProfileView,
     UserDetailView,
     VolunteerToggleActiveView,
+    VolunteerHeartbeatView,
+    NearbyVolunteersView,
+    ActiveVolunteersView,
+    DispatchVolunteersView,
+    LeaderboardView,
+    MyLeaderboardRankView,
 )
 
 urlpatterns = [
@@ -22,4 +28,10 @@ urlpatterns = [
     
     # Volunteer endpoints
     path('volunteer/toggle-active/', VolunteerToggleActiveView.as_view(), name='volunteer-toggle-active'),
+    path('volunteer/heartbeat/', VolunteerHeartbeatView.as_view(), name='volunteer-heartbeat'),
+    path('volunteers/nearby/', NearbyVolunteersView.as_view(), name='volunteers-nearby'),
+    path('volunteers/active/', ActiveVolunteersView.as_view(), name='volunteers-active'),
+    path('volunteers/active/dispatch/', DispatchVolunteersView.as_view(), name='volunteers-dispatch'),
+    path('leaderboard/', LeaderboardView.as_view(), name='leaderboard'),
+    path('leaderboard/me/', MyLeaderboardRankView.as_view(), name='leaderboard-me'),
 ]
\ No newline at end of file
@@ -1,12 +1,27 @@
+from collections import Counter
+from datetime import datetime, timezone as dt_timezone
+
 from rest_framework import generics, status
 from rest_framework.response import Response
-from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework.permissions import AllowAny, IsAdminUser, IsAuthenticated
 from rest_framework.views import APIView
+from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.http import Http404
+from accessibility.grid import cell_center, cell_index
+from .authentication import user_from_row, user_rows
+from .cards import conditional_user_response
+from .leaderboard import city_key, leaderboard
+from .presence import volunteer_presence
 from .serializers import (
     UserRegistrationSerializer,
     UserSerializer,
-    UserProfileUpdateSerializer
+    UserProfileUpdateSerializer,
+    VolunteerAvailabilitySerializer,
+    VolunteerHeartbeatSerializer,
+    NearbyVolunteersSerializer,
+    VolunteerAreaSerializer,
+    LeaderboardQuerySerializer,
 )
 
 User = get_user_model()
@@ -43,6 +58,9 @@ class UserProfileView(generics.RetrieveUpdateAPIView):
     def get_object(self):
         return self.request.user
     
+    def retrieve(self, request, *args, **kwargs):
+        return conditional_user_response(request, self.get_object(), self.get_serializer_context())
+    
     def update(self, request, *args, **kwargs):
         partial = kwargs.pop('partial', False)
         instance = self.get_object()
@@ -65,6 +83,16 @@ class UserDetailView(generics.RetrieveAPIView):
     queryset = User.objects.all()
     permission_classes = [IsAuthenticated]
     serializer_class = UserSerializer
+    
+    def get_object(self):
+        # Rows come from the authentication cache; most lookups are repeats
+        row = user_rows.get(self.kwargs['pk']) or user_rows.load(self.kwargs['pk'])
+        if row is None:
+            raise Http404
+        return user_from_row(row)
+    
+    def retrieve(self, request, *args, **kwargs):
+        return conditional_user_response(request, self.get_object(), self.get_serializer_context())
 
 
 class VolunteerToggleActiveView(APIView):
@@ -83,10 +111,199 @@ class VolunteerToggleActiveView(APIView):
                 status=status.HTTP_403_FORBIDDEN
             )
         
-        user.is_volunteer_active = not user.is_volunteer_active
-        user.save()
+        serializer = VolunteerAvailabilitySerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        active = volunteer_presence.set_active(user, serializer.validated_data.get('is_active'))
+        
+        return Response({
+            'is_volunteer_active': active,
+            'message': f"Volunteer status: {'Active' if active else 'Inactive'}"
+        })
+
+
+class VolunteerHeartbeatView(APIView):
+    """
+    API endpoint for active volunteers to report their location
+    POST /api/users/volunteer/heartbeat/
+    """
+    permission_classes = [IsAuthenticated]
+    
+    def post(self, request):
+        user = request.user
+        
+        if user.user_type != 'volunteer':
+            return Response(
+                {'error': 'Only volunteers can send location updates'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        
+        serializer = VolunteerHeartbeatSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        accepted = volunteer_presence.heartbeat(
+            user,
+            serializer.validated_data['latitude'],
+            serializer.validated_data['longitude'],
+        )
+        if not accepted:
+            return Response(
+                {'error': 'Turn on volunteer availability before sending location updates'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class NearbyVolunteersView(APIView):
+    """
+    API endpoint to find the nearest active volunteers
+    GET /api/users/volunteers/nearby/?lat=..&lon=..&k=5&max_km=10
+    """
+    permission_classes = [IsAuthenticated]
+    
+    def get(self, request):
+        serializer = NearbyVolunteersSerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        params = serializer.validated_data
+        
+        matches = volunteer_presence.nearest(
+            params['lat'], params['lon'], k=params['k'], max_km=params.get('max_km')
+        )
+        
+        return Response({
+            'volunteers': [
+                {
+                    'id': user_id,
+                    'distance_km': round(distance, 3),
+                    'volunteer_rating': rating,
+                }
+                for user_id, distance, rating in matches
+            ]
+        })
+
+
+class ActiveVolunteersView(APIView):
+    """
+    API endpoint counting active volunteers inside an area, per grid cell
+    GET /api/users/volunteers/active/?min_lat=..&min_lon=..&max_lat=..&max_lon=..
+    
+    Exact positions are never returned, only cell centres and counts;
+    staff get the individual volunteers from DispatchVolunteersView.
+    """
+    permission_classes = [IsAuthenticated]
+    
+    def get(self, request):
+        serializer = VolunteerAreaSerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        params = serializer.validated_data
+        
+        volunteers = volunteer_presence.within(
+            params['min_lat'], params['min_lon'], params['max_lat'], params['max_lon']
+        )
+        
+        cell_size = getattr(settings, 'VOLUNTEER_AREA_CELL_DEG', 0.01)
+        counts = Counter(cell_index(lat, lon, cell_size) for _, lat, lon, _, _ in volunteers)
+        cells = []
+        for (row, col), count in sorted(counts.items()):
+            lat, lon = cell_center(row, col, cell_size)
+            cells.append({'latitude': round(lat, 6), 'longitude': round(lon, 6), 'count': count})
+        
+        return Response({
+            'count': len(volunteers),
+            'cell_size_deg': cell_size,
+            'cells': cells,
+        })
+
+
+class DispatchVolunteersView(APIView):
+    """
+    API endpoint listing active volunteers inside an area, for dispatch staff
+    GET /api/users/volunteers/active/dispatch/?min_lat=..&min_lon=..&max_lat=..&max_lon=..
+    """
+    permission_classes = [IsAdminUser]
+    
+    def get(self, request):
+        serializer = VolunteerAreaSerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        params = serializer.validated_data
+        
+        volunteers = volunteer_presence.within(
+            params['min_lat'], params['min_lon'], params['max_lat'], params['max_lon']
+        )
+        
+        return Response({
+            'count': len(volunteers),
+            'volunteers': [
+                {
+                    'id': user_id,
+                    'latitude': lat,
+                    'longitude': lon,
+                    'volunteer_rating': rating,
+                    'last_seen': datetime.fromtimestamp(seen_at, tz=dt_timezone.utc),
+                }
+                for user_id, lat, lon, rating, seen_at in volunteers
+            ]
+        })
+
+
+class LeaderboardView(APIView):
+    """
+    API endpoint for the volunteer leaderboard, overall or for one city
+    GET /api/users/leaderboard/?city=..&limit=10&offset=0
+    """
+    permission_classes = [IsAuthenticated]
+    
+    def get(self, request):
+        serializer = LeaderboardQuerySerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        params = serializer.validated_data
+        city = city_key(params.get('city'))
+        
+        count, rows = leaderboard.top(params['limit'], city=city, offset=params['offset'])
+        
+        return Response({
+            'city': city or None,
+            'count': count,
+            'results': [
+                {
+                    'rank': rank,
+                    'id': user_id,
+                    'username': username,
+                    'volunteer_points': points,
+                    'volunteer_rating': rating,
+                }
+                for rank, user_id, username, points, rating in rows
+            ]
+        })
+
+
+class MyLeaderboardRankView(APIView):
+    """
+    API endpoint for the current volunteer's rank, overall and in their city
+    GET /api/users/leaderboard/me/
+    """
+    permission_classes = [IsAuthenticated]
+    
+    def get(self, request):
+        if request.user.user_type != 'volunteer':
+            return Response(
+                {'error': 'Only volunteers are ranked'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        
+        standing = leaderboard.standing(request.user.pk)
+        if standing is None:
+            return Response(
+                {'error': 'You are not on the leaderboard yet'},
+                status=status.HTTP_404_NOT_FOUND
+            )
         
         return Response({
-            'is_volunteer_active': user.is_volunteer_active,
-            'message': f"Volunteer status: {'Active' if user.is_volunteer_active else 'Inactive'}"
-        })
\ No newline at end of file
+            'volunteer_points': standing['points'],
+            'volunteer_rating': standing['rating'],
+            'overall': {'rank': standing['rank'], 'count': standing['count']},
+            'city': standing['city'] and {
+                'name': standing['city'],
+                'rank': standing['city_rank'],
+                'count': standing['city_count'],
+            },
+        })